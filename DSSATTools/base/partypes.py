@@ -24,12 +24,17 @@ important. They must follow the order of the columns in the DSSAT files.
     
 """
 from datetime import date, datetime
-from collections.abc import MutableMapping, MutableSequence
+from collections.abc import MutableMapping, MutableSequence, Mapping, Sequence
 from pandas import DataFrame
+from pandas.api.types import is_numeric_dtype, is_datetime64_any_dtype
 import numpy as np
 from typing import Type
+from functools import lru_cache, wraps
+from bisect import bisect_left
 import re
 import os
+import threading
+import hashlib
 from .utils import detect_encoding
 
 
@@ -54,7 +59,7 @@ CROPS_MODULES = {
     "Cassava": "CSYCA",
     "Cotton": "CRGRO"
 }
-CODE_VARS = {
+CODE_LISTS = {
     "plme": ["B", "C", "H", "I", "N", "P", "R", "S", "T", "V", None],
     "plds": ["H", "R", "U", None],
     "hstg": [None] + [f"GS0{i:02d}" for i in range(50)], #TODO: Deppends of crop, how to address that? https://github.com/DSSAT/dssat-csm-os/blob/develop/Data/GRSTAGE.CDE
@@ -143,27 +148,118 @@ CODE_VARS = {
         'SIL', 'SL', None
     ]
 }
-CODE_VARS["pcr"] = CODE_VARS["cr"] + [None]
-CODE_VARS["focd"] = CODE_VARS["fmcd"]
-CODE_VARS["ioff"] = CODE_VARS['hstg'] + ["IB001"]
-CODE_VARS["irop"] = CODE_VARS["iame"]
-CODE_VARS["rmet"] = CODE_VARS["facd"]
-CODE_VARS["chme"] = CODE_VARS["facd"]
-CODE_VARS["water"] = CODE_VARS["nitro"] = CODE_VARS["symbi"] = \
-    CODE_VARS["phosp"] = CODE_VARS["potas"] = CODE_VARS["dises"] = \
-    CODE_VARS["chem"] = CODE_VARS["till"] = CODE_VARS["fname"] =  \
-    CODE_VARS["ovvew"] = CODE_VARS["sumry"] = CODE_VARS["grout"] = \
-    CODE_VARS["caout"] = CODE_VARS["waout"] = CODE_VARS["niout"] =  \
-    CODE_VARS["miout"] = CODE_VARS["diout"] = CODE_VARS["chout"] = \
-    CODE_VARS["opout"] = CODE_VARS["switch"]
-CODE_VARS["iroff"] = CODE_VARS["ioff"] # TODO: These are exactly the same!
-CODE_VARS["imeth"] = CODE_VARS["iame"] # TODO: These are exactly the same!
-CODE_VARS["ncode"] = CODE_VARS["fmcd"]
+CODE_LISTS["pcr"] = CODE_LISTS["cr"] + [None]
+CODE_LISTS["focd"] = CODE_LISTS["fmcd"]
+CODE_LISTS["ioff"] = CODE_LISTS['hstg'] + ["IB001"]
+CODE_LISTS["irop"] = CODE_LISTS["iame"]
+CODE_LISTS["rmet"] = CODE_LISTS["facd"]
+CODE_LISTS["chme"] = CODE_LISTS["facd"]
+CODE_LISTS["water"] = CODE_LISTS["nitro"] = CODE_LISTS["symbi"] = \
+    CODE_LISTS["phosp"] = CODE_LISTS["potas"] = CODE_LISTS["dises"] = \
+    CODE_LISTS["chem"] = CODE_LISTS["till"] = CODE_LISTS["fname"] =  \
+    CODE_LISTS["ovvew"] = CODE_LISTS["sumry"] = CODE_LISTS["grout"] = \
+    CODE_LISTS["caout"] = CODE_LISTS["waout"] = CODE_LISTS["niout"] =  \
+    CODE_LISTS["miout"] = CODE_LISTS["diout"] = CODE_LISTS["chout"] = \
+    CODE_LISTS["opout"] = CODE_LISTS["switch"]
+CODE_LISTS["iroff"] = CODE_LISTS["ioff"] # TODO: These are exactly the same!
+CODE_LISTS["imeth"] = CODE_LISTS["iame"] # TODO: These are exactly the same!
+CODE_LISTS["ncode"] = CODE_LISTS["fmcd"]
+
+DETAIL_CDE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'dssat-csm-os', 'Data', 'DETAIL.CDE'
+)
+# Code tables that are completed with the codes defined in DETAIL.CDE. Only
+# the codes that match the pattern of the table are merged.
+DETAIL_CODE_PATTERNS = {
+    "fmcd": r"FE\d{3}", "focd": r"FE\d{3}", "ncode": r"FE\d{3}",
+    "facd": r"AP\d{3}", "rmet": r"AP\d{3}", "chme": r"AP\d{3}",
+    "rcod": r"RE\d{3}", "chcod": r"CH\d{3}", "timpl": r"TI\d{3}",
+    "iame": r"IR\d{3}", "irop": r"IR\d{3}", "imeth": r"IR\d{3}",
+}
+
+def read_detail_codes(file=DETAIL_CDE_PATH):
+    """
+    Returns the set of codes defined in a DSSAT .CDE file. The codes are the
+    first column of the lines that are not section headers, column headers or
+    comments.
+    """
+    encoding = detect_encoding(file)
+    codes = set()
+    with open(file, "r", encoding=encoding) as f:
+        for line in f:
+            if (not line.strip()) or line[0] in "*@!$":
+                continue
+            codes.add(line.split()[0])
+    return codes
+
+
+class CodeTables(Mapping):
+    """
+    Maps each CodeType variable to the frozenset of its allowed values, so the
+    value validation is a constant time lookup. The codes defined in the
+    DETAIL.CDE file of the DSSAT distribution are merged the first time a
+    table is accessed. An empty table means that any value is allowed.
+    """
+    def __init__(self, code_lists, detail_file=DETAIL_CDE_PATH):
+        self.__lists = code_lists
+        self.__detail_file = detail_file
+        self.__ordered = None
+        self.__sets = None
+        self.__lock = threading.Lock()
+
+    def __load(self):
+        with self.__lock:
+            if self.__sets is not None:
+                return
+            detail_codes = set()
+            if os.path.exists(self.__detail_file):
+                detail_codes = read_detail_codes(self.__detail_file)
+            ordered = {}
+            for name, values in self.__lists.items():
+                values = list(values)
+                pattern = DETAIL_CODE_PATTERNS.get(name)
+                if pattern is not None:
+                    values += sorted(
+                        code for code in detail_codes - set(values)
+                        if re.fullmatch(pattern, code)
+                    )
+                ordered[name] = tuple(values)
+            self.__ordered = ordered
+            self.__sets = {
+                name: frozenset(values) for name, values in ordered.items()
+            }
+
+    def __getitem__(self, name):
+        if self.__sets is None:
+            self.__load()
+        return self.__sets[name]
+
+    def __iter__(self):
+        return iter(self.__lists)
+
+    def __len__(self):
+        return len(self.__lists)
+
+    def __contains__(self, name):
+        return name in self.__lists
+
+    def ordered(self, name):
+        """
+        Returns the allowed values of the variable in the order they are
+        defined. It is used for the error messages.
+        """
+        if self.__ordered is None:
+            self.__load()
+        return self.__ordered[name]
+
+
+CODE_VARS = CodeTables(CODE_LISTS)
 
 PROTECTED_ATTRS = [
     "prefix", "pars_fmt", "dtypes", "table_dtype", "table_index", 
     "section_header", "code", "smodel", "spe_file", "spe_path", "cul_dtypes",
-    "cul_pars_fmt", "eco_dtypes", "eco_pars_fmt"
+    "cul_pars_fmt", "eco_dtypes", "eco_pars_fmt", "_layout"
     ]
 SECTION_HEADERS = {
     "Planting": "*PLANTING DETAILS",
@@ -195,17 +291,168 @@ FACTOR_LEVELS = {
     "SimulationControls": "sc"
 }
 
+DATE_WIDTHS = {"%y%j": 5, "%Y%j": 7}
+FMT_REGEX = re.compile(r"([<>^]?)(\d+)(?:\.(\d+))?")
+
+class FieldFormat:
+    """
+    Compiled format of a single parameter. It holds the width, justification,
+    precision and missing value rendering of the format string, so they are
+    not derived from the string each time a value is written or parsed.
+    """
+    __slots__ = (
+        "source", "fmt", "leading", "justify", "width", "precision",
+        "header_fmt", "missing", "code_missing"
+    )
+    def __init__(self, fmt):
+        self.source = fmt
+        if fmt[0] == ".": # For the case of headers with leading points
+            self.leading = "."
+            fmt = fmt[1:]
+        else:
+            self.leading = ""
+        self.fmt = fmt
+        if fmt in DATE_WIDTHS:
+            self.justify = ">"
+            self.width = DATE_WIDTHS[fmt]
+            self.precision = None
+            self.header_fmt = f">{self.width}"
+            self.missing = format(-99, f">{self.width}.0f")
+            self.code_missing = self.missing
+            return
+        match = FMT_REGEX.match(fmt)
+        if match is None:
+            raise ValueError(f"{fmt} is not a valid parameter format")
+        justify, width, precision = match.groups()
+        self.justify = justify
+        self.width = int(width)
+        self.precision = None if precision is None else int(precision)
+        self.header_fmt = fmt.split(".")[0]
+        self.missing = format(-99, f"{self.header_fmt}.0f")[:self.width]
+        # Code variables render the missing value with the first two
+        # characters of the format.
+        code_width = int(FMT_REGEX.match(fmt[:2]).group(2))
+        self.code_missing = format(-99, f"{fmt[:2]}.0f")[:code_width]
+
+    def format(self, value):
+        """
+        Formats and trim the value to match the width
+        """
+        return format(value, self.fmt)[:self.width]
+
+    def header(self, name, leading=True):
+        """
+        Formats the parameter name as a column header
+        """
+        if leading:
+            return format(name.upper(), self.leading + self.header_fmt)
+        return format(name.upper(), self.header_fmt)[:self.width]
+
+
+@lru_cache(maxsize=None)
+def compile_fmt(fmt):
+    """
+    Returns the FieldFormat of a format string. Format strings are compiled
+    only once.
+    """
+    return FieldFormat(fmt)
+
+
+class RecordLayout:
+    """
+    Compiled pars_fmt of a Record class. Maps each parameter to its
+    FieldFormat, keeping the order of the columns.
+    """
+    __slots__ = ("fields", "names", "widths")
+    def __init__(self, pars_fmt):
+        self.fields = {
+            name: compile_fmt(fmt) for name, fmt in pars_fmt.items()
+        }
+        self.names = tuple(self.fields)
+        self.widths = tuple(field.width for field in self.fields.values())
+
+    def __getitem__(self, name):
+        return self.fields[name]
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def select(self, names):
+        """
+        Returns a layout with only the parameters in names, in that order.
+        """
+        layout = RecordLayout.__new__(RecordLayout)
+        layout.fields = {name: self.fields[name] for name in names}
+        layout.names = tuple(names)
+        layout.widths = tuple(field.width for field in layout.fields.values())
+        return layout
+
+    def header(self, names=None, leading=True):
+        """
+        Returns the list of column headers.
+        """
+        names = self.names if names is None else names
+        return [self.fields[name].header(name, leading) for name in names]
+
+    def parse(self, line):
+        """
+        Splits a line of fixed width columns into a dict of raw values.
+        """
+        pars = {}
+        start = 0
+        for name, width in zip(self.names, self.widths):
+            pars[name] = line[start:start+width].strip()
+            start += width + 1
+        return pars
+
+    def header_range(self, line, name):
+        """
+        Get variable start and end index in the header line
+        """
+        field = self.fields[name]
+        if field.fmt in DATE_WIDTHS:
+            start = line.lower().find(name)
+            end = start + 5 # Assuming all dates in FileX are a 5 character string
+        elif field.justify == "<":
+            start = line.lower().find(name)
+            end = start + field.width
+        elif field.justify == ">":
+            end = line.lower().find(name) + len(name)
+            start = end - field.width
+        else:
+            raise ValueError("Variable format must be right or left justified")
+        return (start, end)
+
+
+def as_layout(pars_fmt):
+    """
+    Returns pars_fmt as a RecordLayout. pars_fmt can be a pars_fmt dict or a
+    RecordLayout.
+    """
+    if isinstance(pars_fmt, RecordLayout):
+        return pars_fmt
+    return RecordLayout(pars_fmt)
+
+
 def _format(s, fmt):
     """
     Formats and trim the string to match the specific width
     """
-    if fmt == "%y%j":
-        width = 5
-    elif fmt == "%Y%j":
-        width = 7
-    else:
-        width = int(re.findall("\d+", fmt.split(".")[0])[0])
-    return format(s, fmt)[:width]
+    return compile_fmt(fmt).format(s)
+
+def _set_metadata(obj, name, field):
+    """
+    Sets the name and the format of a value type instance.
+    """
+    obj.name = name
+    obj._fmt = field
+    obj.fmt = field.fmt # Without the header leading points
+
+def _restore_value(cls, name, value, fmt):
+    """
+    Reconstructs a pickled value type instance.
+    """
+    return cls._wrap(name, value, compile_fmt(fmt))
 
 def clean_comments(lines):
     clean_lines = []
@@ -227,6 +474,16 @@ class CodeType(str):
     variable. 
     """
     def __new__(cls, name, value, fmt):
+        return super().__new__(cls, cls._parse(name, value))
+
+    def __init__(self, name, value, fmt):
+        _set_metadata(self, name, compile_fmt(fmt))
+
+    @staticmethod
+    def _parse(name, value):
+        """
+        Validates the value and returns it as the raw value stored by Records.
+        """
         if isinstance(value, str):
             value = value.strip()
         elif value is None:
@@ -238,25 +495,39 @@ class CodeType(str):
 
         if (value == "-99"):
             value = None
-        assert (value in CODE_VARS[name]) or (CODE_VARS[name] == []), \
-            f"{name} must be one of {CODE_VARS[name]}"
+        assert name in CODE_VARS, f"{name} is not defined as a CodeType"
+        codes = CODE_VARS[name]
+        assert (value in codes) or (not codes), \
+            f"{name} must be one of {list(CODE_VARS.ordered(name))}"
         if value is None:
             value = ""
-        assert name in CODE_VARS, f"{name} is not defined as a CodeType"
-        return super().__new__(cls, value)
+        return str(value)
 
-    def __init__(self, name, value, fmt):
-        self.name = name
-        if fmt[0] == ".": # For the case of headers with leading points
-            fmt = fmt[1:]
-        self.fmt = fmt
+    @classmethod
+    def _wrap(cls, name, value, field):
+        """
+        Wraps a raw value without validating it again.
+        """
+        obj = str.__new__(cls, value)
+        _set_metadata(obj, name, field)
+        return obj
+
+    @staticmethod
+    def _render(value, field):
+        if (value is None) or (value == ""):
+            return field.code_missing
+        else:
+            return field.format(value)
+
+    def _raw(self):
+        return str(self)
+
+    def __reduce__(self):
+        return (_restore_value, (type(self), self.name, self._raw(), self._fmt.source))
 
     @property
     def str(self):
-        if (self is None) or (self == ""):
-            return _format(-99, f'{self.fmt[:2]}.0f')
-        else:
-            return _format(self, self.fmt)
+        return self._render(self, self._fmt)
 
 
 class DateType(date):
@@ -264,6 +535,18 @@ class DateType(date):
     A Class to handle all date variables in DSSAT.
     """
     def __new__(cls, name, value, fmt):
+        value = cls._parse(name, value)
+        return super().__new__(cls, value.year, value.month, value.day)
+    
+    def __init__(self, name, value, fmt):
+        # I'm not sure if I should do this. I don't expect users to use this classes
+        _set_metadata(self, name, compile_fmt(fmt))
+
+    @staticmethod
+    def _parse(name, value):
+        """
+        Validates the value and returns it as the raw value stored by Records.
+        """
         if isinstance(value, (date, datetime)):
             pass
         elif value is None:
@@ -282,22 +565,35 @@ class DateType(date):
                     raise ValueError(f"{value} can't be interpreted as a date")
         else:
             raise ValueError(f"value must be datetime, date, None, -99 or some date representation")            
-        return super().__new__(cls, value.year, value.month, value.day)
-    
-    def __init__(self, name, value, fmt):
-        # I'm not sure if I should do this. I don't expect users to use this classes
-        self.name = name
-        if fmt[0] == ".": # For the case of headers with leading points
-            fmt = fmt[1:]
-        self.fmt = fmt
+        if type(value) is date:
+            return value
+        return date(value.year, value.month, value.day)
+
+    @classmethod
+    def _wrap(cls, name, value, field):
+        """
+        Wraps a raw value without validating it again.
+        """
+        obj = date.__new__(cls, value.year, value.month, value.day)
+        _set_metadata(obj, name, field)
+        return obj
+
+    @staticmethod
+    def _render(value, field):
+        if value.year == 9999 :
+            return field.missing
+        else:
+            return field.format(value)
     
+    def _raw(self):
+        return date(self.year, self.month, self.day)
+
+    def __reduce__(self):
+        return (_restore_value, (type(self), self.name, self._raw(), self._fmt.source))
+
     @property
     def str(self):
-        if self.year == 9999 :
-            len_fmt = len(self.strftime(self.fmt))
-            return _format(-99, f'>{len_fmt}.0f')
-        else:
-            return _format(self, self.fmt)
+        return self._render(self, self._fmt)
 
 
 class NumberType(float):
@@ -305,6 +601,16 @@ class NumberType(float):
     A class to handle all Number type varibles in DSSAT.
     """
     def __new__(cls, name, value, fmt):
+        return super().__new__(cls, cls._parse(name, value))
+    
+    def __init__(self, name, value, fmt):
+        _set_metadata(self, name, compile_fmt(fmt))
+
+    @staticmethod
+    def _parse(name, value):
+        """
+        Validates the value and returns it as the raw value stored by Records.
+        """
         if value is None:
             value = np.nan
         elif isinstance(value, str) and (len(value.split()) == 0):
@@ -313,20 +619,33 @@ class NumberType(float):
             value = np.nan
         else:
             pass
-        return super().__new__(cls, value)
-    
-    def __init__(self, name, value, fmt):
-        self.name = name
-        if fmt[0] == ".": # For the case of headers with leading points
-            fmt = fmt[1:]
-        self.fmt = fmt
+        return float(value)
+
+    @classmethod
+    def _wrap(cls, name, value, field):
+        """
+        Wraps a raw value without validating it again.
+        """
+        obj = float.__new__(cls, value)
+        _set_metadata(obj, name, field)
+        return obj
+
+    @staticmethod
+    def _render(value, field):
+        if value != value: # NaN
+            return field.missing
+        else:
+            return field.format(value)
+
+    def _raw(self):
+        return float(self)
+
+    def __reduce__(self):
+        return (_restore_value, (type(self), self.name, self._raw(), self._fmt.source))
 
     @property
     def str(self):
-        if np.isnan(self):
-            return _format(-99, f'{self.fmt.split(".")[0]}.0f')
-        else:
-            return _format(self, self.fmt)
+        return self._render(self, self._fmt)
 
         
 class DescriptionType(str):
@@ -336,6 +655,16 @@ class DescriptionType(str):
     INSI codes, description and name of treatments, cultivars, ecotypes, etc.
     """
     def __new__(cls, name, value, fmt):
+        return super().__new__(cls, cls._parse(name, value))
+
+    def __init__(self, name, value, fmt):
+        _set_metadata(self, name, compile_fmt(fmt))
+
+    @staticmethod
+    def _parse(name, value):
+        """
+        Validates the value and returns it as the raw value stored by Records.
+        """
         if isinstance(value, str):
             value = value.strip()
         elif value is None:
@@ -346,20 +675,49 @@ class DescriptionType(str):
             pass
         if (value is None) or (value == "-99"):
             value = ""
-        return super().__new__(cls, value)
+        return str(value)
 
-    def __init__(self, name, value, fmt):
-        self.name = name
-        if fmt[0] == ".": # For the case of headers with leading points
-            fmt = fmt[1:]
-        self.fmt = fmt
+    @classmethod
+    def _wrap(cls, name, value, field):
+        """
+        Wraps a raw value without validating it again.
+        """
+        obj = str.__new__(cls, value)
+        _set_metadata(obj, name, field)
+        return obj
+
+    @staticmethod
+    def _render(value, field):
+        if (value is None) or (value == ""):
+            return field.missing
+        else:
+            return field.format(value)
+
+    def _raw(self):
+        return str(self)
+
+    def __reduce__(self):
+        return (_restore_value, (type(self), self.name, self._raw(), self._fmt.source))
 
     @property
     def str(self):
-        if (self is None) or (self == ""):
-            return _format(-99, f'{self.fmt}.0f')
-        else:
-            return _format(self, self.fmt)
+        return self._render(self, self._fmt)
+
+
+VALUE_TYPES = (CodeType, DateType, NumberType, DescriptionType)
+class _Unset:
+    """
+    Type of the value of the Record parameters that are not set. It is 
+    pickled by reference, so it is the same object after unpickling.
+    """
+    __slots__ = ()
+    def __reduce__(self):
+        return "_UNSET"
+
+    def __repr__(self):
+        return "<unset>"
+
+_UNSET = _Unset()
         
 
 class TableType(MutableSequence):
@@ -375,47 +733,53 @@ class TableType(MutableSequence):
         events the same day)
     '''
     def __init__(self, values, dtype):
+        self.__frozen = False
         if values is None:
             super().__init__()
             self.__data_dtype = dtype
             self.__data = []
+            self.__keys = []
             return
         # If values is a dataframe
         if isinstance(values, DataFrame):
-            values = list(values.apply(
-                lambda row: dtype(**{
-                    par: row.get(par)
-                    for par in dtype.dtypes.keys()
-                }), axis=1
-            ))
+            values = _records_from_dataframe(values, dtype)
 
         # Verify that values is a list, tuple, or set
         assert isinstance(values, (list, set, tuple)), \
             f"Table must be a list of {dtype.__name__} records"
-        # Verify that all elements in list are the correct dtype
-        if not all([isinstance(val, dtype) for val in values]):
-            raise TypeError(
-                f"Records in table must be {dtype.__name__} type"
-            )
         super().__init__()
         self.__data_dtype = dtype
-        self.__data = [
-            val for val in values
-        ]
-        self.__checkindex__()
-        
-    def __checkindex__(self):
-        if self.__data_dtype.table_index is not None: 
-            idx = self.__data_dtype.table_index
-            # Check if index is unique
-            assert len(set([v[idx] for v in self.__data])) \
-                == len(self.__data), \
-                f"{idx} values must be unique"
-            # Sort indexes
-            self.__data = sorted(
-                self.__data, 
-                key=lambda x: x[self.__data_dtype.table_index]
-            )
+        self.__data = []
+        self.__keys = []
+        self.extend(values)
+
+    def __check_records(self, values):
+        """
+        Verifies that all the records are of the table dtype, and returns
+        their index values.
+        """
+        dtype = self.__data_dtype
+        for val in values:
+            if not isinstance(val, dtype):
+                raise TypeError(
+                    f"Records in table must be {dtype.__name__} type"
+                )
+        if dtype.table_index is None:
+            return None
+        return [val._raw(dtype.table_index) for val in values]
+
+    def __checkindex__(self, data, keys):
+        """
+        Returns the records and their index values sorted by index, and
+        checks that the index is unique. The index values are computed only
+        once.
+        """
+        order = sorted(range(len(data)), key=keys.__getitem__)
+        keys = [keys[n] for n in order]
+        # Check if index is unique
+        assert all(a != b for a, b in zip(keys, keys[1:])), \
+            f"{self.__data_dtype.table_index} values must be unique"
+        return [data[n] for n in order], keys
 
     def __getitem__(self, idx):
         return self.__data[idx]
@@ -423,30 +787,134 @@ class TableType(MutableSequence):
     def __setitem__(self):
         raise NotImplementedError
     
+    def __check_frozen(self):
+        if self.__frozen:
+            raise TypeError("The table is frozen")
+
+    def __reduce__(self):
+        # Tables are pickled by columns. Number columns are float arrays, and
+        # date columns are arrays of ordinals. Columns with a single value 
+        # (e.g. missing weather variables) are pickled as that value.
+        dtype = self.__data_dtype
+        rows = [record._values for record in self.__data]
+        frozen = [record._frozen is not None for record in self.__data]
+        columns = []
+        for (name, par_dtype), column in zip(dtype.dtypes.items(), zip(*rows)):
+            if any(value is _UNSET for value in column):
+                columns.append(column)
+            elif _single_value(column):
+                columns.append(column[0])
+            elif par_dtype is NumberType:
+                columns.append(np.array(column, dtype=float))
+            elif par_dtype is DateType:
+                columns.append(np.array(
+                    [value.toordinal() for value in column], dtype=np.int32
+                ))
+            else:
+                columns.append(column)
+        if all(frozen):
+            frozen = True
+        elif not any(frozen):
+            frozen = False
+        return (_restore_table, (
+            dtype, len(rows), tuple(columns), frozen, self.__frozen
+        ))
+
+    def _copy(self):
+        """
+        Returns a mutable copy of the table. The records are not copied.
+        """
+        table = TableType(None, self.__data_dtype)
+        table.__data = list(self.__data)
+        table.__keys = list(self.__keys)
+        return table
+
+    def _frozen_copy(self):
+        """
+        Returns a frozen copy of the table, with its records frozen. Frozen
+        tables are returned as they are.
+        """
+        if self.__frozen:
+            return self
+        table = TableType(None, self.__data_dtype)
+        table.__data = [record.freeze() for record in self.__data]
+        table.__keys = list(self.__keys)
+        table.__frozen = True
+        return table
+
+    def _content_key(self):
+        """
+        Returns the SHA1 digest of the content of the table records.
+        """
+        digest = hashlib.sha1()
+        for record in self.__data:
+            digest.update(repr(record._content_key()).encode())
+        return digest.hexdigest()
+
+    def share(self):
+        """
+        Returns a frozen copy of the table where the number and date columns
+        are stored in a shared memory block. See SharedTable.
+        """
+        return SharedTable(self)
+
     def __delitem__(self, idx):
+        self.__check_frozen()
         self.__data.pop(idx)
+        if self.__data_dtype.table_index is not None:
+            self.__keys.pop(idx)
         
     def __len__(self):
         return len(self)
 
     def append(self, item):
-        self.__data.append(item)
+        """
+        Adds a record to the table. If the table has an index, the record is
+        inserted in its position, keeping the table sorted.
+        """
+        self.insert(len(self.__data), item)
     
-    def insert(self):
-        raise NotImplementedError
+    def insert(self, idx, item):
+        """
+        Inserts a record before idx. If the table has an index, idx is ignored
+        and the record is inserted in its position, keeping the table sorted.
+        """
+        self.__check_frozen()
+        keys = self.__check_records([item])
+        if keys is None:
+            self.__data.insert(idx, item)
+            return
+        key = keys[0]
+        idx = bisect_left(self.__keys, key)
+        assert (idx == len(self.__keys)) or (self.__keys[idx] != key), \
+            f"{self.__data_dtype.table_index} values must be unique"
+        self.__keys.insert(idx, key)
+        self.__data.insert(idx, item)
+
+    def extend(self, values):
+        """
+        Adds several records to the table. The records are validated and the 
+        table is sorted only once. If they are not valid, the table is not
+        changed.
+        """
+        self.__check_frozen()
+        values = list(values)
+        keys = self.__check_records(values)
+        if keys is None:
+            self.__data += values
+            return
+        self.__data, self.__keys = self.__checkindex__(
+            self.__data + values, self.__keys + keys
+        )
     
     def _write_table(self):
         out_str = ""
         for n, record in enumerate(self.__data):
             if n == 0:
-                for var in record.dtypes.keys():
-                    var = record[var]
-                    fmt = var.fmt.split('.')[0]
-                    if fmt == "%y%j":
-                        fmt = ">5"
-                    if fmt == "%Y%j":
-                        fmt = ">7"
-                    out_str += f"{_format(var.name.upper(), fmt)} "
+                for header in record._layout.header(
+                    record.dtypes.keys(), leading=False
+                ):
+                    out_str += f"{header} "
                 out_str += "\n"
             out_str += f"{record._write_row()}"
         return out_str
@@ -455,15 +923,10 @@ class TableType(MutableSequence):
         out_str = "\n"
         for n, record in enumerate(self.__data):
             if n == 0:
-                for var in record.dtypes.keys():
-                    var = record[var]
-                    fmt = var.fmt.split('.')[0]
-                    if fmt == "%y%j":
-                        fmt = ">5"
-                    if fmt == "%Y%j":
-                        fmt = ">7"
-                    out_str += \
-                        f"{_format(var.name.upper(), fmt)} "
+                for header in record._layout.header(
+                    record.dtypes.keys(), leading=False
+                ):
+                    out_str += f"{header} "
                 out_str += "\n"
             out_str += f"{record._write_row()}"
             if n >= 5:
@@ -473,8 +936,331 @@ class TableType(MutableSequence):
     
     def __len__(self):
         return len(self.__data)
+
+    @classmethod
+    def from_dataframe(cls, df, dtype):
+        """
+        Creates a table from a DataFrame, where the columns are the parameters
+        of the dtype records. Each column is parsed at once.
+        """
+        return cls(_records_from_dataframe(df, dtype), dtype)
+
+    def to_dataframe(self):
+        """
+        Returns the table as a pandas DataFrame. Each column is extracted at 
+        once from the raw values of the records.
+        """
+        if not self.__data:
+            return DataFrame()
+        dtype = self.__data_dtype
+        rows = [record._values for record in self.__data]
+        columns = {}
+        for (name, par_dtype), column in zip(dtype.dtypes.items(), zip(*rows)):
+            if any(value is _UNSET for value in column):
+                raise KeyError(name)
+            if par_dtype is NumberType:
+                columns[name] = np.array(column, dtype=float)
+            else:
+                columns[name] = list(column)
+        return DataFrame(columns)
     
 
+def _single_value(column):
+    """
+    True if all the values of the column are the same value. NaN values are 
+    the same value.
+    """
+    first = column[0]
+    if first != first: # NaN
+        return all(value != value for value in column)
+    return all(value == first for value in column)
+
+def _restore_table(dtype, n_records, columns, frozen_records, frozen):
+    """
+    Reconstructs a pickled TableType instance.
+    """
+    values = []
+    for column in columns:
+        if isinstance(column, np.ndarray) and column.dtype == np.int32:
+            values.append([date.fromordinal(value) for value in column.tolist()])
+        elif isinstance(column, np.ndarray):
+            values.append(column.tolist())
+        elif isinstance(column, tuple):
+            values.append(column)
+        else:
+            values.append([column] * n_records)
+    if isinstance(frozen_records, bool):
+        frozen_records = [frozen_records] * n_records
+    records = []
+    for record_values, record_frozen in zip(zip(*values), frozen_records):
+        record = dtype._from_raw(record_values)
+        if record_frozen:
+            record._frozen = FrozenState()
+        records.append(record)
+    table = TableType(None, dtype)
+    table._TableType__data = records
+    if dtype.table_index is not None:
+        table._TableType__keys = [
+            record._raw(dtype.table_index) for record in records
+        ]
+    table._TableType__frozen = frozen
+    return table
+
+class _SharedRows(Sequence):
+    """
+    Sequence of the records of a SharedTable. The records are built from the
+    table columns each time they are accessed, and they are frozen.
+    """
+    __slots__ = ("dtype", "getters", "n_records")
+    def __init__(self, dtype, columns, n_records):
+        self.dtype = dtype
+        self.n_records = n_records
+        self.getters = []
+        for kind, column in columns:
+            if kind == "number":
+                getter = column.item
+            elif kind == "date":
+                getter = lambda n, column=column: date.fromordinal(int(column[n]))
+            elif kind == "value":
+                getter = lambda n, value=column: value
+            else:
+                getter = column.__getitem__
+            self.getters.append(getter)
+
+    def __len__(self):
+        return self.n_records
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[n] for n in range(*idx.indices(self.n_records))]
+        if idx < 0:
+            idx += self.n_records
+        if not 0 <= idx < self.n_records:
+            raise IndexError("table index out of range")
+        record = self.dtype._from_raw([getter(idx) for getter in self.getters])
+        record._frozen = FrozenState()
+        return record
+
+
+class SharedTable(TableType):
+    '''
+    Frozen table where the number and date columns are stored in a 
+    multiprocessing shared memory block. The other columns (e.g. codes and 
+    flags) are kept in the table. When the table is pickled only the name of
+    the block and the other columns are sent, and the unpickled table attaches
+    to the same block. Then, many processes can use the same table holding a
+    single copy of its data. The records are built from the columns when they
+    are accessed.
+
+    The process that creates the table owns the block. It must call unlink 
+    when no process needs the table anymore. The tables are created with the
+    share method of the tables, or the records that contain them.
+    '''
+    def __init__(self, table:TableType):
+        from multiprocessing import shared_memory
+        dtype = table._TableType__data_dtype
+        rows = [record._values for record in table]
+        n_records = len(rows)
+        spec = []
+        blocks = []
+        size = 0
+        for par_dtype, column in zip(dtype.dtypes.values(), zip(*rows)):
+            if any(value is _UNSET for value in column):
+                spec.append(("values", column))
+                continue
+            elif _single_value(column):
+                spec.append(("value", column[0]))
+                continue
+            elif par_dtype is NumberType:
+                block = np.array(column, dtype=np.float64)
+                spec.append(("number", size))
+            elif par_dtype is DateType:
+                block = np.array(
+                    [value.toordinal() for value in column], dtype=np.int32
+                )
+                spec.append(("date", size))
+            else:
+                spec.append(("values", column))
+                continue
+            blocks.append((size, block))
+            size += -(-block.nbytes // 8) * 8 # Blocks are 8-byte aligned
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for offset, block in blocks:
+            np.ndarray(
+                block.shape, block.dtype, buffer=shm.buf, offset=offset
+            )[:] = block
+        self._attach(dtype, n_records, spec, shm, owner=True)
+
+    def _attach(self, dtype, n_records, spec, shm, owner):
+        TableType.__init__(self, None, dtype)
+        columns = []
+        for kind, column in spec:
+            if kind == "number":
+                column = np.ndarray(
+                    (n_records,), np.float64, buffer=shm.buf, offset=column
+                )
+            elif kind == "date":
+                column = np.ndarray(
+                    (n_records,), np.int32, buffer=shm.buf, offset=column
+                )
+            columns.append((kind, column))
+        self._shm = shm
+        self._spec = spec
+        self._owner = owner
+        self._columns = columns
+        self._TableType__data = _SharedRows(dtype, columns, n_records)
+        self._TableType__frozen = True
+
+    @property
+    def dtype(self):
+        return self._TableType__data_dtype
+
+    @property
+    def name(self):
+        """
+        Name of the shared memory block.
+        """
+        return self._shm.name
+
+    def __reduce__(self):
+        return (_attach_shared_table, (
+            self.dtype, len(self), self._spec, self._shm.name
+        ))
+
+    def _copy(self):
+        """
+        Returns a mutable copy of the table, not stored in shared memory.
+        """
+        return TableType(list(self), self.dtype)
+
+    def _frozen_copy(self):
+        return self
+
+    def share(self):
+        return self
+
+    def to_dataframe(self):
+        """
+        Returns the table as a pandas DataFrame. The number columns are 
+        copied from the shared memory block.
+        """
+        if len(self) == 0:
+            return DataFrame()
+        columns = {}
+        for name, (kind, column) in zip(self.dtype.dtypes, self._columns):
+            if kind == "number":
+                columns[name] = column.copy()
+            elif kind == "date":
+                columns[name] = [
+                    date.fromordinal(value) for value in column.tolist()
+                ]
+            elif kind == "value":
+                columns[name] = [column] * len(self)
+            elif any(value is _UNSET for value in column):
+                raise KeyError(name)
+            else:
+                columns[name] = list(column)
+        return DataFrame(columns)
+
+    def close(self):
+        """
+        Detaches the table from the shared memory block. The table can't be 
+        used after it is closed.
+        """
+        self._columns = []
+        self._TableType__data = _SharedRows(self.dtype, [], 0)
+        self._shm.close()
+
+    def unlink(self):
+        """
+        Closes and destroys the shared memory block. It must be called only 
+        once, by the process that created the table.
+        """
+        assert self._owner, \
+            "Only the process that created the table can unlink it"
+        self.close()
+        self._shm.unlink()
+
+
+def _attach_shared_table(dtype, n_records, spec, name):
+    """
+    Reconstructs a pickled SharedTable, attaching it to its shared memory 
+    block.
+    """
+    from multiprocessing import shared_memory
+    table = SharedTable.__new__(SharedTable)
+    table._attach(
+        dtype, n_records, spec, shared_memory.SharedMemory(name=name),
+        owner=False
+    )
+    return table
+
+def _parse_column(dtype, name, column):
+    """
+    Parses a DataFrame column and returns the list of raw values of the 
+    parameter.
+    """
+    if (dtype is NumberType) and is_numeric_dtype(column):
+        values = column.to_numpy(dtype=float, na_value=np.nan)
+        values = np.where(values == -99., np.nan, values)
+        return values.tolist()
+    if (dtype is DateType) and is_datetime64_any_dtype(column) \
+            and not column.isna().any():
+        return list(column.dt.date)
+    # Other columns are parsed once per unique value
+    parsed = {}
+    values = []
+    for value in column.tolist():
+        key = (type(value), value)
+        if key not in parsed:
+            parsed[key] = dtype._parse(name, value)
+        values.append(parsed[key])
+    return values
+
+def _records_from_dataframe(df, dtype):
+    """
+    Returns the list of dtype records for the rows of the DataFrame. The 
+    parameters that are not columns of the DataFrame are set as missing.
+    """
+    columns = []
+    for name, par_dtype in dtype.dtypes.items():
+        if name in df.columns:
+            columns.append(_parse_column(par_dtype, name, df[name]))
+        else:
+            columns.append([par_dtype._parse(name, None)] * len(df))
+    return [dtype._from_raw(values) for values in zip(*columns)]
+
+
+CACHED_WRITERS = ("_write_section", "_write_wth", "_write_sol")
+
+class FrozenState:
+    """
+    State of a frozen record: its content key, digest, and the cache of its
+    written sections.
+    """
+    __slots__ = ("key", "digest", "cache")
+    def __init__(self):
+        self.key = None
+        self.digest = None
+        self.cache = {}
+
+
+def _cached_writer(method):
+    """
+    Caches the output of a writer method for frozen records.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._frozen is None:
+            return method(self, *args, **kwargs)
+        key = (method.__qualname__, args, tuple(sorted(kwargs.items())))
+        cache = self._frozen.cache
+        if key not in cache:
+            cache[key] = method(self, *args, **kwargs)
+        return cache[key]
+    return wrapper
+
+
 class Record(MutableMapping):
     """
     Generic class to handle a single fileX, WTH, CUL, ECO, or SOL row. The name 
@@ -487,84 +1273,262 @@ class Record(MutableMapping):
     pars_fmt:dict # Format of each parameter
     n_tiers:int = 1 # Number of tiers. Sections like Field have more than one
     table_index:str = None # Needed for records within tables
+    _layout:RecordLayout # Compiled pars_fmt, created with the class
+    _index:dict # Position of each parameter in the values list
+    # The values are stored as a list of raw values (float, str, date). They
+    # are wrapped in their value type only when they are accessed.
+    # _frozen is None, or the FrozenState of the records returned by freeze()
+    __slots__ = ("_values", "_frozen")
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "pars_fmt" in cls.__dict__:
+            cls._layout = RecordLayout(cls.pars_fmt)
+        if "dtypes" in cls.__dict__:
+            cls._index = {name: n for n, name in enumerate(cls.dtypes)}
+        for name in CACHED_WRITERS:
+            if name in cls.__dict__:
+                setattr(cls, name, _cached_writer(cls.__dict__[name]))
+
     def __init__(self):
-        self.__data = {}
+        self._values = [_UNSET] * len(self._index)
+        self._frozen = None
         super().__init__()
         
     def __len__(self):
-        return len(self.__data)
+        return sum(value is not _UNSET for value in self._values)
 
     def __iter__(self):
-        return iter(self.__data)
+        values = self._values
+        return (
+            name for name, n in self._index.items() 
+            if values[n] is not _UNSET
+        )
 
     def __setitem__(self, key, value):
+        if self._frozen is not None:
+            raise TypeError(f"{type(self).__name__} is frozen")
         key = key.lower()
         if key not in self.dtypes:
             raise KeyError(key)
-        if isinstance(self.dtypes[key], tuple): # Field objects
+        dtype = self.dtypes[key]
+        if isinstance(dtype, tuple): # Field objects
             if issubclass(type(value), Record):
-                assert isinstance(value, self.dtypes[key][1])
-                self.__data[key] = value
+                assert isinstance(value, dtype[1])
             else:
-               self.__data[key] = self.dtypes[key][0](
-                f'{key}', value, self.pars_fmt[key]
-            )
-        elif self.dtypes[key] is Record: # Crop objects
-            self.__data[key] = value
+                value = dtype[0]._parse(key, value)
+        elif dtype is Record: # Crop objects
+            pass
         else:
-            self.__data[key] = self.dtypes[key](
-                f'{key}', value, self.pars_fmt[key]
-            )
+            value = dtype._parse(key, value)
+        self._values[self._index[key]] = value
 
     def __delitem__(self, k):
         raise NotImplementedError
 
     def __getitem__(self, key):
         key = key.lower()
-        return self.__data[key]
+        value = self._values[self._index[key]] if key in self._index else _UNSET
+        if value is _UNSET:
+            raise KeyError(key)
+        dtype = self.dtypes[key]
+        if isinstance(dtype, tuple): # Field objects
+            if isinstance(value, Record):
+                return value
+            dtype = dtype[0]
+        elif dtype is Record: # Crop objects
+            return value
+        return dtype._wrap(key, value, self._layout[key])
 
     def __contains__(self, k):
-        return k in self.__data
+        return (k in self._index) and (self._values[self._index[k]] is not _UNSET)
     
     def __setattr__(self, name, value):
         if name in PROTECTED_ATTRS:
             raise AttributeError(f"Can't modify {name} attribute")
+        elif getattr(self, "_frozen", None) is not None:
+            raise TypeError(f"{type(self).__name__} is frozen")
         else:
             super().__setattr__(name, value)
+
+    def __reduce__(self):
+        # Records are pickled as their class and their raw values
+        return (_restore_record, (
+            type(self), tuple(self._values), getattr(self, "__dict__", None),
+            self._frozen is not None
+        ))
+
+    def __eq__(self, other):
+        if isinstance(other, Record) and (self._frozen is not None) \
+                and (other._frozen is not None):
+            return self.digest() == other.digest()
+        return super().__eq__(other)
+
+    def __hash__(self):
+        if self._frozen is None:
+            raise TypeError(
+                f"unhashable type: '{type(self).__name__}'. "
+                "Use freeze() to get a hashable snapshot"
+            )
+        return hash(self.digest())
+
+    @property
+    def frozen(self):
+        """
+        True if the record is an immutable snapshot returned by freeze().
+        """
+        return self._frozen is not None
+
+    def freeze(self):
+        """
+        Returns an immutable and hashable snapshot of the record. The records 
+        within it (e.g. the weather station and soil profile of a Field, or
+        the table records) are frozen as well. The snapshot can be safely
+        shared across treatments and processes. Its content digest and its
+        written sections are computed only once. If the record is already 
+        frozen, the same record is returned.
+        """
+        if self._frozen is not None:
+            return self
+        record = self._snapshot()
+        record._frozen = FrozenState()
+        return record
+
+    def evolve(self, **changes):
+        """
+        Returns a copy of the record with the passed parameters changed. Only
+        the changed parameters are validated, and the unchanged values are
+        shared with the original record. If the record is frozen, the copy is
+        frozen too.
+            >>> late_planting = planting.evolve(pdate=date(2020, 4, 1))
+        """
+        record = self._copy()
+        for key, value in changes.items():
+            record[key] = value
+        if self._frozen is not None:
+            return record.freeze()
+        return record
+
+    def _copy(self):
+        """
+        Returns a mutable shallow copy of the record.
+        """
+        record = type(self).__new__(type(self))
+        record._values = list(self._values)
+        record._frozen = None
+        if hasattr(self, "__dict__"):
+            record.__dict__.update(self.__dict__)
+        return record
+
+    def _snapshot(self):
+        """
+        Returns a copy of the record, where the records within it are frozen.
+        """
+        record = type(self).__new__(type(self))
+        record._values = [
+            value.freeze() if isinstance(value, Record) else value
+            for value in self._values
+        ]
+        record._frozen = None
+        if hasattr(self, "__dict__"):
+            record.__dict__.update(self.__dict__)
+        return record
+
+    def _content_key(self):
+        """
+        Returns a tuple that represents the content of the record.
+        """
+        if (self._frozen is not None) and (self._frozen.key is not None):
+            return self._frozen.key
+        key = (type(self).__name__, tuple(
+            value._content_key() if isinstance(value, Record)
+            else (None if value is _UNSET else value)
+            for value in self._values
+        ))
+        if self._frozen is not None:
+            self._frozen.key = key
+        return key
+
+    def digest(self):
+        """
+        Returns the SHA1 digest of the record content. Records with the same 
+        content have the same digest. For frozen records it is computed only
+        once.
+        """
+        if (self._frozen is not None) and (self._frozen.digest is not None):
+            return self._frozen.digest
+        digest = hashlib.sha1(repr(self._content_key()).encode()).hexdigest()
+        if self._frozen is not None:
+            self._frozen.digest = digest
+        return digest
     
     def __repr__(self):
         kws = [f"{key}={self[key]!r}" for key in self.dtypes.keys()]
         return "{}({})".format(type(self).__name__, ", ".join(kws))
     
     def parameters(self):
-        return self.__data
+        return {name: self[name] for name in self}
+
+    @classmethod
+    def _from_raw(cls, values):
+        """
+        Creates a record from its raw values, in the dtypes order. The values 
+        are not validated.
+        """
+        record = cls.__new__(cls)
+        record._values = list(values)
+        record._frozen = None
+        return record
+
+    def _raw(self, name):
+        """
+        Returns the raw value of the parameter, without its value type.
+        """
+        value = self._values[self._index[name]]
+        if value is _UNSET:
+            raise KeyError(name)
+        return value
+
+    def _render(self, name):
+        """
+        Returns the string of the parameter value as written in the files.
+        """
+        value = self._raw(name)
+        dtype = self.dtypes[name]
+        if isinstance(dtype, tuple): # Field objects
+            dtype = Record if isinstance(value, Record) else dtype[0]
+        if dtype in VALUE_TYPES:
+            return dtype._render(value, self._layout[name])
+        return value.str
     
     def _write_row(self):
         return " ".join([
-            self[name].str for name in self.dtypes.keys()
+            self._render(name) for name in self.dtypes.keys()
             if name != "table"
         ]) + "\n"
     
-    def _write_section(self):
-        header = ["@"+self.prefix.upper()]
-        for key, fmt in self.pars_fmt.items():
-            if fmt == "%y%j":
-                fmt = ">5"
-            if fmt == "%Y%j":
-                fmt = ">7"
-            if fmt[0] == ".":
-                leading = "."
-                fmt = fmt[1:]
-            else:
-                leading = ""
-            fmt = leading + fmt.split(".")[0]
-            header.append(format(key.upper(), fmt))
+    @_cached_writer
+    def _write_section(self, level=1):
+        header = ["@"+self.prefix.upper()] + self._layout.header()
         out_str = SECTION_HEADERS[type(self).__name__] + "\n"
-        out_str += " ".join(header) + "\n" + " "*len(self.prefix) + "1 " + \
-              self._write_row()
+        out_str += " ".join(header) + "\n" + \
+            f"{level:>{len(self.prefix) + 1}d} " + self._write_row()
         return out_str
     
 
+def _restore_record(cls, values, state=None, frozen=False, table=None):
+    """
+    Reconstructs a pickled Record instance.
+    """
+    record = cls._from_raw(values)
+    if state:
+        record.__dict__.update(state)
+    if table is not None:
+        Record.__setattr__(record, "table", table)
+    if frozen:
+        record._frozen = FrozenState()
+    return record
+
+
 class TabularRecord(Record):
     '''
     Basically the same as record, with a table attribute. The table is list of 
@@ -572,6 +1536,7 @@ class TabularRecord(Record):
     '''
     table_dtype:Type # Data type contained in the table
     table:TableType # The table
+    __slots__ = ("table",)
     def __init__(self):
         super().__init__()
         self.table = []
@@ -585,20 +1550,90 @@ class TabularRecord(Record):
     
     def __setattr__(self, name, value):
         if name == "table":
-            table = TableType(value, self.table_dtype)
+            if isinstance(value, SharedTable) and \
+                    (value.dtype is self.table_dtype):
+                table = value
+            else:
+                table = TableType(value, self.table_dtype)
             super().__setattr__(name, table)
         else:
             super().__setattr__(name, value)
 
-    def _write_section(self):
-        out_str = super()._write_section()
+    def evolve(self, **changes):
+        """
+        Returns a copy of the section with the passed parameters changed. The
+        table can be changed by passing the table parameter. Otherwise, the 
+        table records are shared with the original section.
+        """
+        table = changes.pop("table", None)
+        if (self._frozen is not None) and (table is None):
+            # Frozen tables are immutable, so the copy uses the same table
+            record = Record._copy(self)
+            Record.__setattr__(record, "table", self.table)
+        else:
+            record = self._copy()
+            if table is not None:
+                record.table = table
+        for key, value in changes.items():
+            record[key] = value
+        if self._frozen is not None:
+            return record.freeze()
+        return record
+
+    def _copy(self):
+        record = super()._copy()
+        Record.__setattr__(record, "table", self.table._copy())
+        return record
+
+    def __reduce__(self):
+        return (_restore_record, (
+            type(self), tuple(self._values), getattr(self, "__dict__", None),
+            self._frozen is not None, self.table
+        ))
+
+    def _snapshot(self):
+        record = super()._snapshot()
+        Record.__setattr__(record, "table", self.table._frozen_copy())
+        return record
+
+    def share(self):
+        """
+        Returns a frozen copy of the record where the table is stored in a 
+        shared memory block (see SharedTable). Pickling the copy only sends a
+        handle to the block, so many worker processes can use the same 
+        weather station or soil profile holding a single copy of its data:
+            >>> shared_station = weather_station.share()
+            >>> with ProcessPoolExecutor(64) as pool:
+            >>>     results = pool.map(run_year, repeat(shared_station), years)
+            >>> shared_station.table.unlink()
+        
+        The process that calls share owns the block, and it must unlink it 
+        once the workers are done.
+        """
+        if isinstance(self.table, SharedTable) and (self._frozen is not None):
+            return self
+        record = Record._snapshot(self)
+        Record.__setattr__(record, "table", self.table.share())
+        record._frozen = FrozenState()
+        return record
+
+    def _content_key(self):
+        if (self._frozen is not None) and (self._frozen.key is not None):
+            return self._frozen.key
+        key = super()._content_key() + (self.table._content_key(),)
+        if self._frozen is not None:
+            self._frozen.key = key
+        return key
+
+    def _write_section(self, level=1):
+        out_str = super()._write_section(level)
         if len(self.dtypes) == 0:
             out_str = out_str.split("\n")[0]
             out_str += "\n"
         table_str = self.table._write_table().split("\n")
         out_str += f"@{self.prefix.upper()} {table_str[0]}\n"
         for row in table_str[1:-1]: # Table string ends with \n
-            out_str += " "*len(self.prefix) + f"1 {row}\n"
+            out_str += f"{level:>{len(self.prefix) + 1}d} {row}\n"
         return out_str
     
     def __bool__(self):
@@ -609,57 +1644,44 @@ class TabularRecord(Record):
         Returns the table as a pandas DataFrame. Useful to get the WeatherStation
         or SoilProfile data as a DataFrame
         """
-        if not self.table:
-            return DataFrame()
-
-        data = []
-        for record_element in self.table:
-            row_data = {}
-            for key in record_element.dtypes.keys():
-                value = record_element[key]
-                # Extract the actual value from the custom type objects
-                if isinstance(value, (DateType, CodeType, NumberType, DescriptionType)):
-                    row_data[key] = date(value.year, value.month, value.day) if isinstance(value, DateType) else value
-                elif isinstance(value, (date, datetime)):
-                    row_data[key] = value
-                else:
-                    row_data[key] = value
-            data.append(row_data)
-        return DataFrame(data)
+        return self.table.to_dataframe()
 
 
 def parse_pars_line(line, fmt):
     """
-    A Parser for crop parameters 
+    A Parser for crop parameters. fmt is the RecordLayout or the pars_fmt
+    dict of the parameters in the line.
     """
-    line = line[:]
-    pars = {}
-    for par, f in fmt.items():
-        if f == '%y%j':
-            f = '>5'
-        if f[0] == ".":
-            f = f[1:] # Remove point
-        f = f[1:] # Remove right or left justifier
-        width = int(f.split(".")[0])
-        pars[par] = line[:width].strip()
-        line = line[width+1:]
-    return pars
+    return as_layout(fmt).parse(line)
 
-def _get_croppars(spe_path, code, dtypes_dict, pars_fmt_dict, par_prefix):
+CROPPARS_CLASSES = {} # CropPars classes, by crop class and parameters prefix
+
+def _croppars_class(crop_class, par_prefix):
     """
-    It constructs and returns a CropPars instance for the Cultivar and Ecotype
-    parameters
+    Returns the CropPars class for the Cultivar or Ecotype parameters of a 
+    crop class. The class is created only once, and it is registered so the
+    CropPars instances can be pickled.
     """
     assert par_prefix in ("var#", "eco#")
+    key = (crop_class, par_prefix)
+    if key in CROPPARS_CLASSES:
+        return CROPPARS_CLASSES[key]
+    spe_path = crop_class.spe_path
+    if par_prefix == "var#":
+        dtypes_dict, pars_fmt_dict = crop_class.cul_dtypes, crop_class.cul_pars_fmt
+    else:
+        dtypes_dict, pars_fmt_dict = crop_class.eco_dtypes, crop_class.eco_pars_fmt
+
     class CropPars(Record):
         """
         Generic class for Crop parameters
         """
         prefix = par_prefix
-        _code = code
+        _crop_class = crop_class
         dtypes = dtypes_dict
         pars_fmt = pars_fmt_dict
-        def __init__(self):
+        def __init__(self, code):
+            self._code = code
             if self.prefix == "var#":
                 file_path = spe_path[:-3] + "CUL"
             else: 
@@ -685,7 +1707,7 @@ def _get_croppars(spe_path, code, dtypes_dict, pars_fmt_dict, par_prefix):
                     "eco#": f"Ecotype {code} not in {file_path} file"
                 }[self.prefix])
             
-            kwargs = parse_pars_line(line[7:], self.pars_fmt)
+            kwargs = parse_pars_line(line[7:], self._layout)
             super().__init__()
             for name, value in kwargs.items():
                 if name != "eco#":
@@ -696,31 +1718,58 @@ def _get_croppars(spe_path, code, dtypes_dict, pars_fmt_dict, par_prefix):
         def _write_section(self):
             raise NotImplementedError
 
+        def _write_line(self):
+            return f"{self._code} " + self._write_row()
+
         def _write_file(self):
             out_str = self._file_header
             out_str += f"\n@{self.prefix.upper()} "
-            for key, fmt in self.pars_fmt.items():
-                if fmt[0] == ".":
-                    leading = "."
-                    fmt = fmt[1:]
-                else:
-                    leading = ""
-                fmt = leading + fmt.split(".")[0]
+            for key, field in self._layout.fields.items():
+                fmt = field.leading + field.header_fmt
                 if key == 'maxparce': # This is spacial case for SugarCane CANEGRO CUL
                     out_str += f" {format('MaxPARCE', fmt)}"
                 elif key[:5] == 'tfin_': # This is spacial case for SugarCane CANEGRO ECO
                     out_str += f" {format('TFin_'+key[5:].upper(), fmt)}"
                 else:
                     out_str += f" {format(key.upper(), fmt)}"
-            out_str += f"\n{self._code} "
-            out_str += self._write_row()
+            out_str += "\n" + self._write_line()
             return out_str
 
+        def __reduce__(self):
+            return (_restore_croppars, (
+                self._crop_class, self.prefix, tuple(self._values),
+                self.__dict__, self._frozen is not None
+            ))
+
         @property
         def str(self):
             return str(self._code)
     
-    return CropPars()
+    return CROPPARS_CLASSES.setdefault(key, CropPars)
+
+def _get_croppars(crop_class, code, par_prefix):
+    """
+    It constructs and returns a CropPars instance for the Cultivar and Ecotype
+    parameters
+    """
+    return _croppars_class(crop_class, par_prefix)(code)
+
+def _restore_croppars(crop_class, par_prefix, values, state, frozen):
+    """
+    Reconstructs a pickled CropPars instance.
+    """
+    return _restore_record(
+        _croppars_class(crop_class, par_prefix), values, state, frozen
+    )
+
+def _restore_crop(crop_class, cultivar):
+    """
+    Reconstructs a pickled Crop instance.
+    """
+    crop = crop_class.__new__(crop_class)
+    crop._Crop__cultivar = cultivar
+    return crop
+
 
 
 class Crop(MutableMapping):
@@ -736,14 +1785,10 @@ class Crop(MutableMapping):
     eco_dtypes:dict
     eco_pars_fmt:dict
     def __init__(self, cultivar_code):
-        self.__cultivar = _get_croppars(
-            self.spe_path, cultivar_code, self.cul_dtypes, self.cul_pars_fmt, 
-            "var#"
-        )
+        self.__cultivar = _get_croppars(type(self), cultivar_code, "var#")
         if self.eco_dtypes:
             self.__cultivar["eco#"] = _get_croppars(
-                self.spe_path, self.__cultivar._ecocode, self.eco_dtypes, 
-                self.eco_pars_fmt, "eco#"
+                type(self), self.__cultivar._ecocode, "eco#"
             )
         else:
             self.__cultivar["eco#"] = self.__cultivar._ecocode
@@ -752,6 +1797,9 @@ class Crop(MutableMapping):
     def __repr__(self):
         return self.__cultivar.__repr__()
 
+    def __reduce__(self):
+        return (_restore_crop, (type(self), self.__cultivar))
+
     def __len__(self):
         return len(self.__cultivar)
 
@@ -778,7 +1826,24 @@ class Crop(MutableMapping):
         else:
             super().__setattr__(name, value)
     
-    def _write_section(self):
+    def evolve(self, eco:dict=None, **changes):
+        """
+        Returns a copy of the crop with the passed cultivar parameters
+        changed. The ecotype parameters are changed by passing them in the eco
+        dict. The CUL and ECO files are not read again, and only the changed 
+        parameters are validated.
+            >>> new_crop = crop.evolve(p1=250, eco={"topt": 35})
+        """
+        cultivar = self.__cultivar.evolve(**changes)
+        if self.eco_dtypes:
+            cultivar["eco#"] = self.__cultivar["eco#"].evolve(**(eco or {}))
+        else:
+            assert not eco, f"{type(self).__name__} has no ecotype parameters"
+        crop = type(self).__new__(type(self))
+        crop.__cultivar = cultivar
+        return crop
+
+    def _write_section(self, level=1):
         out_str = "*CULTIVARS\n@C CR INGENO CNAME\n"
         cr = self.code
         ingeno = self.__cultivar.str
@@ -788,7 +1853,7 @@ class Crop(MutableMapping):
             cname = self.__cultivar['var-name']
         else:
             raise RuntimeError
-        out_str += f" 1 {cr:>2} {ingeno:>6} {cname:<16}\n"
+        out_str += f"{level:>2d} {cr:>2} {ingeno:>6} {cname:<16}\n"
         return out_str
     
     def _write_eco(self):
@@ -796,6 +1861,18 @@ class Crop(MutableMapping):
     
     def _write_cul(self):
         return self.__cultivar._write_file()
+
+    def _write_eco_line(self):
+        """
+        Returns only the ecotype row, without the ECO file header.
+        """
+        return self.__cultivar["eco#"]._write_line()
+
+    def _write_cul_line(self):
+        """
+        Returns only the cultivar row, without the CUL file header.
+        """
+        return self.__cultivar._write_line()
     
     @classmethod
     def cultivar_list(cls):
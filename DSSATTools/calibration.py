@@ -0,0 +1,395 @@
+'''
+This module implements the calibration of the cultivar and ecotype parameters
+against observed data. The Calibration class receives the treatments, the
+observed data for each treatment, and the bounds of the parameters to
+calibrate. Two methods are implemented: GLUE (Generalized Likelihood
+Uncertainty Estimation), and differential evolution.
+
+The observed data of a treatment is a dictionary that maps the variable name to
+its observed value. Variables of the model standard output (e.g. harwt, mat)
+are single values. Variables of the output tables are named as Table.VAR (e.g.
+PlantGro.LAID), and their observed values are a pandas Series indexed by date.
+The read_filea and read_filet functions read the observed data from the DSSAT
+FileA and FileT:
+    >>> observed = read_filet("BRPI0202.MZT", trno=1)
+    >>> calibration = Calibration(
+    >>>     treatments=treatment,
+    >>>     observed={
+    >>>         "harwt": 3676, "PlantGro.LAID": observed["LAID"]
+    >>>     },
+    >>>     bounds={"p1": (150, 300), "g2": (600, 900)}
+    >>> )
+    >>> population = calibration.differential_evolution(maxiter=30)
+    >>> calibration.best # Parameters with the lowest objective
+    >>> calibration.close()
+
+The candidates of each iteration are run in parallel. Each worker writes the
+FileX, soil and weather files once, and then only the CUL and ECO files are
+written for each candidate. The objective of each candidate is cached, so a
+candidate is not run twice.
+'''
+
+import numpy as np
+import pandas as pd
+
+from .run import DSSATPool, _copy_crop, _set_crop_parameters
+from .base.utils import detect_encoding
+
+
+def _rmse(observed, simulated):
+    return np.sqrt(np.mean((simulated - observed)**2))
+
+def _nrmse(observed, simulated):
+    return _rmse(observed, simulated) / np.abs(np.mean(observed))
+
+def _mae(observed, simulated):
+    return np.mean(np.abs(simulated - observed))
+
+OBJECTIVES = {"rmse": _rmse, "nrmse": _nrmse, "mae": _mae}
+
+
+def _read_observed(file, trno):
+    """
+    Reads the rows of a treatment from a FileA or FileT. Returns a list with
+    one DataFrame per table in the file.
+    """
+    encoding = detect_encoding(file)
+    with open(file, "r", encoding=encoding) as f:
+        lines = f.readlines()
+    tables = []
+    header = None
+    for line in lines:
+        if line[:1] == "@":
+            header = line[1:].split()
+            tables.append([])
+        elif header and line.strip() and line[:1] not in ("!", "*", "$"):
+            values = line.split()
+            if int(values[0]) == trno:
+                tables[-1].append(dict(zip(header, values)))
+    tables = [pd.DataFrame(table) for table in tables if table]
+    assert tables, f"Treatment {trno} is not in {file}"
+    return tables
+
+def _to_number(value):
+    try:
+        value = float(value)
+    except ValueError:
+        return value
+    return np.nan if value == -99 else value
+
+def read_filea(file:str, trno:int=1):
+    '''
+    Reads the observed data of a treatment from a FileA (e.g. BRPI0202.MZA).
+    Returns a dictionary that maps the variable name to its value. Missing
+    values (-99) are NaN.
+    '''
+    observed = {}
+    for table in _read_observed(file, trno):
+        observed.update({
+            name: _to_number(value)
+            for name, value in table.iloc[0].items() if name != "TRNO"
+        })
+    return observed
+
+def read_filet(file:str, trno:int=1):
+    '''
+    Reads the observed data of a treatment from a FileT (e.g. BRPI0202.MZT).
+    Returns a DataFrame indexed by date, with one column per variable.
+    Missing values (-99) are NaN.
+    '''
+    dfs = []
+    for table in _read_observed(file, trno):
+        dates = table.pop("DATE")
+        dates = pd.to_datetime(
+            dates.map(lambda x: x if len(x) == 7 else
+                      ("19" if int(x[:2]) > 50 else "20") + x),
+            format="%Y%j"
+        )
+        table = table.drop(columns="TRNO").apply(lambda x: x.map(_to_number))
+        table.index = dates
+        dfs.append(table)
+    df = pd.concat(dfs, axis=1)
+    return df.loc[:, ~df.columns.duplicated()].astype(float)
+
+def _simulated(dssat, result, observed):
+    """
+    Returns the simulated values for the observed variables after a run.
+    """
+    simulated = {}
+    for name, values in observed.items():
+        if "." in name:
+            table, variable = name.split(".", 1)
+            df = dssat._output.get(table)
+            if df is None or variable not in df.columns:
+                simulated[name] = np.full(len(values), np.nan)
+            else:
+                simulated[name] = df[variable][
+                    ~df.index.duplicated(keep="last")
+                ].reindex(values.index).values.astype(float)
+        else:
+            value = result.get(name.lower())
+            simulated[name] = np.nan if value is None else float(value)
+    return simulated
+
+
+class Calibration:
+    '''
+    Class that represents the calibration of the cultivar and ecotype
+    parameters of a crop. It keeps a pool of simulation environments, so the
+    input files are written only once. The calibration should be closed after
+    using it.
+    '''
+    def __init__(self, treatments, observed, bounds:dict, objective="nrmse",
+                 n_workers:int=None, run_path:str=None, **pool_kwargs):
+        """
+        Initializes the calibration.
+
+        Arguments
+        ----------
+        treatments: dict or list of dict
+            The DSSAT.run_treatment parameters of each treatment. All the
+            treatments must have the same cultivar.
+        observed: dict or list of dict
+            The observed data of each treatment. It maps the variable name to
+            its observed value, or a pandas Series indexed by date for the
+            output table variables (e.g. PlantGro.LAID).
+        bounds: dict
+            Maps the cultivar or ecotype parameter name to its (lower, upper)
+            bounds.
+        objective: str or function
+            The objective to minimize. It can be one of 'rmse', 'nrmse' or
+            'mae', or a function objective(observed, simulated) that receives
+            numpy arrays and returns a float. The objective of a candidate is
+            the mean of the objective of all the observed variables.
+        n_workers: int
+            Number of simulations to run in parallel.
+        run_path: str
+            Directory where the simulation environments are created.
+        pool_kwargs:
+            Other DSSATPool arguments, e.g. engine, timeout, nice,
+            pin_workers or tables_only.
+        """
+        if isinstance(treatments, dict):
+            treatments = [treatments]
+        if isinstance(observed, dict):
+            observed = [observed]
+        assert len(treatments) == len(observed), \
+            "There must be observed data for each treatment"
+        assert len(bounds) > 0, "At least one parameter must be defined"
+        for name, (lower, upper) in bounds.items():
+            assert lower < upper, \
+                f"{name} lower bound must be smaller than its upper bound"
+        if isinstance(objective, str):
+            assert objective in OBJECTIVES, \
+                f"objective must be one of {list(OBJECTIVES)} or a function"
+            objective = OBJECTIVES[objective]
+
+        self.treatments = list(treatments)
+        self.observed = [
+            {
+                name: (
+                    pd.Series(values, index=pd.to_datetime(values.index))
+                    .dropna() if isinstance(values, pd.Series) else values
+                )
+                for name, values in obs.items()
+            }
+            for obs in observed
+        ]
+        self.bounds = dict(bounds)
+        self.objective = objective
+        self.lower, self.upper = np.array(
+            list(bounds.values()), dtype=float
+        ).T
+        # The crop is used to build the cache key. Parameters are written with
+        # the CUL and ECO format, so candidates that are written the same are
+        # the same candidate.
+        self._crop = _copy_crop(self.treatments[0]["cultivar"])
+        _set_crop_parameters(
+            self._crop, dict(zip(self.bounds, self.lower))
+        )
+        self._cache = {}
+        self.history = []
+        self._pool = DSSATPool(n_workers, run_path, **pool_kwargs)
+
+    def _cache_key(self, parameters:dict):
+        _set_crop_parameters(self._crop, parameters)
+        key = self._crop._write_cul_line()
+        if self._crop.eco_dtypes:
+            key += self._crop._write_eco_line()
+        return key
+
+    def _objective(self, simulated:list):
+        """
+        Returns the objective of a candidate from the simulated values for
+        each treatment.
+        """
+        values = []
+        for obs, sim in zip(self.observed, simulated):
+            if sim is None:
+                return np.inf
+            for name, obs_values in obs.items():
+                obs_values = np.atleast_1d(np.asarray(obs_values, dtype=float))
+                sim_values = np.atleast_1d(sim[name])
+                if np.isnan(sim_values).any():
+                    return np.inf
+                values.append(self.objective(obs_values, sim_values))
+        value = np.mean(values)
+        return value if np.isfinite(value) else np.inf
+
+    def evaluate(self, candidates:list):
+        '''
+        Returns the objective of each candidate. Each candidate is a dictionary
+        with the parameter values. Candidates that were already evaluated are
+        not run again. Failed runs have an infinite objective.
+        '''
+        keys = [self._cache_key(candidate) for candidate in candidates]
+        new = {}
+        for key, candidate in zip(keys, candidates):
+            if key not in self._cache and key not in new:
+                new[key] = candidate
+        simulated = [[] for _ in new]
+        for treatment, observed in zip(self.treatments, self.observed):
+            results = self._pool.run_parameters(
+                treatment, list(new.values()),
+                postprocess=lambda dssat, result, observed=observed:
+                    _simulated(dssat, result, observed)
+            )
+            for sim, result in zip(simulated, results):
+                sim.append(result)
+        for (key, candidate), sim in zip(new.items(), simulated):
+            self._cache[key] = self._objective(sim)
+            self.history.append({**candidate, "objective": self._cache[key]})
+        return np.array([self._cache[key] for key in keys])
+
+    def _candidates(self, x:np.ndarray):
+        """
+        Transforms the unit hypercube samples to parameter dictionaries.
+        """
+        values = self.lower + x * (self.upper - self.lower)
+        return [dict(zip(self.bounds, row)) for row in values]
+
+    @property
+    def best(self):
+        '''
+        Parameters of the candidate with the lowest objective.
+        '''
+        assert self.history, "No candidate has been evaluated"
+        best = min(self.history, key=lambda x: x["objective"])
+        return {name: best[name] for name in self.bounds}
+
+    def glue(self, n_samples:int=1000, behavioral_fraction:float=0.1,
+             shape:float=1., seed:int=None):
+        '''
+        Generalized Likelihood Uncertainty Estimation. The parameters are
+        sampled using Latin hypercube sampling within the bounds. The
+        behavioral candidates are the fraction of candidates with the lowest
+        objective, and their likelihood is proportional to
+        objective^(-2*shape).
+
+        Arguments
+        ----------
+        n_samples: int
+            Number of samples.
+        behavioral_fraction: float
+            Fraction of samples that are considered behavioral.
+        shape: float
+            Shape factor of the likelihood.
+        seed: int
+            Random seed.
+
+        Returns
+        ----------
+        pandas.DataFrame
+            The behavioral candidates, with their objective and likelihood
+            weight, sorted by objective.
+        '''
+        assert 0 < behavioral_fraction <= 1, \
+            "behavioral_fraction must be in the (0, 1] interval"
+        rng = np.random.default_rng(seed)
+        k = len(self.bounds)
+        x = (
+            np.argsort(rng.random((n_samples, k)), axis=0)
+            + rng.random((n_samples, k))
+        ) / n_samples
+        candidates = self._candidates(x)
+        df = pd.DataFrame(candidates)
+        df["objective"] = self.evaluate(candidates)
+        df = df[np.isfinite(df.objective)].sort_values("objective")
+        df = df.iloc[:max(1, int(behavioral_fraction * n_samples))]
+        likelihood = np.maximum(df.objective, 1e-12)**(-2 * shape)
+        df["weight"] = likelihood / likelihood.sum()
+        return df
+
+    def differential_evolution(self, popsize:int=15, maxiter:int=50,
+                               mutation:float=0.8, recombination:float=0.9,
+                               tol:float=1e-4, seed:int=None):
+        '''
+        Minimizes the objective using differential evolution
+        (DE/rand/1/bin). All the candidates of a generation are run in
+        parallel.
+
+        Arguments
+        ----------
+        popsize: int
+            Population size, as a multiple of the number of parameters.
+        maxiter: int
+            Maximum number of generations.
+        mutation: float
+            Mutation constant (F).
+        recombination: float
+            Crossover probability (CR).
+        tol: float
+            The evolution stops when the standard deviation of the population
+            objective is smaller than tol times its mean.
+        seed: int
+            Random seed.
+
+        Returns
+        ----------
+        pandas.DataFrame
+            The final population with its objective, sorted by objective.
+        '''
+        rng = np.random.default_rng(seed)
+        k = len(self.bounds)
+        n = max(popsize * k, 4)
+        population = (
+            np.argsort(rng.random((n, k)), axis=0) + rng.random((n, k))
+        ) / n
+        fitness = self.evaluate(self._candidates(population))
+        for _ in range(maxiter):
+            trials = np.empty_like(population)
+            for i in range(n):
+                r1, r2, r3 = rng.choice(
+                    [j for j in range(n) if j != i], 3, replace=False
+                )
+                mutant = population[r1] + mutation * (
+                    population[r2] - population[r3]
+                )
+                cross = rng.random(k) < recombination
+                cross[rng.integers(k)] = True
+                trials[i] = np.clip(
+                    np.where(cross, mutant, population[i]), 0, 1
+                )
+            trial_fitness = self.evaluate(self._candidates(trials))
+            improved = trial_fitness <= fitness
+            population[improved] = trials[improved]
+            fitness[improved] = trial_fitness[improved]
+            finite = fitness[np.isfinite(fitness)]
+            if len(finite) == n and \
+                    np.std(finite) <= tol * np.abs(np.mean(finite)):
+                break
+        df = pd.DataFrame(self._candidates(population))
+        df["objective"] = fitness
+        return df.sort_values("objective")
+
+    def close(self):
+        '''
+        Removes the simulation environments.
+        '''
+        self._pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
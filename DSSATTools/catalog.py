@@ -0,0 +1,255 @@
+'''
+This module hosts the ExperimentCatalog class. The catalog is an on-disk index
+of the treatments of all the FileX in a directory tree. It stores the metadata
+of each treatment: crop, cultivar, field, weather station, soil, treatment
+name, and start and planting dates. Then, the treatments can be found without
+reading all the files again, and only the matching ones are loaded.
+
+1. Create the catalog and scan the directory. The files are read in parallel,
+and only the files that changed since the last scan are read again:
+    >>> catalog = ExperimentCatalog("experiments.db")
+    >>> catalog.scan("dssat-csm-data", n_workers=8)
+2. Query the treatments. It returns a DataFrame with one row per treatment:
+    >>> treatments = catalog.query(crop="MZ", soil=["IBMZ910014", "IBMZ910214"])
+3. Load the treatments. They are read lazily (see filex.FileX):
+    >>> treatment = catalog.load(treatments.path[0], treatments.trno[0])
+    >>> treatment["Planting"]
+'''
+
+import os
+import fnmatch
+import sqlite3
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .filex import FileX
+from .base.partypes import DateType
+
+FILEX_PATTERN = "*.??X"
+MISSING_VALUES = ("", "-99", "-99.", "-99.0")
+# Metadata of each treatment in the index
+TREATMENT_COLUMNS = [
+    "path", "experiment", "trno", "tname", "crop", "cultivar", "cname",
+    "field", "wsta", "soil", "sdate", "pdate"
+]
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, mtime REAL, size INTEGER, error TEXT
+);
+CREATE TABLE IF NOT EXISTS treatments (
+    path TEXT, experiment TEXT, trno INTEGER, tname TEXT, crop TEXT,
+    cultivar TEXT, cname TEXT, field TEXT, wsta TEXT, soil TEXT, sdate TEXT,
+    pdate TEXT, PRIMARY KEY (path, trno)
+);
+CREATE INDEX IF NOT EXISTS treatments_crop ON treatments (crop);
+CREATE INDEX IF NOT EXISTS treatments_wsta ON treatments (wsta);
+CREATE INDEX IF NOT EXISTS treatments_soil ON treatments (soil);
+"""
+
+
+def _value(values, name, dtype=None):
+    """
+    Returns a parameter value as stored in the index. Missing values are
+    None, and dates are ISO strings.
+    """
+    value = values.get(name)
+    if (value is None) or (value in MISSING_VALUES):
+        return None
+    if dtype is DateType:
+        return DateType._parse(name, value).isoformat()
+    return value
+
+def _scan_file(path):
+    """
+    Returns the metadata rows of the treatments of a FileX. The values are 
+    read as written in the file, so no section object is created. If the 
+    file can't be read, the error message is returned instead.
+    """
+    experiment = os.path.splitext(os.path.basename(path))[0].upper()
+    try:
+        filex = FileX(path)
+        rows = []
+        for trno in filex:
+            levels = filex[trno]._levels
+            values = {
+                name: filex.raw_values(name, level) 
+                for name, level in levels.items()
+            }
+            cultivar = values.get("Cultivar", {})
+            field = values.get("Field", {})
+            rows.append((
+                path, experiment, trno, 
+                _value(filex.raw_values("Treatment", trno), "tname"),
+                _value(cultivar, "cr"), _value(cultivar, "ingeno"),
+                _value(cultivar, "cname"), _value(field, "id_field"),
+                _value(field, "wsta"), _value(field, "id_soil"),
+                _value(
+                    values["SimulationControls"].get("general", {}), "sdate",
+                    DateType
+                ),
+                _value(values.get("Planting", {}), "pdate", DateType)
+            ))
+        return rows, None
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+
+
+class ExperimentCatalog:
+    '''
+    On-disk index of the treatments of a set of FileX. The index is a SQLite
+    database, so it can be reused across sessions.
+    '''
+    def __init__(self, index_path:str):
+        '''
+        Opens the catalog stored in index_path. If the file doesn't exist, an
+        empty catalog is created.
+
+        Arguments
+        ----------
+        index_path: str
+            Path to the index file.
+        '''
+        self.index_path = index_path
+        self._conn = sqlite3.connect(index_path)
+        self._conn.executescript(SCHEMA)
+        self._filex = {}
+
+    def scan(self, root:str, pattern:str=FILEX_PATTERN, n_workers:int=None):
+        '''
+        Indexes all the FileX within the root directory and its
+        subdirectories. Files that didn't change since they were indexed are
+        not read again, and files that don't exist anymore are removed from
+        the index.
+
+        Arguments
+        ----------
+        root: str
+            Directory to scan.
+        pattern: str
+            Pattern of the FileX names. It is case-insensitive.
+        n_workers: int
+            Number of processes used to read the files.
+
+        Returns
+        ----------
+        list
+            Paths of the files that could not be read.
+        '''
+        assert os.path.isdir(root), f"{root} is not a directory"
+        pattern = pattern.upper()
+        paths = {}
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if fnmatch.fnmatch(filename.upper(), pattern):
+                    path = os.path.abspath(os.path.join(dirpath, filename))
+                    stat = os.stat(path)
+                    paths[path] = (stat.st_mtime, stat.st_size)
+        root = os.path.join(os.path.abspath(root), "")
+        indexed = {
+            path: (mtime, size) for path, mtime, size in self._conn.execute(
+                "SELECT path, mtime, size FROM files WHERE substr(path, 1, ?) = ?",
+                (len(root), root)
+            )
+        }
+        removed = [path for path in indexed if path not in paths]
+        changed = [
+            path for path, stat in paths.items() if indexed.get(path) != stat
+        ]
+        if changed:
+            with ProcessPoolExecutor(n_workers) as pool:
+                results = list(pool.map(
+                    _scan_file, changed, chunksize=max(1, len(changed)//64)
+                ))
+        else:
+            results = []
+        failed = []
+        with self._conn:
+            for path in removed + changed:
+                self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                self._conn.execute(
+                    "DELETE FROM treatments WHERE path = ?", (path,)
+                )
+                self._filex.pop(path, None)
+            for path, (rows, error) in zip(changed, results):
+                self._conn.execute(
+                    "INSERT INTO files VALUES (?, ?, ?, ?)",
+                    (path, *paths[path], error)
+                )
+                self._conn.executemany(
+                    f"INSERT INTO treatments VALUES ({', '.join('?'*len(TREATMENT_COLUMNS))})",
+                    rows
+                )
+                if error is not None:
+                    failed.append(path)
+        if failed:
+            warnings.warn(f"{len(failed)} files could not be read")
+        return failed
+
+    def query(self, pdate_from=None, pdate_to=None, **filters):
+        '''
+        Returns the treatments that match the filters, as a DataFrame with
+        one row per treatment.
+
+        Arguments
+        ----------
+        pdate_from, pdate_to: date
+            Range of the planting date.
+        filters:
+            Column values to match (e.g. crop="MZ"). The columns are path,
+            experiment, trno, tname, crop, cultivar, cname, field, wsta, soil,
+            sdate and pdate. A list of values matches any of them.
+        '''
+        conditions, args = [], []
+        for name, value in filters.items():
+            assert name in TREATMENT_COLUMNS, f"{name} is not a catalog column"
+            if isinstance(value, (list, tuple, set)):
+                value = list(value)
+                conditions.append(f"{name} IN ({', '.join('?'*len(value))})")
+                args += value
+            else:
+                conditions.append(f"{name} = ?")
+                args.append(value)
+        if pdate_from is not None:
+            conditions.append("pdate >= ?")
+            args.append(pdate_from.isoformat())
+        if pdate_to is not None:
+            conditions.append("pdate <= ?")
+            args.append(pdate_to.isoformat())
+        sql = "SELECT * FROM treatments"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        df = pd.read_sql_query(sql + " ORDER BY path, trno", self._conn, params=args)
+        for column in ("sdate", "pdate"):
+            df[column] = pd.to_datetime(df[column]).dt.date
+        return df
+
+    def load(self, path:str, trno:int):
+        '''
+        Returns a treatment as a filex.TreatmentView. Its sections are parsed
+        when they are accessed.
+        '''
+        if path not in self._filex:
+            self._filex[path] = FileX(path)
+        return self._filex[path][int(trno)]
+
+    def errors(self):
+        '''
+        Returns the files that could not be read, mapped to their error.
+        '''
+        return dict(self._conn.execute(
+            "SELECT path, error FROM files WHERE error IS NOT NULL"
+        ))
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM treatments").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
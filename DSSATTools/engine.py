@@ -0,0 +1,443 @@
+'''
+This module hosts the engines that run the model in a simulation environment.
+The DSSAT class uses an Engine, which runs the DSSAT-CSM executable shipped
+with DSSATTools by default. A custom executable (e.g. an optimized build of the
+model) is used by passing its engine to DSSAT or DSSATPool:
+    >>> engine = Engine("/opt/dssat/dscsm048", env={"OMP_NUM_THREADS": "1"})
+    >>> dssat = DSSAT(engine=engine)
+
+The engine can limit the model process: a timeout, after which the process is
+killed and a DSSATTimeoutError is raised, the CPUs the process can run on,
+and its niceness:
+    >>> engine = Engine(timeout=60, cpus=[0, 1], nice=10)
+
+While the model runs, the engine can call a monitor function every interval
+seconds. If it returns True, the model is stopped (see DSSATTools.stream).
+
+The StubEngine doesn't run the model. It writes outputs with the format of
+the model outputs, so the time spent by DSSATTools around the model run can
+be measured, or a pool can be load-tested, without the model itself:
+    >>> dssat = DSSAT(engine=StubEngine(delay=0.05))
+'''
+
+import os
+import re
+import time
+import platform
+import subprocess
+
+from . import __file__ as module_path
+from . import VERSION
+
+OS = platform.system().lower()
+BASE_PATH = os.path.dirname(module_path)
+if 'windows' in OS:
+    BIN_PATH = os.path.join(BASE_PATH, 'bin', 'dscsm048.exe')
+else:
+    BIN_PATH = os.path.join(BASE_PATH, 'bin', 'dscsm048')
+
+MONITOR_INTERVAL = 0.5
+# Outputs of the StubEngine
+STUB_DAYS = 150
+STUB_CHUNKS = 10 # Writes of each output file when the run is monitored
+STUB_PLANTGRO_COLUMNS = [
+    "L#SD", "GSTD", "LAID", "LWAD", "SWAD", "GWAD", "RWAD", "VWAD", "CWAD",
+    "G#AD", "GWGD", "HIAD", "PWAD", "WSPD", "WSGD", "NSTD", "LN%D", "SH%D",
+    "SLAD", "CHTD", "RDPD"
+]
+STUB_STDOUT_HEADER = (
+    "RUN    TRT FLO MAT TOPWT HARWT  RAIN  TIRR   CET  PESW  TNUP  TNLF   TSON TSOC\n"
+    "           dap dap kg/ha kg/ha    mm    mm    mm    mm kg/ha kg/ha  kg/ha t/ha"
+)
+STUB_SUMMARY_HEADER = (
+    "@   RUNNO   TRNO R# O# C# CR MODEL... TNAM..................... "
+    "FNAM.... WSTA.... SOIL_ID...    SDAT    PDAT    ADAT    MDAT    HDAT "
+    "   CWAM    HWAM"
+)
+STUB_CSV_KEYS = ["RUN", "EXP", "TR", "RN", "SN", "ON", "REP", "CN"]
+
+
+class DSSATTimeoutError(RuntimeError):
+    '''
+    Raised when the model doesn't finish within the timeout. The model 
+    process is killed before it is raised.
+    '''
+    def __init__(self, command:list, timeout:float, run_path:str, 
+                 stdout:str=""):
+        super().__init__(
+            f"DSSAT execution didn't finish in {timeout} seconds, and it was "
+            f"killed. Command: {' '.join(command)}, run path: {run_path}"
+        )
+        self.command = command
+        self.timeout = timeout
+        self.run_path = run_path
+        self.stdout = stdout
+
+
+class Engine:
+    '''
+    Runs the DSSAT-CSM executable as a subprocess.
+    '''
+    def __init__(self, bin_path:str=None, version:str=VERSION, env:dict=None,
+                 args:list=None, timeout:float=None, cpus:list=None,
+                 nice:int=None):
+        '''
+        Arguments
+        ----------
+        bin_path: str
+            Path to the model executable. By default, the executable shipped
+            with DSSATTools.
+        version: str
+            Model version, e.g. '048'. It's the suffix of the crop model names
+            (e.g. MZCER048) in the configuration file.
+        env: dict
+            Environment variables for the model process. They are added to
+            the variables set by DSSATTools (DSSAT_HOME).
+        args: list
+            Arguments passed to the executable before the run arguments.
+        timeout: float
+            Seconds a run can take. If the model doesn't finish in time, it
+            is killed and DSSATTimeoutError is raised.
+        cpus: list of int
+            CPUs the model process can run on. Only supported where 
+            os.sched_setaffinity is available (e.g. Linux).
+        nice: int
+            Niceness added to the model process. Positive values lower its
+            priority. Only supported where os.setpriority is available.
+        '''
+        assert (cpus is None) or hasattr(os, "sched_setaffinity"), \
+            "CPU affinity is not supported in this platform"
+        assert (nice is None) or hasattr(os, "setpriority"), \
+            "Process niceness is not supported in this platform"
+        self.bin_path = bin_path or BIN_PATH
+        self.version = version
+        self.env = dict(env or {})
+        self.args = list(args or [])
+        self.timeout = timeout
+        self.cpus = None if cpus is None else set(cpus)
+        self.nice = nice
+
+    @property
+    def name(self):
+        '''
+        Name of the executable, as written in the configuration file.
+        '''
+        return os.path.splitext(os.path.basename(self.bin_path))[0]
+
+    def command(self, mode:str, file:str, trno:int=None):
+        '''
+        Returns the command to run the model in mode (e.g. 'C', 'A' or 'Q')
+        for file. trno is the treatment number in the 'C' mode.
+        '''
+        command = [self.bin_path, *self.args, mode, file]
+        if trno is not None:
+            command.append(str(trno))
+        return command
+
+    def run(self, run_path:str, mode:str, file:str, trno:int=None,
+            env:dict=None, timeout:float=None, monitor=None,
+            interval:float=MONITOR_INTERVAL):
+        '''
+        Runs the model in the run_path directory. Returns the
+        subprocess.CompletedProcess, with the standard output as text. 
+        timeout overrides the engine timeout for this run.
+
+        If monitor is passed, it's called every interval seconds while the 
+        model runs. If it returns True, the model process is killed, and the
+        stopped attribute of the returned CompletedProcess is True.
+        '''
+        command = self.command(mode, file, trno)
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        stopped = False
+        with subprocess.Popen(
+                command, cwd=run_path, stdout=subprocess.PIPE, 
+                stderr=subprocess.PIPE, text=True, 
+                env={**(env or {}), **self.env}
+            ) as process:
+            try:
+                self._limit(process.pid)
+                while True:
+                    wait = interval if monitor else None
+                    if deadline is not None:
+                        remaining = max(deadline - time.monotonic(), 0)
+                        wait = remaining if wait is None else min(wait, remaining)
+                    try:
+                        stdout, stderr = process.communicate(timeout=wait)
+                        break
+                    except subprocess.TimeoutExpired:
+                        if (deadline is not None) and \
+                                (time.monotonic() >= deadline):
+                            raise
+                        if monitor():
+                            process.kill()
+                            stdout, stderr = process.communicate()
+                            stopped = True
+                            break
+            except subprocess.TimeoutExpired:
+                process.kill()
+                stdout, _ = process.communicate()
+                raise DSSATTimeoutError(command, timeout, run_path, stdout)
+            except BaseException:
+                process.kill()
+                raise
+        completed = subprocess.CompletedProcess(
+            command, process.returncode, stdout, stderr
+        )
+        completed.stopped = stopped
+        return completed
+
+    def _limit(self, pid:int):
+        '''
+        Sets the CPU affinity and niceness of the model process. They are set
+        after the process starts, as preexec_fn is not safe with threads.
+        '''
+        try:
+            if self.cpus is not None:
+                os.sched_setaffinity(pid, self.cpus)
+            if self.nice is not None:
+                os.setpriority(
+                    os.PRIO_PROCESS, pid, 
+                    os.getpriority(os.PRIO_PROCESS, 0) + self.nice
+                )
+        except ProcessLookupError:
+            # The process already finished
+            pass
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.bin_path!r}, version={self.version!r})"
+
+
+def _filex_treatments(path:str):
+    """
+    Returns the treatment numbers of a FileX.
+    """
+    with open(path) as f:
+        lines = f.read().split("\n")
+    start = [
+        n for n, line in enumerate(lines) if line.startswith("*TREATMENTS")
+    ][0] + 2
+    treatments = []
+    for line in lines[start:]:
+        if not line.strip():
+            break
+        treatments.append(int(line[:2]))
+    return treatments
+
+def _filex_fmopt(path:str):
+    """
+    Returns the output format (FMOPT) of the first simulation controls of a
+    FileX.
+    """
+    with open(path) as f:
+        lines = f.read().split("\n")
+    for n, line in enumerate(lines):
+        if line.startswith("@N OUTPUTS"):
+            return lines[n + 1].split()[-1]
+    return "A"
+
+def _stub_plantgro(runs:list, n_days:int=STUB_DAYS):
+    """
+    Returns the PlantGro.OUT text for a list of (run, trno) tuples.
+    """
+    lines = ["$GROWTH ASPECTS OUTPUT FILE", ""]
+    header = "@YEAR DOY   DAS   DAP" + "".join(
+        f"{column:>7}" for column in STUB_PLANTGRO_COLUMNS
+    )
+    for run, trno in runs:
+        lines += [
+            "*DSSAT Cropping System Model Ver. 4.8.2.000",
+            "",
+            f"*RUN {run:3d}        : STUB",
+            f" TREATMENT{trno:3d}   : STUB",
+            "",
+            header
+        ]
+        for day in range(1, n_days + 1):
+            lines.append(
+                f" 2000 {day:3d} {day:5d} {day:5d}" + "".join(
+                    f"{(n + 1)*day*0.01 + trno:7.2f}"
+                    for n in range(len(STUB_PLANTGRO_COLUMNS))
+                )
+            )
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+def _stub_plantgro_csv(runs:list, n_days:int=STUB_DAYS):
+    """
+    Returns the PlantGro.csv text for a list of (run, trno) tuples. The values
+    are the same of _stub_plantgro.
+    """
+    lines = [",".join(
+        STUB_CSV_KEYS + ["YEAR", "DOY", "DAS", "DAP"] + STUB_PLANTGRO_COLUMNS
+    )]
+    for run, trno in runs:
+        for day in range(1, n_days + 1):
+            lines.append(
+                f"{run},STUB0001,{trno},1,0,1,1,0,2000,{day},{day},{day}," + 
+                ",".join(
+                    f"{(n + 1)*day*0.01 + trno:.2f}"
+                    for n in range(len(STUB_PLANTGRO_COLUMNS))
+                )
+            )
+    return "\n".join(lines) + "\n"
+
+def _stub_stdout(runs:list):
+    """
+    Returns the model standard output for a list of (run, trno) tuples.
+    """
+    return STUB_STDOUT_HEADER + "".join(
+        f"\n{run:3d} MZ {trno:3d}  62 123  8000 {3000 + trno:5d}   843     0"
+        "   398   137   136    80   4004  999"
+        for run, trno in runs
+    )
+
+def _stub_summary_values(run:int, trno:int):
+    """
+    Returns the Summary.OUT values of a run.
+    """
+    return [
+        run, trno, 1, 0, 0, "MZ", "MZCER048", "STUB TREATMENT", "UNCU0001",
+        "UNCU0001", "IBMZ910214", 2000032, 2000061, 2000120, 2000200, 2000214,
+        8000, 3000 + trno
+    ]
+
+def _stub_summary(runs:list):
+    """
+    Returns the Summary.OUT text for a list of (run, trno) tuples.
+    """
+    # Values end where their header ends. Text is left-aligned.
+    ends = [match.end() for match in re.finditer(r"\S+", STUB_SUMMARY_HEADER)]
+    lines = ["*SUMMARY : STUB", "", STUB_SUMMARY_HEADER]
+    for run, trno in runs:
+        line = ""
+        for value, end in zip(_stub_summary_values(run, trno), ends[1:]):
+            if isinstance(value, str):
+                line += " " + f"{value:<{end - len(line) - 1}}"
+            else:
+                line += f"{value:>{end - len(line)}}"
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+def _stub_summary_csv(runs:list):
+    """
+    Returns the Summary.csv text for a list of (run, trno) tuples.
+    """
+    names = [name.strip("@.") for name in STUB_SUMMARY_HEADER.split()]
+    lines = [",".join(name for name in names if name)]
+    for run, trno in runs:
+        lines.append(",".join(map(str, _stub_summary_values(run, trno))))
+    return "\n".join(lines) + "\n"
+
+
+class StubEngine(Engine):
+    '''
+    Engine that doesn't run the model. It writes the standard output,
+    Summary.OUT and PlantGro.OUT of one run per treatment, with the format of
+    the model outputs. If the output format of the FileX (FMOPT) is C, it 
+    writes Summary.csv and PlantGro.csv instead. The values are not
+    simulated, so it's only meant for testing and benchmarking.
+    '''
+    def __init__(self, outputs:dict=None, stdout:str=None, n_days:int=STUB_DAYS,
+                 delay:float=0., timeout:float=None):
+        '''
+        Arguments
+        ----------
+        outputs: dict
+            Canned output files, mapping the file name (e.g. PlantGro.OUT) to
+            its text. If passed, they are written in each run instead of the
+            generated outputs.
+        stdout: str
+            Canned standard output. It must be passed with outputs.
+        n_days: int
+            Days of the generated PlantGro.OUT runs.
+        delay: float
+            Seconds each run takes, to simulate the model run time. If the 
+            run is monitored, the output files are written in STUB_CHUNKS 
+            parts during that time, and the monitor is called after each.
+        timeout: float
+            Seconds a run can take. If delay is longer, DSSATTimeoutError is
+            raised after timeout seconds.
+        '''
+        super().__init__(timeout=timeout)
+        assert (outputs is None) == (stdout is None), \
+            "outputs and stdout must be passed together"
+        self.outputs = outputs
+        self.stdout = stdout
+        self.n_days = n_days
+        self.delay = delay
+
+    def run(self, run_path:str, mode:str, file:str, trno:int=None,
+            env:dict=None, timeout:float=None, monitor=None,
+            interval:float=MONITOR_INTERVAL):
+        timeout = self.timeout if timeout is None else timeout
+        if (timeout is not None) and (self.delay > timeout):
+            time.sleep(timeout)
+            raise DSSATTimeoutError(
+                self.command(mode, file, trno), timeout, run_path
+            )
+        if self.delay and (monitor is None):
+            time.sleep(self.delay)
+        if self.outputs is not None:
+            outputs, stdout = self.outputs, self.stdout
+        else:
+            filex = os.path.join(run_path, file)
+            if mode == "Q":
+                # The FileX is the first one in the batch file
+                with open(filex) as f:
+                    filex = os.path.join(
+                        run_path, f.read().split("\n")[3][:92].strip()
+                    )
+            treatments = [trno] if mode == "C" else _filex_treatments(filex)
+            runs = list(enumerate(treatments, 1))
+            if _filex_fmopt(filex) == "C":
+                outputs = {
+                    "PlantGro.csv": _stub_plantgro_csv(runs, self.n_days),
+                    "Summary.csv": _stub_summary_csv(runs)
+                }
+            else:
+                outputs = {
+                    "PlantGro.OUT": _stub_plantgro(runs, self.n_days),
+                    "Summary.OUT": _stub_summary(runs)
+                }
+            stdout = _stub_stdout(runs)
+        if monitor is None:
+            for filename, text in outputs.items():
+                with open(os.path.join(run_path, filename), "w") as f:
+                    f.write(text)
+            stopped = False
+        else:
+            stopped = self._write_monitored(run_path, outputs, monitor)
+        completed = subprocess.CompletedProcess(
+            self.command(mode, file, trno), 0, 
+            "" if stopped else stdout + "\n", ""
+        )
+        completed.stopped = stopped
+        return completed
+
+    def _write_monitored(self, run_path:str, outputs:dict, monitor):
+        '''
+        Writes the outputs in parts, as the model does, and calls the monitor
+        after each one. The parts don't end at line ends. Returns True if the
+        monitor stopped the run.
+        '''
+        files = {
+            filename: open(os.path.join(run_path, filename), "w")
+            for filename in outputs
+        }
+        try:
+            for n in range(STUB_CHUNKS):
+                for filename, text in outputs.items():
+                    size = -(-len(text) // STUB_CHUNKS)
+                    files[filename].write(text[n*size:(n + 1)*size])
+                    files[filename].flush()
+                time.sleep(self.delay / STUB_CHUNKS)
+                if monitor():
+                    return True
+        finally:
+            for f in files.values():
+                f.close()
+        return False
+
+    def __repr__(self):
+        return f"StubEngine(delay={self.delay!r})"
@@ -0,0 +1,128 @@
+'''
+This module implements the ensemble runs, where the same treatment is run
+against several weather realizations (members). It is intended for seasonal
+forecasts, where the members are historical analogs or synthetic weather for
+the season.
+
+The run_ensemble function receives the treatment sections and the weather
+members, and returns the quantiles of the selected outputs:
+    >>> quantiles = run_ensemble(
+    >>>     field=field, cultivar=crop, planting=planting,
+    >>>     simulation_controls=simulation_controls,
+    >>>     weather_members=members, outputs=["harwt", "PlantGro.LAID"]
+    >>> )
+    >>> quantiles["harwt"] # Array with the harwt quantiles
+
+The members are run in parallel. Each worker writes the FileX, soil, and
+cultivar files once, and then only the WTH file is written for each member.
+All the members must cover the same years of the field weather station.
+'''
+
+import numpy as np
+import pandas as pd
+
+from .run import DSSATPool
+from .filex import (
+    Planting, Cultivar, Harvest, InitialConditions, Fertilizer,
+    SoilAnalysis, Irrigation, Residue, Chemical, Tillage, Field,
+    SimulationControls, Mow
+)
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def _member_outputs(dssat, result, outputs):
+    """
+    Returns the values of the outputs after a member run. The output table
+    variables are returned as a pandas Series.
+    """
+    values = {}
+    for name in outputs:
+        if "." in name:
+            table, variable = name.split(".", 1)
+            df = dssat._output.get(table)
+            assert df is not None and variable in df.columns, \
+                f"{name} is not in the model output tables"
+            values[name] = df[variable][~df.index.duplicated(keep="last")]
+        else:
+            assert name.lower() in result, \
+                f"{name} is not in the model standard output"
+            values[name] = result[name.lower()]
+    return values
+
+def run_ensemble(field:Field, cultivar:Cultivar, planting:Planting,
+                 simulation_controls:SimulationControls, weather_members:list,
+                 harvest:Harvest=None, initial_conditions:InitialConditions=None,
+                 fertilizer:Fertilizer=None, soil_analysis:SoilAnalysis=None,
+                 irrigation:Irrigation=None, residue:Residue=None,
+                 chemical:Chemical=None, tillage:Tillage=None, mow:Mow=None,
+                 outputs:list=["harwt"], quantiles:list=QUANTILES,
+                 n_workers:int=None, run_path:str=None, **pool_kwargs):
+    '''
+    Runs the treatment once per weather member, and returns the quantiles of
+    the outputs across members. The treatment parameters are the same of
+    DSSAT.run_treatment.
+
+    Arguments
+    ----------
+    weather_members: list of WeatherStation
+        Weather realizations. They must cover the same years of the field
+        weather station.
+    outputs: list
+        Outputs to aggregate. Standard output variables are named as in the
+        run_treatment result (e.g. harwt), and output table variables are
+        named as Table.VAR (e.g. PlantGro.LAID).
+    quantiles: list
+        Quantiles to compute, in the [0, 1] interval.
+    n_workers: int
+        Number of members to run in parallel.
+    run_path: str
+        Directory where the simulation environments are created.
+    pool_kwargs:
+        Other DSSATPool arguments, e.g. engine, timeout, nice, pin_workers or
+        tables_only.
+
+    Returns
+    ----------
+    dict
+        Maps each output to its quantiles. Standard output variables are
+        numpy arrays with one value per quantile. Output table variables are
+        DataFrames indexed by date, with one column per quantile. Failed
+        member runs are ignored.
+    '''
+    assert len(weather_members) > 0, "At least one weather member must be passed"
+    treatment = {
+        "field": field, "cultivar": cultivar, "planting": planting,
+        "simulation_controls": simulation_controls, "harvest": harvest,
+        "initial_conditions": initial_conditions, "fertilizer": fertilizer,
+        "soil_analysis": soil_analysis, "irrigation": irrigation,
+        "residue": residue, "chemical": chemical, "tillage": tillage,
+        "mow": mow
+    }
+    with DSSATPool(n_workers, run_path, **pool_kwargs) as pool:
+        results = pool.run_weather(
+            treatment, weather_members,
+            postprocess=lambda dssat, result: _member_outputs(
+                dssat, result, outputs
+            )
+        )
+    results = [result for result in results if result is not None]
+    assert results, "All the member runs failed"
+    quantiles = np.asarray(quantiles)
+    out_dict = {}
+    for name in outputs:
+        if "." in name:
+            members = pd.concat(
+                [result[name] for result in results], axis=1
+            ).astype(float)
+            out_dict[name] = pd.DataFrame(
+                np.nanquantile(members.values, quantiles, axis=1).T,
+                index=members.index, columns=quantiles
+            )
+        else:
+            members = np.array([
+                np.nan if result[name] is None else result[name]
+                for result in results
+            ], dtype=float)
+            out_dict[name] = np.nanquantile(members, quantiles)
+    return out_dict
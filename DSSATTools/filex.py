@@ -83,13 +83,20 @@ dictionary mapping each section name to its python object.
     >>> treatments = read_filex("Maize/BRPI0202.MZX")
     >>> treatment = treatments[1]
 
+Large FileX can be read lazily with the FileX class. It maps the treatment 
+numbers to TreatmentView objects, which parse each section when it is accessed.
+
 The create_filex function returns the string of the FileX for for the passed 
 sections defined as their python objects. 
 """
 from datetime import date
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+from functools import lru_cache
+import threading
 from .base.partypes import (
     DateType, CodeType, NumberType, Record, TabularRecord, DescriptionType,
-    FACTOR_LEVELS, clean_comments, parse_pars_line
+    FACTOR_LEVELS, clean_comments, parse_pars_line, as_layout
 )
 from .crop import (
     Maize, Wheat, Sorghum, PearlMillet, Sugarbeet, Rice, Alfalfa, Bermudagrass,
@@ -106,12 +113,25 @@ CROP_OBJECTS = {
     'SB': Soybean, 'CN': Canola, 'SU': Sunflower, 'PT': Potato, 'TM': Tomato,
     'CB': Cabbage, 'SC': Sugarcane, 'BN': DryBean, 'CS': Cassava, 'CO': Cotton
 }
+# FileX sections as named in the create_filex parameters, mapped to their 
+# factor level in the treatments section. Sections are written in this order.
+FILEX_SECTIONS = {
+    "cultivar": "cu", "field": "fl", "planting": "mp", "soil_analysis": "sa",
+    "initial_conditions": "ic", "irrigation": "mi", "fertilizer": "mf",
+    "residue": "mr", "chemical": "mc", "tillage": "mt", "harvest": "mh",
+    "simulation_controls": "sm"
+}
+# Sections that are written with all their headers for each level.
+REPEATED_HEADER_SECTIONS = [
+    "soil_analysis", "initial_conditions", "irrigation", "simulation_controls"
+]
 
 class Planting(Record):
     '''
     Class to define a single planting event
     '''
     prefix = "p"
+    __slots__ = ()
     dtypes = {
         "pdate": DateType, "edate": DateType, "ppop": NumberType, 
         "ppoe": NumberType, "plme": CodeType, "plds": CodeType, 
@@ -214,9 +234,26 @@ class Cultivar(Record):
         """
         return self.__crop
 
+    def evolve(self, **changes):
+        """
+        Returns a copy of the section with the passed parameters changed. The 
+        Crop object is created again only if the crop or cultivar code change.
+        """
+        changes = {key.lower(): value for key, value in changes.items()}
+        if ("cr" not in changes) and ("ingeno" not in changes):
+            return super().evolve(**changes)
+        cultivar = Cultivar(**{
+            "cr": self["cr"], "ingeno": self["ingeno"], "cname": self["cname"],
+            **changes
+        })
+        if self.frozen:
+            return cultivar.freeze()
+        return cultivar
+
 
 class Harvest(Record):
     prefix = "h"
+    __slots__ = ()
     dtypes = {
         "hdate": DateType, "hstg": CodeType, "hcom": CodeType,
         "hsize": CodeType, "hpc": NumberType, "hbpc": NumberType, 
@@ -261,6 +298,7 @@ class Harvest(Record):
 
 class InitialConditionsLayer(Record):
     prefix = "c"
+    __slots__ = ()
     dtypes = {
         "icbl": NumberType, "sh2o": NumberType, "snh4": NumberType, 
         "sno3": NumberType
@@ -293,6 +331,7 @@ class InitialConditionsLayer(Record):
 
 class InitialConditions(TabularRecord):
     prefix = "c"
+    __slots__ = ()
     dtypes = {
         "pcr": CodeType, "icdat": DateType, "icrt": NumberType, 
         "icnd": NumberType, "icrn": NumberType, "icre": NumberType,
@@ -361,6 +400,7 @@ class InitialConditions(TabularRecord):
 
 class FertilizerEvent(Record):
     prefix = "f"
+    __slots__ = ()
     dtypes = {
         "fdate": DateType, "fmcd": CodeType, "facd": CodeType, 
         "fdep": NumberType, "famn": NumberType, "famp": NumberType,
@@ -416,6 +456,7 @@ class FertilizerEvent(Record):
 
 class Fertilizer(TabularRecord):
     prefix = "f"
+    __slots__ = ()
     dtypes = {}
     pars_fmt = {}
     table_dtype = FertilizerEvent
@@ -434,6 +475,7 @@ class Fertilizer(TabularRecord):
 
 class SoilAnalysisLayer(Record):
     prefix = "a"
+    __slots__ = ()
     dtypes = {
         "sabl": NumberType, "sadm": NumberType, "saoc": NumberType, 
         "sani": NumberType, "saphw": NumberType, "saphb": NumberType,
@@ -482,6 +524,7 @@ class SoilAnalysisLayer(Record):
 
 class SoilAnalysis(TabularRecord):
     prefix = "a"
+    __slots__ = ()
     dtypes = {
         "sadat": DateType, "smhb": CodeType, "smpx": CodeType, 
         "smke": CodeType, "saname": DescriptionType
@@ -523,6 +566,7 @@ class SoilAnalysis(TabularRecord):
 
 class IrrigationEvent(Record):
     prefix = "i"
+    __slots__ = ()
     dtypes = {
         "idate": DateType, "irop": CodeType, "irval": NumberType, 
     }
@@ -551,6 +595,7 @@ class IrrigationEvent(Record):
 
 class Irrigation(TabularRecord):
     prefix = "i"
+    __slots__ = ()
     dtypes = {
         "efir": NumberType, "idep": NumberType, "ithr": NumberType,
         "iept": NumberType, "ioff": CodeType, "iame": CodeType,
@@ -601,6 +646,7 @@ class Irrigation(TabularRecord):
 
 class ResidueEvent(Record):
     prefix = "r"
+    __slots__ = ()
     dtypes = {
         "rdate": DateType, "rcod": CodeType, "ramt": NumberType,
         "resn": NumberType, "resp": NumberType, "resk": NumberType,
@@ -653,6 +699,7 @@ class ResidueEvent(Record):
 
 class Residue(TabularRecord):
     prefix = "r"
+    __slots__ = ()
     dtypes = {}
     pars_fmt = {}
     table_dtype = ResidueEvent
@@ -671,6 +718,7 @@ class Residue(TabularRecord):
 
 class ChemicalEvent(Record):
     prefix = "c"
+    __slots__ = ()
     dtypes = {
         "cdate": DateType, "chcod": CodeType, "chamt": NumberType,
         "chme": CodeType, "chdep": NumberType, "cht": CodeType,
@@ -713,6 +761,7 @@ class ChemicalEvent(Record):
     
 class Chemical(TabularRecord):
     prefix = "c"
+    __slots__ = ()
     dtypes = {}
     pars_fmt = {}
     table_dtype = ChemicalEvent
@@ -731,6 +780,7 @@ class Chemical(TabularRecord):
 
 class TillageEvent(Record):
     prefix = "t"
+    __slots__ = ()
     dtypes = {
         "tdate": DateType, "timpl": CodeType, "tdep": NumberType,
         "tname": DescriptionType
@@ -765,6 +815,7 @@ class TillageEvent(Record):
 
 class Tillage(TabularRecord):
     prefix = "t"
+    __slots__ = ()
     dtypes = {}
     pars_fmt = {}
     table_dtype = TillageEvent
@@ -882,24 +933,13 @@ class Field(Record):
             "fhdur"
         ]
     
-    def _write_section(self):
+    def _write_section(self, level=1):
         out_str = "*FIELDS\n"
         for tiers in (self.__tier1, self.__tier2):
-            header = ["@"+self.prefix.upper()]
-            values = []
-            for key in tiers:
-                fmt = self.pars_fmt[key]
-                if fmt == "%y%j":
-                    fmt = ">5"
-                if fmt[0] == ".":
-                    leading = "."
-                    fmt = fmt[1:]
-                else:
-                    leading = ""
-                fmt = leading + fmt.split(".")[0]
-                header.append(format(key.upper(), fmt))
-                values.append(self[key].str)
-            out_str += " ".join(header) + "\n" + " 1 " + " ".join(values) + "\n"
+            header = ["@"+self.prefix.upper()] + self._layout.header(tiers)
+            values = [self[key].str for key in tiers]
+            out_str += " ".join(header) + "\n" + f"{level:>2d} " + \
+                " ".join(values) + "\n"
         return out_str
     
     def __setitem__(self, key, value):
@@ -915,6 +955,7 @@ class Field(Record):
 
 class SCGeneral(Record):
     prefix = "n"
+    __slots__ = ()
     dtypes = {
         "nyers": NumberType, "nreps": NumberType, "start": CodeType,
         "sdate": DateType, "rseed": NumberType, "sname": DescriptionType,
@@ -957,6 +998,7 @@ class SCGeneral(Record):
 
 class SCOptions(Record):
     prefix = "n"
+    __slots__ = ()
     dtypes = {
         "water": CodeType, "nitro": CodeType, "symbi": CodeType,
         "phosp": CodeType, "potas": CodeType, "dises": CodeType,
@@ -1006,6 +1048,7 @@ class SCOptions(Record):
 
 class SCMethods(Record):
     prefix = "n"
+    __slots__ = ()
     dtypes = {
         "wther": CodeType, "incon": CodeType, "light": CodeType,
         "evapo": CodeType, "infil": CodeType, "photo": CodeType,
@@ -1066,6 +1109,7 @@ class SCMethods(Record):
 
 class SCManagement(Record):
     prefix = "n"
+    __slots__ = ()
     dtypes = {
         "plant": CodeType, "irrig": CodeType, "ferti": CodeType,
         "resid": CodeType, "harvs": CodeType, 
@@ -1113,6 +1157,7 @@ class SCManagement(Record):
 
 class SCOutputs(Record):
     prefix = "n"
+    __slots__ = ()
     dtypes = {
         'fname': CodeType, 'ovvew': CodeType, 'sumry': CodeType, 
         'fropt': NumberType, 'grout': CodeType, 'caout': CodeType, 
@@ -1160,6 +1205,7 @@ class SCOutputs(Record):
 
 class AMPlanting(Record):
     prefix = "n"
+    __slots__ = ()
     dtypes = {
         'pfrst': DateType, 'plast': DateType, 'ph2ol': NumberType, 
         'ph2ou': NumberType, 'ph2od': NumberType, 'pstmx': NumberType, 
@@ -1205,6 +1251,7 @@ class AMPlanting(Record):
 
 class AMIrrigation(Record):
     prefix = "n"
+    __slots__ = ()
     dtypes = {
         'imdep': NumberType, 'ithrl': NumberType, 'ithru': NumberType, 
         'iroff': CodeType, 'imeth': CodeType, 'iramt': NumberType, 
@@ -1250,6 +1297,7 @@ class AMIrrigation(Record):
 
 class AMNitrogen(Record):
     prefix = "n"
+    __slots__ = ()
     dtypes = {
         'nmdep': NumberType, 'nmthr': NumberType, 'namnt': NumberType, 
         'ncode': CodeType, 'naoff': CodeType, 
@@ -1287,6 +1335,7 @@ class AMNitrogen(Record):
 
 class AMResidues(Record):
     prefix = "n"
+    __slots__ = ()
     dtypes = {
         'ripcn': NumberType, 'rtime': NumberType, 'ridep': NumberType, 
     }
@@ -1316,6 +1365,7 @@ class AMResidues(Record):
 
 class AMHarvest(Record):
     prefix = "n"
+    __slots__ = ()
     dtypes = {
         'hfrst': NumberType, 'hlast': DateType, 'hpcnp': NumberType, 
         'hpcnr': NumberType, 'hmfrq': NumberType, 'hmgdd': NumberType, 
@@ -1431,29 +1481,33 @@ class SimulationControls:
         kws = [f"{key}={value!r}" for key, value in self.__data.items()]
         return "{}({})".format(type(self).__name__, ", ".join(kws))
     
-    def _write_section(self):
+    def _write_section(self, level=1):
+        rows = {
+            key: _cached_text(_fragment_key(record), record._write_row)
+            for key, record in self.__data.items()
+        }
         out_str = "*SIMULATION CONTROLS\n"
         out_str += "@N GENERAL     NYERS NREPS START SDATE RSEED SNAME.................... SMODEL\n"
-        out_str += f" 1 GE          {self.__data['general']._write_row()}"
+        out_str += f"{level:>2d} GE          {rows['general']}"
         out_str += "@N OPTIONS     WATER NITRO SYMBI PHOSP POTAS DISES  CHEM  TILL   CO2\n"
-        out_str += f" 1 OP          {self.__data['options']._write_row()}"
+        out_str += f"{level:>2d} OP          {rows['options']}"
         out_str += "@N METHODS     WTHER INCON LIGHT EVAPO INFIL PHOTO HYDRO NSWIT MESOM MESEV MESOL\n"
-        out_str += f" 1 ME          {self.__data['methods']._write_row()}"
+        out_str += f"{level:>2d} ME          {rows['methods']}"
         out_str += "@N MANAGEMENT  PLANT IRRIG FERTI RESID HARVS\n"
-        out_str += f" 1 MA          {self.__data['management']._write_row()}"
+        out_str += f"{level:>2d} MA          {rows['management']}"
         out_str += "@N OUTPUTS     FNAME OVVEW SUMRY FROPT GROUT CAOUT WAOUT NIOUT MIOUT DIOUT VBOSE CHOUT OPOUT FMOPT\n"
-        out_str += f" 1 OU          {self.__data['outputs']._write_row()}"
+        out_str += f"{level:>2d} OU          {rows['outputs']}"
         out_str += f"\n@  AUTOMATIC MANAGEMENT\n"
         out_str += "@N PLANTING    PFRST PLAST PH2OL PH2OU PH2OD PSTMX PSTMN\n"
-        out_str += f" 1 PL          {self.__data['planting']._write_row()}"
+        out_str += f"{level:>2d} PL          {rows['planting']}"
         out_str += "@N IRRIGATION  IMDEP ITHRL ITHRU IROFF IMETH IRAMT IREFF\n"
-        out_str += f" 1 IR          {self.__data['irrigation']._write_row()}"
+        out_str += f"{level:>2d} IR          {rows['irrigation']}"
         out_str += "@N NITROGEN    NMDEP NMTHR NAMNT NCODE NAOFF\n"
-        out_str += f" 1 NI          {self.__data['nitrogen']._write_row()}"
+        out_str += f"{level:>2d} NI          {rows['nitrogen']}"
         out_str += "@N RESIDUES    RIPCN RTIME RIDEP\n"
-        out_str += f" 1 RE          {self.__data['residues']._write_row()}"
+        out_str += f"{level:>2d} RE          {rows['residues']}"
         out_str += "@N HARVEST     HFRST HLAST HPCNP HPCNR\n"
-        out_str += f" 1 HA          {self.__data['harvest']._write_row()}"
+        out_str += f"{level:>2d} HA          {rows['harvest']}"
         return out_str
     
 
@@ -1463,6 +1517,7 @@ class Treatment(Record):
     use.
     """
     prefix = "n"
+    __slots__ = ()
     dtypes = {
         'r': NumberType, 'o': NumberType, "c": NumberType,
         'tname': DescriptionType, "cu": NumberType, "fl": NumberType,
@@ -1485,13 +1540,13 @@ class Treatment(Record):
         assert all([par in kwargs for par in self.pars_fmt.keys()])
         super().__init__()
         kwargs = {par: kwargs[par] for par in self.pars_fmt.keys()}
-        kwargs["o"] = kwargs["c"] = kwargs["me"] = 0
         for name, value in kwargs.items():
             super().__setitem__(name, value)
 
 
 class MowEvent(Record):
     prefix = 'trno '
+    __slots__ = ()
     dtypes = {
         'date': DateType, 'mow': NumberType, 'rsplf': NumberType, 
         'mvs': NumberType, 'rsht': NumberType
@@ -1527,6 +1582,7 @@ class MowEvent(Record):
 
 class Mow(TabularRecord):
     prefix = "trno "
+    __slots__ = ()
     dtypes = {}
     pars_fmt = {}
     table_dtype = MowEvent
@@ -1555,7 +1611,7 @@ class Mow(TabularRecord):
         events = {}
         for line in lines:
             if len(line.strip()) > 10:
-                pars = parse_pars_line(line[7:], cls.table_dtype.pars_fmt)
+                pars = parse_pars_line(line[7:], cls.table_dtype._layout)
                 level = int(line[:6])
                 events[level] = events.get(level, []) + [cls.table_dtype(**pars)]
         events = {k: cls(v) for k, v in events.items()}
@@ -1564,29 +1620,285 @@ class Mow(TabularRecord):
 
 def get_header_range(l, h, pars_fmt):
     """Get variable start and index in the header line"""
-    h_fmt = pars_fmt[h]
-    # For the case of fields that have leading points, like those in 
-    # field section
-    if h_fmt[0] == ".": 
-        h_fmt = h_fmt[1:]
-    if h_fmt[0] == "<":
-        start = l.lower().find(h)
-        end = start + int(h_fmt[1:].split(".")[0])
-    elif h_fmt[0] == ">":
-        end = l.lower().find(h) + len(h)
-        start = end - int(h_fmt[1:].split(".")[0])
-    elif h_fmt[0] == "%":
-        start = l.lower().find(h)
-        end = start + 5 # Assuming all dates in FileX are a 5 character string
+    return as_layout(pars_fmt).header_range(l, h)
+
+
+# FileX sections, identified by the first six characters of their title line.
+FILEX_TITLES = {
+    "*TREAT": Treatment, "*PLANT": Planting, "*CULTI": Cultivar, 
+    "*HARVE": Harvest, "*INITI": InitialConditions, "*FERTI": Fertilizer,
+    "*SOIL ": SoilAnalysis, "*IRRIG": Irrigation, "*RESID": Residue,
+    "*CHEMI": Chemical, "*TILLA": Tillage, "*FIELD": Field,
+    "*SIMUL": SimulationControls
+}
+SECTION_CLASSES = {cls.__name__: cls for cls in FILEX_TITLES.values()}
+
+
+@lru_cache(maxsize=None)
+def _header_columns(header_line, layout, skip=1, sequential=False):
+    """
+    Returns the names of the columns in a header line, and their (start, end)
+    range. The first skip names of the header are not columns. If sequential,
+    each name is searched after the end of the previous column. Ranges are
+    computed only once for each header line and layout.
+    """
+    names = header_line.replace(".", " ").lower().split()[skip:]
+    columns = []
+    start_i = 0
+    for name in names:
+        if sequential:
+            start, end = layout.header_range(header_line[start_i:], name)
+            start, end = start + start_i, end + start_i
+            start_i = end
+        else:
+            start, end = layout.header_range(header_line, name)
+        columns.append((name, start, end))
+    return tuple(columns)
+
+
+def _line_values(line, columns):
+    return {name: line[start:end] for name, start, end in columns}
+
+
+class TreatmentView(MutableMapping):
+    '''
+    Treatment of a FileX read with the FileX class. It maps the section names
+    (e.g. "Planting") to the section objects, as the treatments returned by
+    read_filex. The sections are parsed when they are first accessed. 
+    Sections can be replaced by assigning them, which doesn't modify the file.
+    '''
+    def __init__(self, filex, number:int):
+        self.filex = filex
+        self.number = number
+        self._levels = filex._treatment_levels(number)
+        self._sections = {}
+
+    def __getitem__(self, key):
+        if key not in self._sections:
+            if key not in self._levels:
+                raise KeyError(key)
+            self._sections[key] = self.filex.section(key, self._levels[key])
+        return self._sections[key]
+
+    def __setitem__(self, key, value):
+        self._sections[key] = value
+        self._levels.setdefault(key, None)
+
+    def __delitem__(self, key):
+        del self._levels[key]
+        self._sections.pop(key, None)
+
+    def __iter__(self):
+        return iter(self._levels)
+
+    def __len__(self):
+        return len(self._levels)
+
+    def __repr__(self):
+        return f"TreatmentView({self.number}, {list(self._levels)})"
+
+
+class FileX(Mapping):
+    '''
+    Lazy FileX reader. The file is indexed once, storing the lines of each 
+    section level, but the sections are parsed only when they are accessed.
+    It maps the treatment numbers to TreatmentView objects:
+        >>> filex = FileX("Maize/BRPI0202.MZX")
+        >>> treatment = filex[3] # Nothing is parsed yet
+        >>> treatment["Planting"] # Only the planting level of treatment 3
+    
+    Parsed levels are cached, so the treatments with the same level share the
+    same section object, as in read_filex. Use it for large experiment files
+    when only a few treatments are needed.
+    '''
+    def __init__(self, filexpath:str):
+        with open(filexpath, "r") as f:
+            lines = f.read().split("\n")
+        self.filexpath = filexpath
+        # Section name -> level -> list of (kind, columns, line)
+        self._index = {}
+        self._parsed = {}
+        section_cls = None
+        for l in lines:
+            if len(l.strip()) < 2:
+                # Simulation controls must be the last section
+                if section_cls is not SimulationControls:
+                    section_cls = None
+                continue
+            elif l[0] == "!":
+                continue
+            elif l[0] == "*":
+                section_cls = FILEX_TITLES.get(l[:6])
+                if section_cls is not None:
+                    levels = self._index.setdefault(section_cls.__name__, {})
+                    state = {"header": None, "tier": False, "level": None,
+                             "table_header": None}
+                continue
+            elif section_cls is None:
+                continue
+            _index_line(section_cls, levels, state, l)
+        assert "Treatment" in self._index, "FileX has no treatments section"
+        # Levels with a header but without a table are not defined
+        for name, levels in self._index.items():
+            section_cls = SECTION_CLASSES[name]
+            if hasattr(section_cls, "table_dtype"):
+                self._index[name] = {
+                    level: entries for level, entries in levels.items()
+                    if any(kind == "row" for kind, _, _ in entries)
+                }
+        self._treatments = {
+            n: self.section("Treatment", n) 
+            for n in self._index["Treatment"]
+        }
+
+    def section(self, name:str, level:int):
+        """
+        Returns the object of a section level. name is the section class name
+        (e.g. "Planting"). SimulationControls are a new object each time, 
+        built from the cached simulation controls records.
+        """
+        if (name, level) not in self._parsed:
+            self._parsed[name, level] = self._parse(name, level)
+        if name == "SimulationControls":
+            return SimulationControls(**self._parsed[name, level])
+        return self._parsed[name, level]
+
+    def raw_values(self, name:str, level:int):
+        """
+        Returns the parameters of a section level as written in the file, 
+        without creating the section object. Table rows are not included, and
+        the simulation controls parameters are returned by subsection.
+        """
+        values = {}
+        for kind, columns, line in self._index[name][level]:
+            if kind == "row":
+                continue
+            line_values = {
+                key: value.strip() 
+                for key, value in _line_values(line, columns).items()
+            }
+            if name == "SimulationControls":
+                values[kind] = line_values
+            else:
+                values.update(line_values)
+        return values
+
+    def _parse(self, name, level):
+        entries = self._index[name][level]
+        if name == "SimulationControls":
+            return {
+                key: SimulationControls.dtypes[key](
+                    **_line_values(line, columns)
+                )
+                for key, columns, line in entries
+            }
+        section_cls = SECTION_CLASSES[name]
+        if hasattr(section_cls, "table_dtype"):
+            table = [
+                section_cls.table_dtype(**_line_values(line, columns))
+                for kind, columns, line in entries if kind == "row"
+            ]
+            if len(section_cls.dtypes) == 0:
+                return section_cls(table=table)
+        section = None
+        for kind, columns, line in entries:
+            if kind == "values":
+                vals = _line_values(line, columns)
+                if hasattr(section_cls, "table_dtype"):
+                    vals["table"] = table
+                section = section_cls(**vals)
+            elif kind == "tier":
+                for key, val in _line_values(line, columns).items():
+                    section[key] = val
+        return section
+
+    def _treatment_levels(self, number):
+        """
+        Returns the section names of a treatment mapped to their level.
+        """
+        treatment = self._treatments[number]
+        levels = {}
+        for factor, f in FACTOR_LEVELS.items():
+            if factor == "SimulationControls":
+                continue
+            level = treatment._raw(f)
+            if level in self._index.get(factor, {}):
+                levels[factor] = int(level)
+        level = treatment._raw("sm")
+        if level in self._index.get("SimulationControls", {}):
+            levels["SimulationControls"] = int(level)
+        assert "SimulationControls" in levels, \
+            f"Simulation controls of treatment {number} are not defined"
+        return levels
+
+    def __getitem__(self, number):
+        if number not in self._treatments:
+            raise KeyError(number)
+        return TreatmentView(self, number)
+
+    def __iter__(self):
+        return iter(self._treatments)
+
+    def __len__(self):
+        return len(self._treatments)
+
+
+def _index_line(section_cls, levels, state, l):
+    """
+    Adds a line of a section to the index of its levels. state keeps the
+    current headers, and the level of the table rows.
+    """
+    if section_cls is SimulationControls:
+        if l[0] == "@":
+            if "AUTOMATIC" in l:
+                return
+            name = l.replace(".", " ").lower().split()[1]
+            state["header"] = (name, _header_columns(
+                l, SimulationControls.dtypes[name]._layout, skip=2
+            ))
+        else:
+            name, columns = state["header"]
+            levels.setdefault(int(l[:2]), []).append((name, columns, l))
+    elif len(section_cls.dtypes) == 0: # Sections that are only a table
+        if l[0] == "@":
+            state["table_header"] = _header_columns(
+                l, section_cls.table_dtype._layout
+            )
+        else:
+            levels.setdefault(int(l[:2]), []).append(
+                ("row", state["table_header"], l)
+            )
+    elif l[0] == "@":
+        if (l[:2] == "@L") and (state["header"] is not None): # Field tier 2
+            state["header"] = _header_columns(l, section_cls._layout)
+            state["tier"] = True
+        elif (state["level"] is not None) and (state["table_header"] is None):
+            state["table_header"] = _header_columns(
+                l, section_cls.table_dtype._layout
+            )
+        else:
+            state["header"] = _header_columns(
+                l, section_cls._layout, sequential=True
+            )
+            state["tier"] = False
+            state["level"] = None
+            state["table_header"] = None
+    elif state["table_header"] is not None:
+        levels[state["level"]].append(("row", state["table_header"], l))
     else:
-        raise ValueError("Variable format must be right or left justified")
-    return (start, end)
+        level = int(l[:2])
+        kind = "tier" if state["tier"] else "values"
+        levels.setdefault(level, []).append((kind, state["header"], l))
+        if hasattr(section_cls, "table_dtype"):
+            state["level"] = level
 
 
-def read_filex(filexpath):
+def read_filex(filexpath, treatments:list=None):
     """
     It reads a FILEX and returns a dictionary where the keys are the treatments,
-    and the values are the level objects. 
+    and the values are the level objects. If treatments is passed, only those
+    treatments are read, and only their section levels are parsed. See the 
+    FileX class to read the treatments lazily.
 
     Asumptions:
     Some of the assumptions are needed to deal with description fields 
@@ -1596,199 +1908,204 @@ def read_filex(filexpath):
     - Treament number is always the first column
     - Treatment number is on the first two spaces
     """
-    with open(filexpath, "r") as f:
-        lines = f.readlines()
-    lookup = "section"
-    vals_dict = {}
-    table_values = []
-    vals = {}
-    experiment = {}
-    add_tier = False
-    for l in lines:
-        l = l.replace("\n", "")
-        if len(l.strip()) < 2:
-            if lookup == 'table header': # In case Table is not there
-                experiment[section_cls.__name__] = vals_dict
-                vals_dict = {}
-                del level
-            if lookup == "table values":
-                if only_table:
-                    for level, val in vals.items():
-                        vals_dict[level] = section_cls(table=val)
-                else:
-                    vals["table"] = table_values
-                    vals_dict[level] = section_cls(**vals)
-                experiment[section_cls.__name__] = vals_dict
-                vals_dict = {}
-                table_values = []
-                del level
-            if lookup == "values":
-                experiment[section_cls.__name__] = vals_dict
-                vals_dict = {}
-                del level
-            if lookup == "simulation controls": 
-                continue
-            else:
-                lookup = "section"
-            vals = {}
-            add_tier = False
-            
-            continue
-        elif l[0] == "!":
-            continue
-        elif lookup == "header":
-            if l[0] == "@":
-                header = l.replace(".", " ").lower().split()
-                header_start_end = {}
-                start_i = 0
-                for h in header[1:]:
-                    header_start_end[h] = get_header_range(
-                        l[start_i:], h, section_cls.pars_fmt
-                    )
-                    header_start_end[h] = (
-                        header_start_end[h][0] + start_i,
-                        header_start_end[h][1] + start_i
-                    )
-                    start_i = header_start_end[h][1]
-                lookup = "values"
-                continue
-        elif lookup == "table header":
-            if l[0] == "@":
-                table_header = l.replace(".", " ").lower().split()
-                table_header_start_end = {
-                    h: get_header_range(l, h, section_cls.table_dtype.pars_fmt) 
-                    for h in table_header[1:]
-                }
-                lookup = "table values"
-                continue
-        elif lookup == "values":
-            # Special case for Field tier 2
-            if (l[:2] == "@L"):
-                add_tier = True
-                header = l.replace(".", " ").lower().split()
-                header_start_end = {
-                    h: get_header_range(l, h, section_cls.pars_fmt) 
-                    for h in header[1:]
-                }
-                continue
-            vals = {
-                key: l[header_start_end[key][0]:header_start_end[key][1]]
-                for key in header[1:]
-            }
-            level = int(l[:2])
-            if hasattr(section_cls, "table_dtype"):
-                lookup = "table header"
-            else:
-                if add_tier:
-                    for key, val in vals.items():
-                        vals_dict[level][key] = val
-                else:
-                    vals_dict[level] = section_cls(**vals)
-            continue                
-        elif lookup == "table values":
-            if l[0] == "@":
-                vals["table"] = table_values
-                vals_dict[level] = section_cls(**vals)
-                table_values = []
-                lookup = "values"
-                del level
-                continue
-            row = section_cls.table_dtype(**{
-                key: l[table_header_start_end[key][0]:
-                    table_header_start_end[key][1]]
-                for key in table_header[1:]
-            })
-            if only_table:
-                level = int(l[:2])
-                vals[level] = vals.get(level, []) + [row]
-            table_values.append(row)
-        elif lookup == "simulation controls":
-            if l[0] == "@": # Header 
-                if "AUTOMATIC" in l:
-                    continue
-                header = l.replace(".", " ").lower().split()
-                simcon_dtype = SimulationControls.dtypes[header[1]]
-                header_start_end = {
-                    h: get_header_range(
-                        l, h, simcon_dtype.pars_fmt
-                    ) 
-                    for h in header[2:]
-                }
-            else: # Values
-                vals = {
-                    key: l[header_start_end[key][0]:header_start_end[key][1]]
-                    for key in header[2:]
-                }
-                level = int(l[:2])
-                if sim_controls_dict.get(level, False):
-                    sim_controls_dict[level][header[1]] = simcon_dtype(**vals)
-                else:
-                    sim_controls_dict[level] = {
-                        header[1]: simcon_dtype(**vals)
-                    }
-            
-        elif lookup == "section":
-            if l[:6] == "*TREAT":
-                section_cls = Treatment
-            elif l[:6] == "*PLANT":
-                section_cls = Planting
-            elif l[:6] == "*CULTI":
-                section_cls = Cultivar
-            elif l[:6] == "*HARVE":
-                section_cls = Harvest
-            elif l[:6] == "*INITI":
-                section_cls = InitialConditions
-            elif l[:6] == "*FERTI":
-                section_cls = Fertilizer
-            elif l[:6] == "*SOIL ":
-                section_cls = SoilAnalysis
-            elif l[:6] == "*IRRIG":
-                section_cls = Irrigation
-            elif l[:6] == "*RESID":
-                section_cls = Residue
-            elif l[:6] == "*CHEMI":
-                section_cls = Chemical
-            elif l[:6] == "*TILLA":
-                section_cls = Tillage
-            elif l[:6] == "*FIELD": 
-                section_cls = Field
-            elif l[:6] == "*SIMUL":
-                section_cls = SimulationControls
-                sim_controls_dict = {}
-                # Simulation Controls must be the last section
-            else:
-                continue
-            # Some sections are only tables, for those go directly to table
-            # header
-            only_table = len(section_cls.dtypes) == 0
-            if only_table:
-                lookup = "table header"
-                vals = {}
-            else:
-                lookup = "header"
-                if section_cls.__name__ == "SimulationControls":
-                    lookup = "simulation controls"
-        else:
-            raise ValueError
-    
-    # Build the treatments dictionary
-    treatments = {}
-    for n, treatment in experiment["Treatment"].items():
-        treatments[n] = {}
-        for factor, f in FACTOR_LEVELS.items():
-            if factor in experiment:
-                level = experiment[factor].get(treatment[f], False)
-                if level:
-                    treatments[n][factor] = level
-        treatments[n]["SimulationControls"] = sim_controls_dict.get(
-            treatment["sm"], False
+    filex = FileX(filexpath)
+    if treatments is None:
+        treatments = list(filex)
+    return {n: dict(filex[n]) for n in treatments}
+        
+def _with_smodel(simulation_controls, smodel):
+    """
+    Returns the simulation controls with the passed model. If the model is not
+    the same, a new SimulationControls is returned, so the original object is
+    not modified.
+    """
+    general = simulation_controls["general"]
+    if general["smodel"] == smodel:
+        return simulation_controls
+    general = SCGeneral(**{**general.parameters(), "smodel": smodel})
+    return SimulationControls(**{
+        **{key: simulation_controls[key] for key in SimulationControls.dtypes},
+        "general": general
+    })
+
+
+# Written text of the FileX sections and simulation controls rows, keyed by
+# their content. Sections that don't change between runs are not written 
+# again. Frozen sections cache their own text.
+FRAGMENT_CACHE_SIZE = 512
+_fragments = OrderedDict()
+_fragments_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def _nested_parameters(cls):
+    """
+    Returns the index of the parameters of a record class that can be records.
+    """
+    return tuple(
+        n for n, dtype in enumerate(cls.dtypes.values())
+        if isinstance(dtype, tuple) or (dtype is Record)
+    )
+
+def _fragment_key(obj, level=None):
+    """
+    Returns a key of the content of a section or record. Records within it 
+    (e.g. the Field weather station and soil profile) are identified by the
+    name written in the FileX.
+    """
+    if isinstance(obj, SimulationControls):
+        return (SimulationControls, level) + tuple(
+            _fragment_key(obj[key]) for key in SimulationControls.dtypes
         )
-        assert treatments[n]["SimulationControls"]
-        treatments[n]["SimulationControls"] = SimulationControls(
-            **treatments[n]["SimulationControls"]
+    values = obj._values
+    nested = _nested_parameters(type(obj))
+    if nested:
+        values = list(values)
+        for n in nested:
+            if isinstance(values[n], Record):
+                values[n] = values[n].str
+    values = tuple(values)
+    if isinstance(obj, TabularRecord):
+        values += tuple(tuple(row._values) for row in obj.table)
+    return (type(obj), level, values)
+
+def _cached_text(key, write, *args):
+    """
+    Returns the cached text for the key. If it is not cached, it is written 
+    calling write(*args).
+    """
+    with _fragments_lock:
+        text = _fragments.get(key)
+        if text is not None:
+            _fragments.move_to_end(key)
+            return text
+    text = write(*args)
+    with _fragments_lock:
+        _fragments[key] = text
+        if len(_fragments) > FRAGMENT_CACHE_SIZE:
+            _fragments.popitem(last=False)
+    return text
+
+def _write_fragment(obj, level):
+    """
+    Returns the text of a section level. The text of mutable sections is 
+    cached by their content.
+    """
+    if isinstance(obj, SimulationControls) or \
+            (isinstance(obj, Record) and not obj.frozen):
+        return _cached_text(
+            _fragment_key(obj, level), obj._write_section, level
         )
-    return treatments
-        
+    return obj._write_section(level)
+
+
+def _join_levels(sections, repeat_headers):
+    """
+    Joins the strings of the same section written for different levels. If
+    repeat_headers, each level is written with all its headers (e.g. Initial 
+    Conditions). Otherwise, all levels are written below the same headers.
+    """
+    if repeat_headers:
+        return sections[0] + "".join(
+            section.split("\n", 1)[1] for section in sections[1:]
+        )
+    blocks = []
+    for section in sections:
+        lines = section.split("\n")
+        section_blocks = []
+        for line in lines[1:]:
+            if line[:1] == "@":
+                section_blocks.append([line])
+            elif line.strip():
+                section_blocks[-1].append(line)
+        blocks.append(section_blocks)
+    out_str = sections[0].split("\n", 1)[0] + "\n"
+    for n, block in enumerate(blocks[0]):
+        out_str += "\n".join(block) + "\n"
+        for section_blocks in blocks[1:]:
+            out_str += "".join(
+                line + "\n" for line in section_blocks[n][1:]
+            )
+    return out_str
+
+
+def create_batch_filex(treatments:list, file=None):
+    """
+    Returns the FileX, as a string, for a list of treatments. If file is 
+    passed, the FileX is written to that file object and nothing is
+    returned. Each treatment is a dictionary mapping the create_filex
+    parameter names (field, cultivar, planting, etc.) to their section
+    objects. The treatment name can be passed using the 'tname' key, and the
+    rotation number, option and component using the 'r', 'o' and 'c' keys.
+
+    Section objects shared by several treatments are written only once as a 
+    single factor level. The treatments are numbered in the same order they 
+    are passed. The text of the sections that didn't change since a previous
+    call is reused.
+    """
+    assert 0 < len(treatments) < 100, \
+        "A FileX can contain between 1 and 99 treatments"
+    for treatment in treatments:
+        for section in ("field", "cultivar", "planting", "simulation_controls"):
+            assert treatment.get(section) is not None, \
+                f"{section} must be defined for all treatments"
+    # Levels of each section, objects are identified by their id
+    levels = {section: {} for section in FILEX_SECTIONS}
+    # Simulation controls with the crop model, by (id, model)
+    smodel_controls = {}
+    treatment_rows = []
+    for treatment in treatments:
+        row = {
+            "r": treatment.get("r", 1), "o": treatment.get("o", 0), 
+            "c": treatment.get("c", 0), "me": 0, 
+            "tname": treatment.get("tname", "DSSATTools")
+        }
+        treatment = {
+            section: treatment.get(section) for section in FILEX_SECTIONS
+        }
+        if hasattr(treatment["cultivar"], "smodel"):
+            key = (
+                id(treatment["simulation_controls"]), 
+                treatment["cultivar"].smodel
+            )
+            if key not in smodel_controls:
+                smodel_controls[key] = _with_smodel(
+                    treatment["simulation_controls"], 
+                    treatment["cultivar"].smodel
+                )
+            treatment["simulation_controls"] = smodel_controls[key]
+        for section, factor in FILEX_SECTIONS.items():
+            obj = treatment[section]
+            if not obj:
+                row[factor] = 0
+                continue
+            section_levels = levels[section]
+            if id(obj) not in section_levels:
+                section_levels[id(obj)] = (len(section_levels) + 1, obj)
+            row[factor] = section_levels[id(obj)][0]
+        treatment_rows.append(Treatment(**row))
+
+    field = treatments[0]["field"]
+    experiment_name = field["id_field"][:4] + \
+        treatments[0]["simulation_controls"]["general"]["sdate"]\
+        .strftime('%y01') + treatments[0]["cultivar"].code
+    parts = [f"*EXP.DETAILS: {experiment_name}\n\n"]
+    parts.append(_join_levels([
+        treatment._write_section(n)
+        for n, treatment in enumerate(treatment_rows, 1)
+    ], False) + "\n")
+    for section in FILEX_SECTIONS:
+        if not levels[section]:
+            continue
+        parts.append(_join_levels(
+            [_write_fragment(obj, n) for n, obj in levels[section].values()],
+            section in REPEATED_HEADER_SECTIONS
+        ))
+        if section != "simulation_controls":
+            parts.append("\n")
+    if file is None:
+        return "".join(parts)
+    file.writelines(parts)
+
 def create_filex(field:Field, cultivar:Cultivar, planting:Planting, 
                 simulation_controls:SimulationControls, harvest:Harvest=None,
                 initial_conditions:InitialConditions=None, 
@@ -1798,35 +2115,10 @@ def create_filex(field:Field, cultivar:Cultivar, planting:Planting,
     """
     Returns the FileX as a string
     """
-    experiment_name = field["id_field"][:4] +\
-        simulation_controls["general"]["sdate"].strftime('%y01') + cultivar.code
-    out_str = f"*EXP.DETAILS: {experiment_name}\n\n"
-    treatment = Treatment(**{
-        "r": 1, "o": 0, "c": 0, "tname": "DSSATTools", "cu": 1, "fl": 1, 
-        "mp": 1, 'sm': 1, 'me': 0,
-        "sa": 1 if soil_analysis else 0,  
-        "ic": 1 if initial_conditions else 0,
-        'mi': 1 if irrigation else 0,
-        'mf': 1 if fertilizer else 0,
-        'mr': 1 if residue else 0,
-        'mc': 1 if chemical else 0,
-        'mt': 1 if tillage else 0,
-        'mh': 1 if harvest else 0
-    })
-    out_str += treatment._write_section() + "\n"
-    out_str += cultivar._write_section() + "\n"
-    out_str += field._write_section() + "\n"
-    out_str += planting._write_section() + "\n"
-    if soil_analysis: out_str += soil_analysis._write_section() + "\n"
-    if initial_conditions: out_str += initial_conditions._write_section() + "\n"
-    if irrigation: out_str += irrigation._write_section() + "\n"
-    if fertilizer: out_str += fertilizer._write_section() + "\n"
-    if residue: out_str += residue._write_section() + "\n"
-    if chemical: out_str += chemical._write_section() + "\n"
-    if tillage: out_str += tillage._write_section() + "\n"
-    if harvest: out_str += harvest._write_section() + "\n"
-    out_str += simulation_controls._write_section()
-
-    return out_str
-    
-    
\ No newline at end of file
+    return create_batch_filex([{
+        "field": field, "cultivar": cultivar, "planting": planting, 
+        "simulation_controls": simulation_controls, "harvest": harvest,
+        "initial_conditions": initial_conditions, "fertilizer": fertilizer,
+        "soil_analysis": soil_analysis, "irrigation": irrigation, 
+        "residue": residue, "chemical": chemical, "tillage": tillage
+    }])
@@ -0,0 +1,274 @@
+'''
+This module hosts the RunResult class, which is the result of a model run (a
+treatment, or a season of a sequence). A RunResult maps the output variable
+names to their values, so it's used as the dictionaries returned by previous
+versions. It contains the standard output variables (e.g. harwt), and all the
+Summary.OUT columns (e.g. hwam), with float precision and dates as dates:
+    >>> result = dssat.run_treatment(**treatment)
+    >>> result["harwt"], result["hwam"], result["mdat"]
+The output tables of the run are stored as columns (numpy arrays) in the
+tables attribute. Runs of the same model call share the same arrays, so they
+are not copied:
+    >>> result.tables["PlantGro"]["LAID"]
+    >>> result.table("PlantGro") # As a DataFrame
+
+Many results are aggregated in a single DataFrame with concat. It builds each
+column at once, without a DataFrame per run:
+    >>> RunResult.concat(results)
+    >>> RunResult.concat(results, table="PlantGro")
+'''
+
+import re
+import io
+from datetime import date
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+MISSING = -99
+# Summary.OUT columns with dates in the YYYYDDD format
+SUMMARY_DATES = ["SDAT", "PDAT", "EDAT", "ADAT", "MDAT", "HDAT"]
+MISSING_FILL = {"f": np.nan, "M": np.datetime64("NaT")}
+
+
+def _typed(name:str, values:list):
+    """
+    Returns the values of a Summary.OUT column as a numpy array. Numeric
+    columns are float, and dates are datetime64. Otherwise the values are str.
+    Missing values are NaN, NaT or None.
+    """
+    try:
+        numbers = np.array(
+            [value or MISSING for value in values], dtype=float
+        )
+    except ValueError:
+        return np.array(
+            [None if value in ("", str(MISSING)) else value for value in values],
+            dtype=object
+        )
+    numbers[numbers == MISSING] = np.nan
+    if name not in SUMMARY_DATES:
+        return numbers
+    dates = np.full(len(numbers), np.datetime64("NaT"), dtype="datetime64[D]")
+    valid = numbers > 0
+    dates[valid] = _doy_dates(numbers[valid] // 1000, numbers[valid] % 1000)
+    return dates
+
+def _doy_dates(years:np.ndarray, doys:np.ndarray):
+    """
+    Returns the dates of the years and days of year, as datetime64.
+    """
+    years = np.asarray(years).astype(int)
+    doys = np.asarray(doys).astype(int)
+    return (years - 1970).astype("datetime64[Y]").astype("datetime64[D]") + \
+        (doys - 1).astype("timedelta64[D]")
+
+def read_summary(text:str):
+    '''
+    Parses the Summary.OUT file. The columns are fixed width: each column
+    ends where its header ends, so text values with spaces (e.g. the
+    treatment name) are read right.
+
+    Returns
+    ----------
+    dict
+        Maps the lower case column names to numpy arrays, with one item per
+        run.
+    '''
+    header, rows = None, []
+    for line in text.split("\n"):
+        if line[:1] == "@":
+            header = line
+        elif header and line.strip() and line[:1] not in "!*$":
+            rows.append(line)
+    if header is None:
+        return {}
+    columns = {}
+    start = 0
+    for match in re.finditer(r"\S+", header):
+        name = match.group().strip("@.")
+        if not name:
+            continue
+        end = match.end()
+        columns[name.lower()] = _typed(
+            name, [row[start:end].strip() for row in rows]
+        )
+        start = end
+    return columns
+
+def read_summary_csv(text:str):
+    '''
+    Parses the Summary.csv file, written by the model when the output format
+    (FMOPT) is C. It returns the same as read_summary.
+    '''
+    if not text.strip():
+        return {}
+    df = pd.read_csv(
+        io.StringIO(text), dtype=str, keep_default_na=False, 
+        skipinitialspace=True
+    )
+    columns = {}
+    for name in df.columns:
+        column = name.strip().strip("@.")
+        columns[column.lower()] = _typed(
+            column.upper(), df[name].str.strip().tolist()
+        )
+    return columns
+
+def table_columns(df:pd.DataFrame):
+    '''
+    Returns the columns of an output table as numpy arrays. If the table is
+    indexed by date, the dates are in the DATE column.
+    '''
+    columns = {}
+    if isinstance(df.index, pd.DatetimeIndex):
+        columns["DATE"] = df.index.values
+    for name in df.columns:
+        columns[name] = df[name].to_numpy()
+    return columns
+
+def _scalar(value):
+    """
+    Returns a numpy value as a Python object. Missing values are None.
+    """
+    if isinstance(value, np.datetime64):
+        return None if np.isnat(value) else value.astype(date)
+    if isinstance(value, np.floating):
+        return None if np.isnan(value) else float(value)
+    return value
+
+
+class RunResult(Mapping):
+    '''
+    Result of a model run. It maps the standard output variables and the
+    Summary.OUT columns (lower case) to their values. Missing values are None.
+    '''
+    __slots__ = ("outputs", "_summary", "_row", "tables")
+
+    def __init__(self, outputs:dict, summary:dict=None, row:int=None,
+                 tables:dict=None):
+        '''
+        Arguments
+        ----------
+        outputs: dict
+            Standard output values of the run.
+        summary: dict
+            Summary.OUT columns, as returned by read_summary. They can be the
+            columns of several runs.
+        row: int
+            Row of the run in the summary columns.
+        tables: dict
+            Maps the output table names (e.g. PlantGro) to their columns, as
+            returned by table_columns.
+        '''
+        self.outputs = outputs
+        self._summary = summary if row is not None else {}
+        self._row = row
+        self.tables = tables or {}
+
+    @property
+    def summary(self):
+        '''
+        Summary.OUT values of the run.
+        '''
+        return {
+            name: _scalar(column[self._row])
+            for name, column in self._summary.items()
+        }
+
+    def __getitem__(self, key):
+        if key in self.outputs:
+            return self.outputs[key]
+        if key in self._summary:
+            return _scalar(self._summary[key][self._row])
+        raise KeyError(key)
+
+    def __iter__(self):
+        yield from self.outputs
+        yield from (name for name in self._summary if name not in self.outputs)
+
+    def __len__(self):
+        return len(self.outputs) + sum(
+            name not in self.outputs for name in self._summary
+        )
+
+    def table(self, name:str):
+        '''
+        Returns an output table of the run as a DataFrame.
+        '''
+        columns = dict(self.tables[name])
+        index = columns.pop("DATE", None)
+        return pd.DataFrame(columns, index=index)
+
+    def __repr__(self):
+        return f"RunResult({self.outputs})"
+
+    @staticmethod
+    def concat(results:list, table:str=None):
+        '''
+        Returns the results as a DataFrame with one row per result. Items of
+        results that are None (e.g. failed runs) are rows of missing values.
+
+        If table is passed, the output table of all the results is returned
+        instead. The RESULT column is the position of each row result in the
+        results list.
+        '''
+        if table is not None:
+            return RunResult._concat_table(results, table)
+        n = len(results)
+        columns = {}
+        # Standard output values
+        for i, result in enumerate(results):
+            if result is None:
+                continue
+            for name, value in result.outputs.items():
+                columns.setdefault(name, [None]*n)[i] = value
+        # Summary.OUT values, taken from the columns that are shared by the
+        # runs of the same model call.
+        groups = {}
+        for i, result in enumerate(results):
+            if (result is not None) and result._summary:
+                summary, positions, rows = groups.setdefault(
+                    id(result._summary), (result._summary, [], [])
+                )
+                positions.append(i)
+                rows.append(result._row)
+        summary_columns = {}
+        for summary, positions, rows in groups.values():
+            for name, column in summary.items():
+                if name in columns:
+                    continue
+                out = summary_columns.get(name)
+                if out is None:
+                    out = np.full(
+                        n, MISSING_FILL.get(column.dtype.kind),
+                        dtype=column.dtype
+                    )
+                elif out.dtype != column.dtype:
+                    out = out.astype(object)
+                out[positions] = column[rows]
+                summary_columns[name] = out
+        return pd.DataFrame({**columns, **summary_columns}, index=range(n))
+
+    @staticmethod
+    def _concat_table(results:list, table:str):
+        """
+        Concatenates an output table of all the results.
+        """
+        tables = [
+            (i, result.tables[table]) for i, result in enumerate(results)
+            if (result is not None) and (table in result.tables)
+        ]
+        assert tables, f"No result has the {table} table"
+        names = list(tables[0][1])
+        for _, columns in tables[1:]:
+            names += [name for name in columns if name not in names]
+        lengths = [len(next(iter(columns.values()))) for _, columns in tables]
+        df = {"RESULT": np.repeat([i for i, _ in tables], lengths)}
+        for name in names:
+            df[name] = np.concatenate([
+                columns[name] if name in columns else np.full(length, np.nan)
+                for (_, columns), length in zip(tables, lengths)
+            ])
+        return pd.DataFrame(df)
@@ -19,35 +19,60 @@ will have all the output files as strings in the output_files attribute, and the
 output timeseries tables in the output_tables attribute:
     >>> overview = dssat.output_files['OVERVIEW'] # Gets the overview file as a str
     >>> plantgro = dssat.output_tables['PlantGro'] # Gets the plant growth table
+Several treatments can be run in a single model call using the run_batch()
+method. It receives a list of dictionaries with the run_treatment() parameters:
+    >>> results = dssat.run_batch([treatment_1, treatment_2])
+Crop rotations are run in a single call with the run_sequence() method:
+    >>> results = dssat.run_sequence([maize_season, soybean_season])
 3. You can close the simulation environment by calling the close() method.
     >>> dssat.close()
 
+The DSSATPool class runs simulations in parallel, using one simulation 
+environment per worker.
+
+The time spent in each phase of a run (writing the inputs, running the model,
+reading the outputs, etc.) is recorded in the last_run_stats attribute, and 
+aggregated across runs in the stats attribute:
+    >>> dssat.last_run_stats.to_dataframe()
+
 '''
 
-import subprocess
 import shutil
 import os
 import tempfile    
 import random
 import string
 import pandas as pd
+import numpy as np
 import sys
 import warnings
 import platform
 import stat
 import re
 import io
+import time
+import logging
+import threading
+import copy
+from functools import wraps
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 # Libraries for second version
 from . import __file__ as module_path
 from . import VERSION
 from .crop import Crop
+from .weather import WeatherStation
 from .filex import(
     Planting, Cultivar, Harvest, InitialConditions, Fertilizer,
     SoilAnalysis, Irrigation, Residue, Chemical, Tillage, Field,
-    SimulationControls, Mow, create_filex
+    SimulationControls, Mow, create_batch_filex
 )
 from .base.utils import detect_encoding
+from .engine import Engine, DSSATTimeoutError, BIN_PATH
+from .result import (
+    RunResult, read_summary, read_summary_csv, table_columns, _doy_dates
+)
 
 OS = platform.system().lower()
 OUTPUTS = ['PlantGro', "Weather", "SoilWat", "SoilOrg", "SoilNi"]
@@ -56,11 +81,22 @@ OUTPUT_MAP = {
     "Weather": "GROUT", "SoilNi": "NIOUT"
 }
 SOIL_LAYER_OUTPUTS = ["SoilNi"]
+# Run and treatment columns of the CSV outputs (FMOPT=C)
+CSV_RUN_COLUMNS = ["RUN", "RUNNO"]
+CSV_TRNO_COLUMNS = ["TRNO", "TR", "TN"]
 
 PERENIAL_FORAGES = ['Alfalfa', 'Bermudagrass', 'Brachiaria', 'Bahiagrass']
 ROOTS = ['Potato']
 PROTECTED_ATTRS = []
 TMP_BASE = tempfile.gettempdir()
+# Phases of a run, in the order they happen
+RUN_PHASES = [
+    "validation", "clean", "write_filex", "write_cultivar", "write_soil",
+    "write_weather", "write_config", "model", "detect_encoding", 
+    "read_output", "parse_output"
+]
+
+logger = logging.getLogger(__name__)
 
 # Paths to DSSAT and Env variables
 BASE_PATH = os.path.dirname(module_path)
@@ -81,11 +117,11 @@ for file in os.listdir(STATIC_PATH):
         os.remove(file_link)
     os.symlink(os.path.join(STATIC_PATH, file), file_link)
 
+BATCH_FILE = f'DSSBatch.v{VERSION[-2:]}'
+
 if 'windows'in OS:
-    BIN_PATH = os.path.join(BASE_PATH, 'bin', 'dscsm048.exe')
     CONFILE = 'DSSATPRO.V48'
 else: 
-    BIN_PATH = os.path.join(BASE_PATH, 'bin', 'dscsm048')
     CONFILE = 'DSSATPRO.L48'
 
 # function to handle windows permisions
@@ -101,6 +137,325 @@ else:
     CHMOD_MODE = 111
 
 
+def _check_treatment(field:Field, cultivar:Cultivar, planting:Planting, 
+                     simulation_controls:SimulationControls, harvest:Harvest=None,
+                     initial_conditions:InitialConditions=None, 
+                     fertilizer:Fertilizer=None, soil_analysis:SoilAnalysis=None, 
+                     irrigation:Irrigation=None, residue:Residue=None, 
+                     chemical:Chemical=None, tillage:Tillage=None, mow:Mow=None,
+                     tname:str=None):
+    """
+    Checks that the treatment sections are of the right type.
+    """
+    assert isinstance(field, Field), "field parameter must be a Field instance."
+    assert issubclass(type(cultivar), Crop), \
+        "cultivar parameter must be a Crop instance."
+    assert isinstance(planting, Planting), \
+        "planting parameter must be a Planting instance."
+    assert isinstance(simulation_controls, SimulationControls), \
+        "simulation_controls parameter must be a SimulationControls instance."
+    assert not harvest or isinstance(harvest, Harvest), \
+        "harvest parameter must be a Harvest instance."
+    assert not initial_conditions or isinstance(initial_conditions, InitialConditions), \
+        "initial_conditions parameter must be a InitialConditions instance."
+    assert not fertilizer or isinstance(fertilizer, Fertilizer), \
+        "fertilizer parameter must be a Fertilizer instance."
+    assert not soil_analysis or isinstance(soil_analysis, SoilAnalysis), \
+        "soil_analysis parameter must be a SoilAnalysis instance."
+    assert not irrigation or isinstance(irrigation, Irrigation), \
+        "irrigation parameter must be a Irrigation instance."
+    assert not residue or isinstance(residue, Residue), \
+        "residue parameter must be a Residue instance."
+    assert not chemical or isinstance(chemical, Chemical), \
+        "chemical parameter must be a Chemical instance."
+    assert not tillage or isinstance(tillage, Tillage), \
+        "tillage parameter must be a Tillage instance."
+    assert not mow or isinstance(mow, Mow), \
+        "mow parameter must be a Mow instance"
+    # Check for Roots'parameters
+    if type(cultivar).__name__ in ROOTS:
+        assert not any((pd.isna(planting["plwt"]), pd.isna(planting["sprl"]))), \
+            f"PLWT, SPRL transplanting parameters are mandatory for "+\
+            f"{type(cultivar).__name__} crop, you must define those "+\
+            "parameters in management.planting_details"
+
+def _add_unique(objs:dict, key:str, obj, write_method:str):
+    """
+    Adds obj to the objs dictionary. Different objects with the same key (e.g. 
+    two soil profiles with the same name) are only allowed if they are written
+    the same, as they'd be written to the same file.
+    """
+    if key not in objs:
+        objs[key] = obj
+    elif objs[key] is not obj:
+        assert getattr(objs[key], write_method)() == getattr(obj, write_method)(), \
+            f"{key} is defined with different parameters in the same batch"
+
+def _get_crop_parameter(crop:Crop, name:str):
+    """
+    Returns the value of a cultivar or ecotype parameter.
+    """
+    name = name.lower()
+    if name in crop.cul_dtypes:
+        return crop[name]
+    assert crop.eco_dtypes and name in crop.eco_dtypes, \
+        f"{name} is not a {type(crop).__name__} cultivar or ecotype parameter"
+    return crop["eco#"][name]
+
+def _set_crop_parameters(crop:Crop, parameters:dict):
+    """
+    Sets the cultivar and ecotype parameters of crop. parameters maps the 
+    parameter name to its value.
+    """
+    for name, value in parameters.items():
+        name = name.lower()
+        if name in crop.cul_dtypes:
+            crop[name] = value
+        else:
+            assert crop.eco_dtypes and name in crop.eco_dtypes, \
+                f"{name} is not a {type(crop).__name__} cultivar or ecotype parameter"
+            crop["eco#"][name] = value
+
+def _copy_crop(crop:Crop):
+    """
+    Returns a copy of crop, with the same cultivar and ecotype parameters.
+    """
+    new_crop = type(crop)(crop._write_cul_line().split()[0])
+    _set_crop_parameters(new_crop, {
+        name: crop[name] for name in crop.cul_dtypes if name != "eco#"
+    })
+    if crop.eco_dtypes:
+        for name in crop.eco_dtypes:
+            new_crop["eco#"][name] = crop["eco#"][name]
+    return new_crop
+
+def _wth_years(wsta:WeatherStation):
+    """
+    Returns the first and last years of the weather station.
+    """
+    return wsta.table[0]["date"].year, wsta.table[-1]["date"].year
+
+def _wth_filename(wsta:WeatherStation):
+    """
+    Returns the name of the WTH file for the weather station.
+    """
+    wth_year, last_year = _wth_years(wsta)
+    wth_len = last_year - wth_year + 1
+    return f'{wsta["insi"]}{str(wth_year)[2:]}{wth_len:02d}.WTH'
+
+def _read_output_table(file_lines:str):
+    """
+    Returns the table of an output file (e.g. PlantGro.OUT) as a DataFrame.
+    """
+    # determine how many rows to skip in output file
+    table_start = -1
+    init_lines = []
+    for line in file_lines.split('\n'):
+        table_start += 1
+        init_lines.append(line)
+        if "@" in init_lines[-1][:10]:
+            break
+    df = pd.read_csv(
+        io.StringIO("".join(file_lines)),
+        skiprows=table_start,
+        sep=" ",
+        skipinitialspace=True,
+    )
+    if all(("@YEAR" in df.columns, "DOY" in df.columns)):
+        df["DOY"] = df.DOY.astype(int).map(lambda x: f"{x:03d}")
+        df["@YEAR"] = df["@YEAR"].astype(str)
+        df.index = pd.to_datetime((df["@YEAR"] + df["DOY"]), format="%Y%j")
+    return df
+
+def _read_csv_table(text:str):
+    """
+    Returns the table of a CSV output file (e.g. PlantGro.csv) as a DataFrame.
+    The run and treatment columns are renamed to RUN and TRNO. If the table 
+    has the YEAR and DOY columns, it's indexed by date.
+    """
+    df = pd.read_csv(io.StringIO(text), skipinitialspace=True)
+    df.columns = [name.strip().lstrip("@") for name in df.columns]
+    renames = {}
+    for names, new_name in [(CSV_RUN_COLUMNS, "RUN"), (CSV_TRNO_COLUMNS, "TRNO")]:
+        name = next((name for name in names if name in df.columns), None)
+        if name is not None:
+            renames[name] = new_name
+    df = df.rename(columns=renames)
+    if all(("YEAR" in df.columns, "DOY" in df.columns)):
+        df.index = pd.DatetimeIndex(_doy_dates(df["YEAR"], df["DOY"]))
+    return df
+
+def _run_bounds(runs:np.ndarray):
+    """
+    Returns the rows of each run in a table, where runs is its RUN column.
+    """
+    starts = np.flatnonzero(np.r_[True, runs[1:] != runs[:-1]])
+    stops = np.r_[starts[1:], len(runs)]
+    return {
+        int(runs[start]): slice(start, stop) 
+        for start, stop in zip(starts, stops)
+    }
+
+def _csv_outputs(treatments:list):
+    """
+    Returns the treatments with the text output format (FMOPT=A) changed to 
+    CSV. The simulation controls are copied, so the passed objects are not
+    modified.
+    """
+    copies = {}
+    new_treatments = []
+    for treatment in treatments:
+        simulation_controls = treatment["simulation_controls"]
+        if simulation_controls["outputs"]["fmopt"] != "A":
+            new_treatments.append(treatment)
+            continue
+        key = id(simulation_controls)
+        if key not in copies:
+            copies[key] = SimulationControls(**{
+                name: simulation_controls[name] 
+                for name in SimulationControls.dtypes
+            })
+            copies[key]["outputs"] = simulation_controls["outputs"].evolve(
+                fmopt="C"
+            )
+        new_treatments.append({**treatment, "simulation_controls": copies[key]})
+    return new_treatments
+
+def _parse_stdout(stdout:str):
+    """
+    Parses the model standard output. Returns a list with the run number, the
+    treatment number and the summary values of each run.
+    """
+    runs = []
+    header = None
+    for line in stdout.split("\n"):
+        if line.strip()[:3] == "RUN" and "TRT" in line[:10]:
+            header = line[10:].split()
+        elif header and re.match(r"\s*\d+ \w+ +\d+$", line[:10]):
+            runs.append((int(line[:3]), int(line[7:10]), {
+                k.lower(): int(v) if int(v) != -99 else None
+                for k, v in zip(header, line[10:].split())
+            }))
+    return runs
+
+def _cpu_time(children:bool=False):
+    """
+    Returns the CPU time of this process, or of its finished subprocesses if
+    children.
+    """
+    if children:
+        times = os.times()
+        return times.children_user + times.children_system
+    return time.process_time()
+
+
+class RunStats:
+    '''
+    Wall time, CPU time, and bytes written or read of each phase of the model
+    runs. The phases are listed in RUN_PHASES. The CPU time of the model phase
+    is the CPU time of the model subprocess. The CPU time of the other phases
+    is the CPU time of the Python process, so it includes other threads when
+    several runs are done in parallel.
+    '''
+    def __init__(self):
+        self.runs = 0
+        self.wall = dict.fromkeys(RUN_PHASES, 0.)
+        self.cpu = dict.fromkeys(RUN_PHASES, 0.)
+        self.bytes = dict.fromkeys(RUN_PHASES, 0)
+
+    @contextmanager
+    def phase(self, name:str):
+        '''
+        Context manager that adds the time spent in the block to the phase.
+        '''
+        children = name == "model"
+        wall, cpu = time.perf_counter(), _cpu_time(children)
+        try:
+            yield self
+        finally:
+            self.wall[name] += time.perf_counter() - wall
+            self.cpu[name] += _cpu_time(children) - cpu
+
+    def update(self, other):
+        '''
+        Adds the stats of other to these stats.
+        '''
+        self.runs += other.runs
+        for name in RUN_PHASES:
+            self.wall[name] += other.wall[name]
+            self.cpu[name] += other.cpu[name]
+            self.bytes[name] += other.bytes[name]
+
+    @property
+    def total_wall(self):
+        return sum(self.wall.values())
+
+    @property
+    def total_cpu(self):
+        return sum(self.cpu.values())
+
+    def to_dict(self):
+        '''
+        Returns the stats as a dictionary, with the wall time, CPU time and
+        bytes of each phase.
+        '''
+        return {
+            "runs": self.runs,
+            "phases": {
+                name: {
+                    "wall": self.wall[name], "cpu": self.cpu[name],
+                    "bytes": self.bytes[name]
+                }
+                for name in RUN_PHASES
+            }
+        }
+
+    def to_dataframe(self):
+        '''
+        Returns the stats as a DataFrame indexed by phase, with the wall, cpu
+        and bytes columns. Times are in seconds.
+        '''
+        return pd.DataFrame(
+            {"wall": self.wall, "cpu": self.cpu, "bytes": self.bytes},
+            index=RUN_PHASES
+        )
+
+    def __str__(self):
+        return " ".join(
+            f"{name}={self.wall[name]*1000:.1f}ms"
+            for name in RUN_PHASES if self.wall[name]
+        )
+
+    def __repr__(self):
+        return f"RunStats(runs={self.runs}, wall={self.total_wall:.3f}s, " +\
+            f"cpu={self.total_cpu:.3f}s)"
+
+def _recorded(method):
+    """
+    Decorator of the DSSAT methods that write inputs or run the model. The
+    stats of the call are set as last_run_stats and added to stats, even if
+    the call fails.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._run_stats = RunStats()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            stats = self._run_stats
+            self._run_stats = None
+            self.last_run_stats = stats
+            self.stats.update(stats)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "%s %s", method.__name__, stats,
+                    extra={"dssat_stats": stats.to_dict()}
+                )
+            if self.stats_callback:
+                self.stats_callback(stats)
+    return wrapper
+
+
 class DSSAT:
     '''
     Class that represents the simulation environment for a single treatment. When
@@ -111,7 +466,8 @@ class DSSAT:
     '''
     run_path:str=None
     output_files:dict=None
-    def __init__(self, run_path:str=None):   
+    def __init__(self, run_path:str=None, stats_callback=None, 
+                 engine:Engine=None, tables_only:bool=False):   
         """
         Initializes the simulation environment. run_path is the only parameter. 
         That parameter is the path to the directory where the environment will
@@ -122,6 +478,16 @@ class DSSAT:
         run_path: str
             Working directory. The model will be run in that directory. 
             If None, then a tmp directory will be created.
+        stats_callback: function
+            If passed, it is called with the RunStats of each run.
+        engine: engine.Engine
+            Engine that runs the model. By default, the model executable
+            shipped with DSSATTools.
+        tables_only: bool
+            If True, only the output tables and the summary are read. The 
+            model writes them as CSV files, which are faster to parse, unless
+            the output format (fmopt) of the simulation controls is not the 
+            default (A).
         """
         if not run_path:
             run_path = os.path.join(
@@ -135,15 +501,24 @@ class DSSAT:
         sys.stdout.write(f'{run_path} created.\n')
         self.run_path = run_path
         self._output = {}
+        self._prepared = None
+        self._run_stats = None
+        self.stats_callback = stats_callback
+        self.engine = engine or Engine()
+        self.tables_only = tables_only
+        self.stopped = False
+        self.stats = RunStats()
+        self.last_run_stats = None
 
 
+    @_recorded
     def run_treatment(self, field:Field, cultivar:Cultivar, planting:Planting, 
                       simulation_controls:SimulationControls, harvest:Harvest=None,
                       initial_conditions:InitialConditions=None, 
                       fertilizer:Fertilizer=None, soil_analysis:SoilAnalysis=None, 
                       irrigation:Irrigation=None, residue:Residue=None, 
                       chemical:Chemical=None, tillage:Tillage=None, mow:Mow=None,
-                      verbose=True):
+                      verbose=True, timeout:float=None, stream=None):
         '''
         Run a single treatment. 
 
@@ -163,38 +538,26 @@ class DSSAT:
         tillage:Tillage
         verbose: bool
             Whether to display the model std out or not
+        timeout: float
+            Seconds the model can run. If it doesn't finish in time, it is 
+            killed and DSSATTimeoutError is raised. By default, the engine 
+            timeout.
+        stream: stream.Stream
+            If passed, the output tables are read while the model runs, and
+            the new rows are passed to the stream callback. If the callback 
+            stops the model, None is returned.
         ''' 
-        assert isinstance(field, Field), "field parameter must be a Field instance."
-        assert issubclass(type(cultivar), Crop), \
-            "cultivar parameter must be a Crop instance."
-        assert isinstance(planting, Planting), \
-            "planting parameter must be a Planting instance."
-        assert isinstance(simulation_controls, SimulationControls), \
-            "simulation_controls parameter must be a SimulationControls instance."
-        assert not harvest or isinstance(harvest, Harvest), \
-            "harvest parameter must be a Harvest instance."
-        assert not initial_conditions or isinstance(initial_conditions, InitialConditions), \
-            "initial_conditions parameter must be a InitialConditions instance."
-        assert not fertilizer or isinstance(fertilizer, Fertilizer), \
-            "fertilizer parameter must be a Fertilizer instance."
-        assert not soil_analysis or isinstance(soil_analysis, SoilAnalysis), \
-            "soil_analysis parameter must be a SoilAnalysis instance."
-        assert not irrigation or isinstance(irrigation, Irrigation), \
-            "irrigation parameter must be a Irrigation instance."
-        assert not residue or isinstance(residue, Residue), \
-            "residue parameter must be a Residue instance."
-        assert not chemical or isinstance(chemical, Chemical), \
-            "chemical parameter must be a Chemical instance."
-        assert not tillage or isinstance(tillage, Tillage), \
-            "tillage parameter must be a Tillage instance."
-        assert not mow or isinstance(mow, Mow), \
-            "mow parameter must be a Mow instance"
-        # Remove previous outputs and inputs
-        OUTPUT_FILES = [i for i in os.listdir(self.run_path) if i[-3:] == 'OUT']
-        INP_FILES = [i for i in os.listdir(self.run_path) if i[-3:] in ['INP', 'INH']]
-        self.output_files = {}
-        for file in (OUTPUT_FILES + INP_FILES):
-            os.remove(os.path.join(self.run_path, file))
+        treatment = {
+            "field": field, "cultivar": cultivar, "planting": planting, 
+            "simulation_controls": simulation_controls, "harvest": harvest,
+            "initial_conditions": initial_conditions, "fertilizer": fertilizer,
+            "soil_analysis": soil_analysis, "irrigation": irrigation, 
+            "residue": residue, "chemical": chemical, "tillage": tillage,
+            "mow": mow
+        }
+        with self._run_stats.phase("validation"):
+            _check_treatment(**treatment)
+        self._clean_run_path()
 
         # Assign a generic code for all elements
         # field["id_field"] = "ABCD0001"
@@ -202,76 +565,503 @@ class DSSAT:
         # field['id_soil'] = "ABCD000001"
 
         simulation_controls["general"]["smodel"] = cultivar.smodel
-        # Check for Roots'parameters
-        if type(cultivar).__name__ in ROOTS:
-            assert not any((pd.isna(planting["plwt"]), pd.isna(planting["sprl"]))), \
-                f"PLWT, SPRL transplanting parameters are mandatory for "+\
-                f"{type(cultivar).__name__} crop, you must define those "+\
-                "parameters in management.planting_details"
-        
-        # Write files
+        filex_name = self._write_inputs([treatment])
+
+        # Run the model
+        self._run_model(
+            'C', os.path.basename(filex_name), 1, verbose, timeout, stream
+        )
+        if self.stopped:
+            return None
+        return self._parse_outputs()
+
+    @_recorded
+    def prepare(self, field:Field, cultivar:Cultivar, planting:Planting, 
+                simulation_controls:SimulationControls, harvest:Harvest=None,
+                initial_conditions:InitialConditions=None, 
+                fertilizer:Fertilizer=None, soil_analysis:SoilAnalysis=None, 
+                irrigation:Irrigation=None, residue:Residue=None, 
+                chemical:Chemical=None, tillage:Tillage=None, mow:Mow=None):
+        '''
+        Writes the input files of a treatment, so it can be run several times 
+        with different cultivar and ecotype parameters using rerun(). The 
+        FileX, soil and weather files are written only once, and only the CUL
+        and ECO files are written in each rerun. The parameters are the same 
+        of run_treatment.
+        '''
+        treatment = {
+            "field": field, "cultivar": cultivar, "planting": planting, 
+            "simulation_controls": simulation_controls, "harvest": harvest,
+            "initial_conditions": initial_conditions, "fertilizer": fertilizer,
+            "soil_analysis": soil_analysis, "irrigation": irrigation, 
+            "residue": residue, "chemical": chemical, "tillage": tillage,
+            "mow": mow
+        }
+        with self._run_stats.phase("validation"):
+            _check_treatment(**treatment)
+        self._clean_run_path()
+        # The cultivar is copied, so the rerun parameters don't modify the 
+        # user's object.
+        self._prepared = {
+            "filex": self._write_inputs([treatment]),
+            "cultivar": _copy_crop(cultivar), "defaults": {}, "parameters": {},
+            "weather": field["wsta"], "written_weather": field["wsta"],
+        }
+
+    @_recorded
+    def rerun(self, parameters:dict=None, weather:WeatherStation=None, 
+              verbose=False, timeout:float=None, stream=None):
+        '''
+        Runs the treatment set with prepare() using the passed cultivar and 
+        ecotype parameters, or weather. The parameters not passed keep the 
+        values of the prepared cultivar. Only the files that change from the
+        previous run are written.
+
+        Arguments
+        ----------
+        parameters: dict
+            Cultivar or ecotype parameters, e.g. {"p1": 210, "topt": 32}
+        weather: WeatherStation
+            Weather to use instead of the prepared weather station. It must 
+            cover the same years of the prepared weather station, and it is
+            written with the prepared WTH file name.
+        verbose: bool
+            Whether to display the model std out or not
+        timeout: float
+            Seconds the model can run. If it doesn't finish in time, it is 
+            killed and DSSATTimeoutError is raised. By default, the engine 
+            timeout.
+        stream: stream.Stream
+            If passed, the output tables are read while the model runs, and
+            the new rows are passed to the stream callback. If the callback 
+            stops the model, None is returned.
+        '''
+        assert self._prepared, \
+            "A treatment must be prepared before calling rerun"
+        cultivar = self._prepared["cultivar"]
+        defaults = self._prepared["defaults"]
+        parameters = {
+            name.lower(): value for name, value in (parameters or {}).items()
+        }
+        for name in parameters:
+            if name not in defaults:
+                defaults[name] = _get_crop_parameter(cultivar, name)
+        parameters = {**defaults, **parameters}
+        self._clean_run_path()
+        if parameters != self._prepared["parameters"]:
+            with self._run_stats.phase("write_cultivar"):
+                _set_crop_parameters(cultivar, parameters)
+                self._write_file(
+                    cultivar.spe_file[:-3]+"CUL", cultivar._write_cul(),
+                    "write_cultivar"
+                )
+                if cultivar.eco_dtypes:
+                    self._write_file(
+                        cultivar.spe_file[:-3]+"ECO", cultivar._write_eco(),
+                        "write_cultivar"
+                    )
+            self._prepared["parameters"] = parameters
+        weather = weather or self._prepared["weather"]
+        if weather is not self._prepared["written_weather"]:
+            # It's written with the prepared file name, so the station code
+            # may differ
+            years = _wth_years(self._prepared["weather"])
+            assert _wth_years(weather) == years, \
+                "weather must cover the same years of the prepared weather station"
+            wth_filename = _wth_filename(self._prepared["weather"])
+            with self._run_stats.phase("write_weather"):
+                self._write_file(
+                    os.path.join("Weather", wth_filename), weather._write_wth(),
+                    "write_weather"
+                )
+            self._prepared["written_weather"] = weather
+        self._run_model(
+            'C', os.path.basename(self._prepared["filex"]), 1, verbose,
+            timeout, stream
+        )
+        if self.stopped:
+            return None
+        return self._parse_outputs()
+
+    def _parse_outputs(self):
+        '''
+        Reads the output files after a single treatment run. Returns the 
+        RunResult of the run.
+        '''
+        # Get the output files
+        self._fetch_output()
+        # parse ouputs from files
+        with self._run_stats.phase("parse_output"):
+            tables = {}
+            for fname, file_lines in self.output_files.items():
+                if (fname not in OUTPUTS) or (f"{fname}.csv" in self.output_files):
+                    continue
+                try:
+                    df = _read_output_table(file_lines)
+                except Exception:
+                    break
+                self._output[fname] = df
+                tables[fname] = table_columns(df)
+            for fname in OUTPUTS:
+                if f"{fname}.csv" in self.output_files:
+                    df = _read_csv_table(self.output_files[f"{fname}.csv"])
+                    self._output[fname] = df
+                    tables[fname] = table_columns(df)
+
+            out_dict = {
+                k.lower(): int(v) if int(v) != -99 else None
+                for k, v in zip(
+                    self.stdout.split("\n")[-3][10:].split(),
+                    self.stdout.split("\n")[-1][10:].split(),
+                )
+            }
+            summary = self._read_summary()
+            row = 0 if len(summary.get("runno", [])) else None
+        return RunResult(out_dict, summary, row, tables)
+
+    @_recorded
+    def run_batch(self, treatments:list, verbose=True, timeout:float=None,
+                  stream=None):
+        '''
+        Run several treatments in a single model call. All the treatments are
+        written in the same FileX, and the model is run in the 'A' mode (all 
+        treatments in the FileX). Section objects shared by several treatments
+        are written only once. Up to 99 treatments can be run in one batch.
+
+        The output tables are stored in the output_tables attribute, where 
+        the TRNO column identifies the treatment of each row.
+
+        Arguments
+        ----------
+        treatments: list of dict
+            Each item is a dictionary with the run_treatment parameters 
+            (field, cultivar, planting, etc.) for one treatment. The treatment
+            name can be set using the 'tname' key.
+        verbose: bool
+            Whether to display the model std out or not
+        timeout: float
+            Seconds the model can run. If it doesn't finish in time, it is 
+            killed and DSSATTimeoutError is raised. By default, the engine 
+            timeout.
+        stream: stream.Stream
+            If passed, the output tables are read while the model runs, and
+            the new rows are passed to the stream callback. If the callback 
+            stops the model, all the items are None.
+
+        Returns
+        ----------
+        list of RunResult
+            The result of each treatment, in the same order of the treatments
+            list. If a treatment was not run, its item is None.
+        '''
+        with self._run_stats.phase("validation"):
+            for treatment in treatments:
+                _check_treatment(**treatment)
+        self._clean_run_path()
+        filex_name = self._write_inputs(treatments)
+        self._run_model(
+            'A', os.path.basename(filex_name), verbose=verbose, 
+            timeout=timeout, stream=stream
+        )
+        if self.stopped:
+            return [None] * len(treatments)
+        results = {
+            trno: result for _, trno, result in self._parse_run_outputs()
+        }
+        return [results.get(n) for n in range(1, len(treatments) + 1)]
+
+    @_recorded
+    def run_sequence(self, components:list, verbose=True, timeout:float=None,
+                     stream=None):
+        '''
+        Runs a sequence (rotation) of treatments in a single model call, using
+        the sequence mode ('Q'). Each component is a crop season, and the 
+        components are simulated one after the other, so the soil state at the 
+        end of a season is the initial state of the next one. The sequence is
+        repeated during the number of years (nyers) of the first component 
+        simulation controls.
+
+        All the components must be in the same field. The initial conditions 
+        and the simulation controls of the first component are used for the 
+        whole sequence. The output tables have a RUN column, that identifies 
+        the season, and a TRNO column, that identifies the component.
+
+        Arguments
+        ----------
+        components: list of dict
+            Each item is a dictionary with the run_treatment parameters 
+            (field, cultivar, planting, etc.) of one component, in the order
+            they are simulated.
+        verbose: bool
+            Whether to display the model std out or not
+        timeout: float
+            Seconds the model can run. If it doesn't finish in time, it is 
+            killed and DSSATTimeoutError is raised. By default, the engine 
+            timeout.
+        stream: stream.Stream
+            If passed, the output tables are read while the model runs, and
+            the new rows are passed to the stream callback. If the callback 
+            stops the model, None is returned.
+
+        Returns
+        ----------
+        list of RunResult
+            The result of each season, in the order they were simulated. The
+            run and trno keys are the season and component numbers.
+        '''
+        assert 0 < len(components) < 100, \
+            "A sequence can have between 1 and 99 components"
+        field = components[0]["field"]
+        simulation_controls = components[0]["simulation_controls"]
+        with self._run_stats.phase("validation"):
+            for component in components:
+                _check_treatment(**component)
+                assert component["field"]["id_field"] == field["id_field"], \
+                    "All the sequence components must be in the same field"
+        components = [
+            {
+                **component, "r": 1, "o": 1, "c": n, "field": field, 
+                "simulation_controls": simulation_controls
+            }
+            for n, component in enumerate(components)
+        ]
+        self._clean_run_path()
+        filex_name = self._write_inputs(components, "SQX")
+        with self._run_stats.phase("write_config"):
+            self._write_file(BATCH_FILE, 
+                "$BATCH(SEQUENCE)\n!\n"
+                f"{'@FILEX':<92}  TRTNO     RP     SQ     OP     CO\n"
+                f"{os.path.basename(filex_name):<92}"
+                f"{1:>7d}{1:>7d}{0:>7d}{1:>7d}{0:>7d}\n",
+                "write_config"
+            )
+        self._run_model(
+            'Q', BATCH_FILE, verbose=verbose, timeout=timeout, stream=stream
+        )
+        if self.stopped:
+            return None
+        results = self._parse_run_outputs(run_column=True)
+        for run, trno, result in results:
+            result.outputs = {"run": run, "trno": trno, **result.outputs}
+        return [result for _, _, result in results]
+
+    def _parse_run_outputs(self, run_column=False):
+        '''
+        Reads the output files after a run with several treatments or seasons.
+        The output tables have the TRNO column, and the RUN column if 
+        run_column. The tables read from CSV outputs always have both. Returns
+        the run number, treatment number and RunResult of each run. The 
+        results share the summary and table columns.
+        '''
+        self._fetch_output()
+        self._output = {}
+        with self._run_stats.phase("parse_output"):
+            bounds = {} # Rows of each run in the output tables
+            for fname, file_lines in self.output_files.items():
+                if (fname not in OUTPUTS) or (f"{fname}.csv" in self.output_files):
+                    continue
+                runs = []
+                bounds[fname] = {}
+                start = 0
+                for run_lines in re.split(r"^\*RUN", file_lines, flags=re.M)[1:]:
+                    run = int(run_lines.split()[0])
+                    trno = re.search(r"TREATMENT\s+(\d+)", run_lines)
+                    trno = int(trno[1]) if trno else run
+                    run_lines = "\n".join(
+                        line for line in run_lines.split("\n")[1:]
+                        if line[:1] != "*"
+                    )
+                    df = _read_output_table(run_lines)
+                    df.insert(0, "TRNO", trno)
+                    if run_column:
+                        df.insert(0, "RUN", run)
+                    runs.append(df)
+                    bounds[fname][run] = slice(start, start + len(df))
+                    start += len(df)
+                if runs:
+                    self._output[fname] = pd.concat(runs)
+            for fname in OUTPUTS:
+                if f"{fname}.csv" in self.output_files:
+                    df = _read_csv_table(self.output_files[f"{fname}.csv"])
+                    self._output[fname] = df
+                    bounds[fname] = _run_bounds(df["RUN"].to_numpy())
+            tables = {
+                fname: table_columns(df) for fname, df in self._output.items()
+            }
+            summary = self._read_summary()
+            rows = {
+                int(run): row 
+                for row, run in enumerate(summary.get("runno", []))
+            }
+            results = []
+            for run, trno, values in _parse_stdout(self.stdout):
+                results.append((run, trno, RunResult(
+                    values, summary, rows.get(run), {
+                        fname: {
+                            name: column[bounds[fname][run]]
+                            for name, column in columns.items()
+                        }
+                        for fname, columns in tables.items()
+                        if run in bounds[fname]
+                    }
+                )))
+        return results
+
+    def _read_summary(self):
+        '''
+        Parses the Summary.csv output if the model wrote it, or Summary.OUT.
+        '''
+        if "Summary.csv" in self.output_files:
+            return read_summary_csv(self.output_files["Summary.csv"])
+        return read_summary(self.output_files.get("Summary", ""))
+
+    def _clean_run_path(self):
+        '''
+        Removes previous outputs and inputs.
+        '''
+        with self._run_stats.phase("clean"):
+            OUTPUT_FILES = [
+                i for i in os.listdir(self.run_path) 
+                if (i[-3:] == 'OUT') or (i[-4:].lower() == '.csv')
+            ]
+            INP_FILES = [i for i in os.listdir(self.run_path) if i[-3:] in ['INP', 'INH']]
+            self.output_files = {}
+            for file in (OUTPUT_FILES + INP_FILES):
+                os.remove(os.path.join(self.run_path, file))
+
+    def _write_file(self, filename:str, text:str, phase:str):
+        '''
+        Writes text to filename, relative to the run path. The written bytes
+        are added to the phase stats.
+        '''
+        with open(os.path.join(self.run_path, filename), "w") as f:
+            f.write(text)
+        self._run_stats.bytes[phase] += len(text)
+
+    def _write_inputs(self, treatments:list, filex_extension:str=None):
+        '''
+        Writes the FileX, CUL, ECO, SOL, WTH, MOW and configuration files for
+        a list of treatments. Returns the FileX path. By default, the FileX 
+        extension is the crop code of the first treatment followed by X.
+        '''
+        if self.tables_only:
+            treatments = _csv_outputs(treatments)
         # File X
-        filex_name = field["id_field"][:4] +\
-            simulation_controls["general"]["sdate"].strftime('%y01') +\
-            f'.{cultivar.code}X'
+        first = treatments[0]
+        filex_extension = filex_extension or f'{first["cultivar"].code}X'
+        filex_name = first["field"]["id_field"][:4] +\
+            first["simulation_controls"]["general"]["sdate"].strftime('%y01') +\
+            f'.{filex_extension}'
         filex_name = os.path.join(self.run_path, filex_name.upper())
-        with open(filex_name, "w") as f:
-            lines = create_filex(
-                field, cultivar, planting, simulation_controls, harvest, 
-                initial_conditions, fertilizer, soil_analysis, irrigation,
-                residue, chemical, tillage
+        with self._run_stats.phase("write_filex"), open(filex_name, "w") as f:
+            create_batch_filex(treatments, file=f)
+            self._run_stats.bytes["write_filex"] += f.tell()
+
+        cul_files, eco_files, wth_files, soils = {}, {}, {}, {}
+        crops, mow_lines = {}, []
+        for trno, treatment in enumerate(treatments, 1):
+            cultivar = treatment["cultivar"]
+            crops[cultivar.code] = cultivar.smodel
+            # Cultivar and ecotype
+            _add_unique(
+                cul_files.setdefault(cultivar.spe_file[:-3]+"CUL", {}), 
+                cultivar._write_cul_line().split()[0], cultivar, 
+                "_write_cul_line"
             )
-            f.write(lines)
-        # Cultivar and ecotype
-        cul_filename = os.path.join(self.run_path, cultivar.spe_file[:-3]+"CUL") 
-        with open(cul_filename, "w") as f:
-            lines = cultivar._write_cul()
-            f.write(lines)
-        eco_filename = os.path.join(self.run_path, cultivar.spe_file[:-3]+"ECO") 
-        if cultivar.eco_dtypes:
-            with open(eco_filename, "w") as f:
-                lines = cultivar._write_eco()
-                f.write(lines)
-        # Soil
-        sol_filename = os.path.join(self.run_path, "SOIL.SOL")
-        with open(sol_filename, "w") as f:
-            lines = field["id_soil"]._write_sol()
-            f.write(lines)
-        # Weather
-        wth_year = field["wsta"].table[0]["date"].year
-        wth_len = field["wsta"].table[-1]["date"].year - wth_year + 1
-        wth_filename = f'{field["wsta"]["insi"]}{str(wth_year)[2:]}{wth_len:02d}.WTH'
-        wth_filename = os.path.join(self.run_path, "Weather", wth_filename)
-        with open(wth_filename, "w") as f:
-            lines = field["wsta"]._write_wth()
-            f.write(lines)
-        # Mow
-        if type(cultivar).__name__ in PERENIAL_FORAGES:
-            if (not mow) or (len(mow.table) < 1):
-                warnings.warn('Mow was not defined. It can be defined in the mow parameter.')
-            else:
-                mow_file_path = os.path.join(self.run_path, f'{filex_name[:-4]}.MOW')
-                with open(mow_file_path, 'w') as f: 
-                    file_str = mow._write_section()
-                    f.write(file_str)
-        # Configuration file
-        with open(os.path.join(self.run_path, CONFILE), 'w') as f:
-            f.write(f'WED    {os.path.join(self.run_path, "Weather")}\n')
+            if cultivar.eco_dtypes:
+                _add_unique(
+                    eco_files.setdefault(cultivar.spe_file[:-3]+"ECO", {}), 
+                    cultivar["eco#"].str, cultivar, "_write_eco_line"
+                )
+            # Soil
+            soil = treatment["field"]["id_soil"]
+            _add_unique(soils, soil["name"], soil, "_write_sol")
+            # Weather
+            wsta = treatment["field"]["wsta"]
+            _add_unique(wth_files, _wth_filename(wsta), wsta, "_write_wth")
+            # Mow
+            if type(cultivar).__name__ in PERENIAL_FORAGES:
+                mow = treatment.get("mow")
+                if (not mow) or (len(mow.table) < 1):
+                    warnings.warn('Mow was not defined. It can be defined in the mow parameter.')
+                else:
+                    mow_lines.append(mow._write_section(trno))
+
+        # Only the first cultivar, ecotype and soil of each file are written
+        # with the file header.
+        with self._run_stats.phase("write_cultivar"):
+            for filename, cultivars in cul_files.items():
+                cultivars = list(cultivars.values())
+                self._write_file(filename, cultivars[0]._write_cul() + "".join(
+                    cultivar._write_cul_line() for cultivar in cultivars[1:]
+                ), "write_cultivar")
+            for filename, cultivars in eco_files.items():
+                cultivars = list(cultivars.values())
+                self._write_file(filename, cultivars[0]._write_eco() + "".join(
+                    cultivar._write_eco_line() for cultivar in cultivars[1:]
+                ), "write_cultivar")
+        with self._run_stats.phase("write_soil"):
+            soils = list(soils.values())
+            self._write_file("SOIL.SOL", soils[0]._write_sol() + "".join(
+                "\n" + soil._write_sol().split("\n", 2)[-1] 
+                for soil in soils[1:]
+            ), "write_soil")
+        with self._run_stats.phase("write_weather"):
+            for filename, wsta in wth_files.items():
+                self._write_file(
+                    os.path.join("Weather", filename), wsta._write_wth(),
+                    "write_weather"
+                )
+        with self._run_stats.phase("write_config"):
+            if mow_lines:
+                self._write_file(f'{filex_name[:-4]}.MOW', mow_lines[0] + "".join(
+                    lines.split("\n", 2)[-1] for lines in mow_lines[1:]
+                ), "write_config")
+            # Configuration file
+            config = f'WED    {os.path.join(self.run_path, "Weather")}\n'
             # if cultivar.code in ["WH", "BA"]:
             #     f.write(f'M{cultivar.code}    {self.run_path} dscsm048 CSCER{VERSION}\n')
             # else:
-            f.write(f'M{cultivar.code}    {self.run_path} dscsm048 {cultivar.smodel}{VERSION}\n')
-            f.write(f'CRD    {CRD_PATH}\n')
-            f.write(f'PSD    {os.path.join(DSSAT_HOME, "Pest")}\n')
-            f.write(f'SLD    {SLD_PATH}\n')
-            f.write(f'STD    {STD_PATH}\n')
+            for code, smodel in crops.items():
+                config += f'M{code}    {self.run_path} {self.engine.name} ' +\
+                    f'{smodel}{self.engine.version}\n'
+            config += f'CRD    {CRD_PATH}\n'
+            config += f'PSD    {os.path.join(DSSAT_HOME, "Pest")}\n'
+            config += f'SLD    {SLD_PATH}\n'
+            config += f'STD    {STD_PATH}\n'
+            self._write_file(CONFILE, config, "write_config")
+        return filex_name
 
-        # Run the model
-        exc_args = [BIN_PATH, 'C', os.path.basename(filex_name), '1']
-        excinfo = subprocess.run(exc_args, 
-            cwd=self.run_path, capture_output=True, text=True,
-            env={"DSSAT_HOME": DSSAT_HOME, }
-        )
+    def _run_model(self, mode:str, file:str, trno:int=None, verbose:bool=True,
+                   timeout:float=None, stream=None):
+        '''
+        Runs the model in mode (e.g. 'C', 'A' or 'Q') for file, using the 
+        engine of the environment. If stream is passed, the output tables are
+        read while the model runs, and the stopped attribute is True if the 
+        stream callback stopped the model.
+        '''
+        self.stdout = ""
+        self.stopped = False
+        monitor = None if stream is None else stream.monitor(self.run_path)
+        with self._run_stats.phase("model"):
+            if monitor is None:
+                excinfo = self.engine.run(
+                    self.run_path, mode, file, trno, 
+                    env={"DSSAT_HOME": DSSAT_HOME}, timeout=timeout
+                )
+            else:
+                excinfo = self.engine.run(
+                    self.run_path, mode, file, trno, 
+                    env={"DSSAT_HOME": DSSAT_HOME}, timeout=timeout,
+                    monitor=monitor, interval=stream.interval
+                )
+        self._run_stats.runs += 1
+        if getattr(excinfo, "stopped", False):
+            self.stopped = True
+            return
+        if monitor is not None:
+            # The rows written after the last read
+            monitor()
         excinfo.stdout = re.sub("\n{2,}", "\n", excinfo.stdout)
         excinfo.stdout = re.sub("\n$", "", excinfo.stdout)
         self.stdout = excinfo.stdout.strip()
@@ -286,59 +1076,27 @@ class DSSAT:
                     print(line, end='')
             raise RuntimeError("DSSAT execution Failed. Check the ERROR.OUT file")
 
-        # Get the output files
-        self._fetch_output()
-        # parse ouputs from files
-        for fname, file_lines in self.output_files.items():
-            # determine how many rows to skip in output file
-            if fname not in OUTPUTS:
-                continue
-            table_start = -1
-            init_lines = []
-            for line in file_lines.split('\n'):
-                table_start += 1
-                init_lines.append(line)
-                if "@" in init_lines[-1][:10]:
-                    break
-            try:
-                df = pd.read_csv(
-                    io.StringIO("".join(file_lines)),
-                    skiprows=table_start,
-                    sep=" ",
-                    skipinitialspace=True,
-                )
-            except Exception:
-                df = pd.read_csv(
-                    io.StringIO("".join(file_lines[table_start:])),
-                    skiprows=0,
-                    sep=" ",
-                    skipinitialspace=True,
-                )
-                break
-
-            if all(("@YEAR" in df.columns, "DOY" in df.columns)):
-                df["DOY"] = df.DOY.astype(int).map(lambda x: f"{x:03d}")
-                df["@YEAR"] = df["@YEAR"].astype(str)
-                df.index = pd.to_datetime((df["@YEAR"] + df["DOY"]), format="%Y%j")
-
-            self._output[fname] = df
-
-        out_dict = {
-            k.lower(): int(v) if int(v) != -99 else None
-            for k, v in zip(
-                self.stdout.split("\n")[-3][10:].split(),
-                self.stdout.split("\n")[-1][10:].split(),
-            )
-        }
-        return out_dict
-
     def _fetch_output(self):
-        files = os.listdir(self.run_path)
-        files = filter(lambda x: x[-4:] == ".OUT", files)
-        for file in files:
-            encoding = detect_encoding(os.path.join(self.run_path, file))
-            with open(os.path.join(self.run_path, file), "r", encoding=encoding) as f:
-                self.output_files[file.split(".")[0]] = ''.join(f.readlines())
+        '''
+        Reads the output files. The text outputs (.OUT) are stored in 
+        output_files by name (e.g. PlantGro), and the CSV outputs by file 
+        name (e.g. PlantGro.csv). If tables_only, only the tables and the
+        summary are read.
+        '''
+        for file in os.listdir(self.run_path):
+            name, extension = os.path.splitext(file)
+            if (extension != ".OUT") and (extension.lower() != ".csv"):
+                continue
+            if self.tables_only and (name not in OUTPUTS + ["Summary"]):
+                continue
+            key = name if extension == ".OUT" else f"{name}.csv"
+            with self._run_stats.phase("detect_encoding"):
+                encoding = detect_encoding(os.path.join(self.run_path, file))
+            with self._run_stats.phase("read_output"):
+                with open(os.path.join(self.run_path, file), "r", encoding=encoding) as f:
+                    text = ''.join(f.readlines())
+                self.output_files[key] = text
+                self._run_stats.bytes["read_output"] += len(text)
 
 
     def close(self):
@@ -364,3 +1122,274 @@ class DSSAT:
 
     
 
+
+def _push(sink, result, **key):
+    '''
+    Pushes the result to the sink. Returns the result without its output 
+    tables, so they are not kept in memory.
+    '''
+    if (sink is None) or not isinstance(result, RunResult):
+        return result
+    sink.push(result, **key)
+    return RunResult(result.outputs, result._summary, result._row)
+
+
+class DSSATPool:
+    '''
+    Pool of simulation environments to run simulations in parallel. Each 
+    worker has its own DSSAT instance, so simulations run by different workers
+    don't share the run directory. As the model runs in a subprocess, the 
+    workers are threads.
+
+    >>> with DSSATPool(n_workers=4) as pool:
+    >>>     results = pool.map(
+    >>>         lambda dssat, treatment: dssat.run_treatment(**treatment),
+    >>>         treatments
+    >>>     )
+
+    The model processes can be limited with a timeout, a niceness, and by 
+    pinning each worker to a CPU:
+    >>> pool = DSSATPool(n_workers=64, timeout=120, pin_workers=True)
+
+    The run methods can push the outputs of each run to a sink (see 
+    DSSATTools.sink), instead of keeping its output tables in memory:
+    >>> pool.run_treatments(treatments, sink=ParquetSink("outputs"))
+    '''
+    def __init__(self, n_workers:int=None, run_path:str=None, 
+                 engine:Engine=None, timeout:float=None, nice:int=None,
+                 pin_workers:bool=False, tables_only:bool=False):
+        """
+        Initializes the pool. The simulation environments are created when 
+        the workers run their first simulation.
+
+        Arguments
+        ----------
+        n_workers: int
+            Number of workers. If None, the number of CPUs is used.
+        run_path: str
+            Directory where the environment of each worker is created. If 
+            None, a tmp directory is created for each worker.
+        engine: engine.Engine
+            Engine used by all the workers to run the model.
+        timeout: float
+            Seconds each model run can take. It overrides the engine timeout.
+            Runs that don't finish in time are killed, and raise 
+            DSSATTimeoutError.
+        nice: int
+            Niceness added to the model processes. It overrides the engine
+            niceness.
+        pin_workers: bool
+            If True, the model processes of each worker run on a single CPU.
+            Workers are assigned to the available CPUs in turns.
+        tables_only: bool
+            If True, the workers only read the output tables and the summary,
+            which the model writes as CSV (see DSSAT).
+        """
+        assert not pin_workers or hasattr(os, "sched_getaffinity"), \
+            "CPU affinity is not supported in this platform"
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.run_path = run_path
+        self.engine = engine or Engine()
+        if timeout is not None:
+            self.engine = copy.copy(self.engine)
+            self.engine.timeout = timeout
+        if nice is not None:
+            self.engine = copy.copy(self.engine)
+            self.engine.nice = nice
+        self.pin_workers = pin_workers
+        self.tables_only = tables_only
+        self._cpus = sorted(os.sched_getaffinity(0)) if pin_workers else None
+        if run_path and not os.path.exists(run_path):
+            os.makedirs(run_path)
+        self._executor = ThreadPoolExecutor(self.n_workers)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._envs = []
+        self._workers = 0
+        self._treatments = {} # Prepared treatments
+
+    def _worker_engine(self):
+        '''
+        Returns the engine of the current worker. If the workers are pinned,
+        it's a copy of the pool engine that runs on the worker CPU.
+        '''
+        if not self.pin_workers:
+            return self.engine
+        if not hasattr(self._local, "engine"):
+            engine = copy.copy(self.engine)
+            engine.cpus = {self._cpus[self._workers % len(self._cpus)]}
+            self._workers += 1
+            self._local.engine = engine
+        return self._local.engine
+
+    def _get_env(self, key=None):
+        '''
+        Returns the simulation environment of the current worker. Each worker
+        can have several environments, identified by key.
+        '''
+        if not hasattr(self._local, "envs"):
+            self._local.envs = {}
+        dssat = self._local.envs.get(key)
+        if dssat is None:
+            with self._lock:
+                run_path = None
+                if self.run_path:
+                    run_path = os.path.join(
+                        self.run_path, f"worker{len(self._envs):03d}"
+                    )
+                dssat = DSSAT(
+                    run_path, engine=self._worker_engine(), 
+                    tables_only=self.tables_only
+                )
+                self._envs.append(dssat)
+            self._local.envs[key] = dssat
+        return dssat
+
+    def map(self, func, items):
+        '''
+        Calls func(dssat, item) for each item, where dssat is the DSSAT 
+        instance of the worker. Returns a list with the results in the same 
+        order of items.
+        '''
+        return list(self._executor.map(
+            lambda item: func(self._get_env(), item), items
+        ))
+
+    def run_treatments(self, treatments:list, verbose=False, sink=None):
+        '''
+        Runs each treatment using DSSAT.run_treatment. treatments is a list of
+        dictionaries with the run_treatment parameters. If sink is passed, 
+        the outputs of each run are pushed to it with the treatment key (the
+        position in treatments).
+        '''
+        def run_treatment(dssat, item):
+            n, treatment = item
+            result = dssat.run_treatment(**treatment, verbose=verbose)
+            return _push(sink, result, treatment=n)
+        return self.map(run_treatment, enumerate(treatments))
+
+    def run_parameters(self, treatment:dict, parameters:list, postprocess=None,
+                       verbose=False, sink=None):
+        '''
+        Runs the same treatment once per item of parameters. Each item is a 
+        dictionary with cultivar and ecotype parameter values (see 
+        DSSAT.rerun). Each worker prepares the treatment in its own 
+        environment the first time the treatment dict is passed, then only the
+        CUL and ECO files are written for each run. Therefore, the treatment 
+        sections must not be modified between calls with the same dict.
+
+        Arguments
+        ----------
+        treatment: dict
+            The DSSAT.run_treatment parameters.
+        parameters: list of dict
+            Cultivar and ecotype parameter values of each run.
+        postprocess: function
+            If passed, it is called as postprocess(dssat, result) after each 
+            run, and its result is returned instead of the standard output.
+        verbose: bool
+            Whether to display the model std out or not
+        sink: sink.Sink
+            If passed, the outputs of each run are pushed to it with the run
+            key (the position in parameters). It's done before postprocess.
+
+        Returns
+        ----------
+        list
+            The result of each run, or None if the run failed. Runs that
+            don't finish within the timeout raise DSSATTimeoutError.
+        '''
+        return self._rerun(
+            treatment, [{"parameters": values} for values in parameters],
+            postprocess, verbose, sink
+        )
+
+    def run_weather(self, treatment:dict, members:list, postprocess=None,
+                    verbose=False, sink=None):
+        '''
+        Runs the same treatment once per weather station in members. It works
+        as run_parameters, but only the WTH file is written for each run. All
+        members must cover the same years of the treatment weather station.
+        '''
+        return self._rerun(
+            treatment, [{"weather": weather} for weather in members],
+            postprocess, verbose, sink
+        )
+
+    def _rerun(self, treatment:dict, reruns:list, postprocess, verbose, 
+               sink=None):
+        '''
+        Calls DSSAT.rerun for each item of reruns, which are the rerun 
+        arguments. The treatment is prepared once per worker.
+        '''
+        key = id(treatment)
+        self._treatments[key] = treatment
+        def rerun(item):
+            n, kwargs = item
+            dssat = self._get_env(key)
+            if not dssat._prepared:
+                dssat.prepare(**treatment)
+            try:
+                result = dssat.rerun(**kwargs, verbose=verbose)
+            except DSSATTimeoutError:
+                raise
+            except RuntimeError:
+                return None
+            if postprocess:
+                _push(sink, result, run=n)
+                return postprocess(dssat, result)
+            return _push(sink, result, run=n)
+        return list(self._executor.map(rerun, enumerate(reruns)))
+
+    @property
+    def stats(self):
+        '''
+        RunStats aggregated across the environments of all the workers.
+        '''
+        stats = RunStats()
+        with self._lock:
+            for dssat in self._envs:
+                stats.update(dssat.stats)
+        return stats
+
+    def run_batches(self, batches:list, verbose=False, sink=None, 
+                    keys:list=None):
+        '''
+        Runs each batch using DSSAT.run_batch. batches is a list of lists of 
+        treatments. Returns the results of each batch and its output tables.
+
+        If sink is passed, the outputs of each run are pushed to it, and the 
+        output tables are not returned. keys has the key of each treatment of
+        each batch (a dict, e.g. {"treatment": 3}). By default, the key is
+        the batch position, as the rows already have the treatment number.
+        '''
+        if keys is None:
+            keys = [[{"batch": n}]*len(batch) for n, batch in enumerate(batches)]
+        def run_batch(dssat, item):
+            batch, batch_keys = item
+            results = dssat.run_batch(batch, verbose=verbose)
+            if sink is None:
+                return results, dict(dssat._output)
+            results = [
+                _push(sink, result, **key) 
+                for result, key in zip(results, batch_keys)
+            ]
+            return results, {}
+        return self.map(run_batch, zip(batches, keys))
+
+    def close(self):
+        '''
+        Stops the workers and removes their simulation environments.
+        '''
+        self._executor.shutdown()
+        for dssat in self._envs:
+            dssat.close()
+        self._envs = []
+        self._treatments = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
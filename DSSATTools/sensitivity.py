@@ -0,0 +1,279 @@
+'''
+This module implements global sensitivity analysis of the model outputs to the
+cultivar and ecotype parameters. Two methods are implemented: the Morris
+screening method (elementary effects), and the Sobol variance-based method.
+
+Both methods receive a treatment, the bounds of the parameters to analyze, and
+the outputs to analyze. The parameter samples are run in parallel, and for each
+run only the CUL and ECO files are written:
+    >>> treatment = dict(
+    >>>     field=field, cultivar=crop, planting=planting,
+    >>>     simulation_controls=simulation_controls
+    >>> )
+    >>> indices = morris(
+    >>>     treatment, bounds={"p1": (150, 300), "topt": (30, 36)},
+    >>>     outputs=["harwt", "mat"], n_trajectories=20
+    >>> )
+    >>> indices["harwt"] # DataFrame with the mu, mu_star and sigma indices
+
+The sampling and analysis functions (morris_sample, morris_analyze,
+sobol_sample, sobol_analyze) can be used independently of the model run.
+'''
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from .run import DSSATPool, _get_crop_parameter
+from .result import RunResult
+
+
+def _check_bounds(bounds:dict):
+    """
+    Checks the parameter bounds and returns the lower and upper bounds arrays.
+    """
+    assert len(bounds) > 0, "At least one parameter must be defined"
+    for name, (lower, upper) in bounds.items():
+        assert lower < upper, \
+            f"{name} lower bound must be smaller than its upper bound"
+    lower, upper = np.array(list(bounds.values()), dtype=float).T
+    return lower, upper
+
+def morris_sample(bounds:dict, n_trajectories:int=10, n_levels:int=4,
+                  seed:int=None):
+    '''
+    Generates the Morris trajectories. Each trajectory has k+1 points, where k
+    is the number of parameters, and each point differs from the previous one
+    in a single parameter.
+
+    Arguments
+    ----------
+    bounds: dict
+        Maps the parameter name to its (lower, upper) bounds.
+    n_trajectories: int
+        Number of trajectories.
+    n_levels: int
+        Number of levels of the parameter grid. It must be an even number.
+    seed: int
+        Random seed.
+
+    Returns
+    ----------
+    pandas.DataFrame
+        Parameter samples, one row per point.
+    '''
+    assert n_levels % 2 == 0, "n_levels must be an even number"
+    lower, upper = _check_bounds(bounds)
+    rng = np.random.default_rng(seed)
+    k = len(bounds)
+    delta = n_levels / (2 * (n_levels - 1))
+    B = np.tril(np.ones((k + 1, k)), -1)
+    grid = np.arange(n_levels // 2) / (n_levels - 1)
+    trajectories = []
+    for _ in range(n_trajectories):
+        x = rng.choice(grid, k)
+        D = np.diag(rng.choice([-1, 1], k))
+        P = np.eye(k)[rng.permutation(k)]
+        J = np.ones((k + 1, k))
+        trajectory = (
+            J * x + delta / 2 * ((2 * B - J) @ D + J)
+        ) @ P
+        trajectories.append(trajectory)
+    samples = np.concatenate(trajectories)
+    return pd.DataFrame(lower + samples * (upper - lower), columns=list(bounds))
+
+def morris_analyze(bounds:dict, samples:pd.DataFrame, outputs:pd.DataFrame):
+    '''
+    Estimates the Morris indices from the samples generated with
+    morris_sample and the model outputs for each sample. Failed runs (missing
+    outputs) are ignored.
+
+    Returns
+    ----------
+    dict
+        Maps each output to a DataFrame with the mu, mu_star and sigma indices
+        of each parameter.
+    '''
+    lower, upper = _check_bounds(bounds)
+    k = len(bounds)
+    x = ((samples[list(bounds)].values - lower) / (upper - lower))
+    x = x.reshape(-1, k + 1, k)
+    indices = {}
+    for output in outputs.columns:
+        y = outputs[output].values.astype(float).reshape(-1, k + 1)
+        dx = np.diff(x, axis=1) # trajectories, k, parameters
+        dy = np.diff(y, axis=1)
+        effects = np.full((len(x), k), np.nan)
+        for t in range(len(x)):
+            step, par = np.nonzero(dx[t])
+            effects[t, par] = dy[t, step] / dx[t, step, par]
+        indices[output] = pd.DataFrame({
+            "mu": np.nanmean(effects, axis=0),
+            "mu_star": np.nanmean(np.abs(effects), axis=0),
+            "sigma": np.nanstd(effects, axis=0, ddof=1),
+        }, index=list(bounds))
+    return indices
+
+def sobol_sample(bounds:dict, n_samples:int=1000, seed:int=None):
+    '''
+    Generates the samples for the Sobol indices estimation. Two independent
+    matrices A and B are sampled, and k matrices AB_i are built from A with
+    the i-th column of B. Then, the model is run n_samples*(k+2) times.
+
+    Arguments
+    ----------
+    bounds: dict
+        Maps the parameter name to its (lower, upper) bounds.
+    n_samples: int
+        Number of rows of the A and B matrices.
+    seed: int
+        Random seed.
+
+    Returns
+    ----------
+    pandas.DataFrame
+        Parameter samples. Rows are ordered as A, B, AB_1, ..., AB_k.
+    '''
+    lower, upper = _check_bounds(bounds)
+    rng = np.random.default_rng(seed)
+    k = len(bounds)
+    A = rng.random((n_samples, k))
+    B = rng.random((n_samples, k))
+    ABs = []
+    for i in range(k):
+        AB = A.copy()
+        AB[:, i] = B[:, i]
+        ABs.append(AB)
+    samples = np.concatenate([A, B] + ABs)
+    return pd.DataFrame(lower + samples * (upper - lower), columns=list(bounds))
+
+def sobol_analyze(bounds:dict, outputs:pd.DataFrame):
+    '''
+    Estimates the first order (S1) and total (ST) Sobol indices from the
+    model outputs for the samples generated with sobol_sample. S1 is estimated
+    using the Saltelli (2010) estimator, and ST using the Jansen estimator.
+    Rows with failed runs are ignored.
+
+    Returns
+    ----------
+    dict
+        Maps each output to a DataFrame with the S1 and ST indices of each
+        parameter.
+    '''
+    k = len(bounds)
+    indices = {}
+    for output in outputs.columns:
+        y = outputs[output].values.astype(float).reshape(k + 2, -1)
+        y = y[:, np.isfinite(y).all(axis=0)]
+        y_a, y_b, y_ab = y[0], y[1], y[2:]
+        var = np.var(np.concatenate([y_a, y_b]))
+        indices[output] = pd.DataFrame({
+            "S1": np.mean(y_b * (y_ab - y_a), axis=1) / var,
+            "ST": 0.5 * np.mean((y_a - y_ab)**2, axis=1) / var,
+        }, index=list(bounds))
+    return indices
+
+def run_samples(treatment:dict, samples:pd.DataFrame, outputs:list,
+                n_workers:int=None, run_path:str=None, **pool_kwargs):
+    '''
+    Runs the treatment for each parameter sample. Returns a DataFrame with the
+    outputs of each sample. The outputs of failed runs are missing values.
+    Numeric outputs are returned as float, and other outputs (e.g. the mdat
+    and adat dates) as they are. pool_kwargs are passed to DSSATPool.
+    '''
+    # The parameter names are checked before running the samples
+    for name in samples.columns:
+        _get_crop_parameter(treatment["cultivar"], name)
+    with DSSATPool(n_workers, run_path, **pool_kwargs) as pool:
+        results = pool.run_parameters(treatment, samples.to_dict("records"))
+    results = RunResult.concat(results).set_axis(samples.index)
+    for output in outputs:
+        assert output in results.columns or results.empty, \
+            f"{output} is not in the model outputs"
+    results = results.reindex(columns=outputs)
+    for output in outputs:
+        if is_numeric_dtype(results[output]) or results[output].isna().all():
+            results[output] = results[output].astype(float)
+    return results
+
+def morris(treatment:dict, bounds:dict, outputs:list=["harwt"],
+           n_trajectories:int=10, n_levels:int=4, seed:int=None,
+           n_workers:int=None, run_path:str=None, **pool_kwargs):
+    '''
+    Morris screening of the cultivar and ecotype parameters.
+
+    Arguments
+    ----------
+    treatment: dict
+        The DSSAT.run_treatment parameters.
+    bounds: dict
+        Maps the cultivar or ecotype parameter name to its (lower, upper)
+        bounds.
+    outputs: list
+        Outputs to analyze. They are the keys of the run_treatment result,
+        and they must be numeric.
+    n_trajectories: int
+        Number of trajectories. The model is run n_trajectories*(k+1) times.
+    n_levels: int
+        Number of levels of the parameter grid.
+    seed: int
+        Random seed.
+    n_workers: int
+        Number of simulations to run in parallel.
+    run_path: str
+        Directory where the simulation environments are created.
+    pool_kwargs:
+        Other DSSATPool arguments, e.g. engine, timeout, nice, pin_workers or
+        tables_only.
+
+    Returns
+    ----------
+    dict
+        Maps each output to a DataFrame with the mu, mu_star and sigma indices
+        of each parameter.
+    '''
+    samples = morris_sample(bounds, n_trajectories, n_levels, seed)
+    results = run_samples(
+        treatment, samples, outputs, n_workers, run_path, **pool_kwargs
+    )
+    return morris_analyze(bounds, samples, results)
+
+def sobol(treatment:dict, bounds:dict, outputs:list=["harwt"],
+          n_samples:int=1000, seed:int=None, n_workers:int=None,
+          run_path:str=None, **pool_kwargs):
+    '''
+    Sobol sensitivity indices of the cultivar and ecotype parameters.
+
+    Arguments
+    ----------
+    treatment: dict
+        The DSSAT.run_treatment parameters.
+    bounds: dict
+        Maps the cultivar or ecotype parameter name to its (lower, upper)
+        bounds.
+    outputs: list
+        Outputs to analyze. They are the keys of the run_treatment result,
+        and they must be numeric.
+    n_samples: int
+        Number of base samples. The model is run n_samples*(k+2) times.
+    seed: int
+        Random seed.
+    n_workers: int
+        Number of simulations to run in parallel.
+    run_path: str
+        Directory where the simulation environments are created.
+    pool_kwargs:
+        Other DSSATPool arguments, e.g. engine, timeout, nice, pin_workers or
+        tables_only.
+
+    Returns
+    ----------
+    dict
+        Maps each output to a DataFrame with the S1 and ST indices of each
+        parameter.
+    '''
+    samples = sobol_sample(bounds, n_samples, seed)
+    results = run_samples(
+        treatment, samples, outputs, n_workers, run_path, **pool_kwargs
+    )
+    return sobol_analyze(bounds, results)
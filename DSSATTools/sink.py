@@ -0,0 +1,304 @@
+'''
+This module hosts the result sinks. A sink writes the outputs of many runs to
+disk as they are produced, so they are not kept in memory until the end of a
+large job. The rows of each output table are buffered, and written when the
+buffer is full:
+    >>> with ParquetSink("outputs", tables=["PlantGro"], variables=["LAID"]) as sink:
+    >>>     for n, treatment in enumerate(treatments):
+    >>>         sink.push(dssat.run_treatment(**treatment), treatment=n)
+
+The pool run methods and Sweep.run push each run to the sink from the worker
+that ran it, and don't keep its output tables:
+    >>> with DSSATPool(n_workers=8) as pool, SQLiteSink("outputs.db") as sink:
+    >>>     pool.run_treatments(treatments, sink=sink)
+
+Each output table (e.g. PlantGro) is written to its own table or file, with
+the key columns of each run (e.g. treatment) first. The Summary table has one
+row per run, with the standard output and the Summary.OUT values. There are
+three sinks: ParquetSink (a .parquet file per table, a row group per write),
+ArrowSink (an Arrow IPC .arrow file per table), and SQLiteSink (a table per
+output table). Parquet and Arrow require pyarrow.
+'''
+
+import os
+import sqlite3
+import warnings
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .result import RunResult
+
+SUMMARY_TABLE = "Summary"
+BUFFER_ROWS = 100_000
+
+
+def _pyarrow():
+    """
+    Imports pyarrow, which is an optional dependency.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.ipc
+    except ImportError:
+        raise ImportError(
+            "pyarrow is required to write Parquet and Arrow files. Install it "
+            "with: pip install pyarrow"
+        )
+    return pyarrow
+
+
+class Sink:
+    '''
+    Base class of the result sinks. The subclasses implement _write, which
+    writes a chunk of rows of a table, and _close.
+    '''
+    def __init__(self, path:str, tables:list=None, variables:list=None,
+                 buffer_rows:int=BUFFER_ROWS):
+        '''
+        Arguments
+        ----------
+        path: str
+            Where the outputs are written. A directory, or a database file
+            for SQLiteSink.
+        tables: list of str
+            Tables to write (e.g. ["PlantGro", "Summary"]). By default, all
+            the output tables and the Summary table.
+        variables: list of str or dict
+            Columns to write. It is a list with the columns of all the tables,
+            or a dict mapping the table names to their columns. The key
+            columns and the DATE column are always written. By default, all
+            the columns.
+        buffer_rows: int
+            Rows of a table that are buffered before writing them.
+        '''
+        assert buffer_rows > 0, "buffer_rows must be positive"
+        self.path = path
+        self.tables = None if tables is None else list(tables)
+        self.variables = variables
+        self.buffer_rows = buffer_rows
+        self.rows = {} # Rows written per table
+        self._buffers = {}
+        self._buffered = {}
+        self._columns = {} # Columns of each table, set by its first write
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _selected(self, table:str, names):
+        """
+        Returns the names of the columns of table that are written.
+        """
+        if self.variables is None:
+            return list(names)
+        if isinstance(self.variables, dict):
+            variables = self.variables.get(table)
+            if variables is None:
+                return list(names)
+        else:
+            variables = self.variables
+        return [
+            name for name in names if (name == "DATE") or (name in variables)
+        ]
+
+    def push(self, result:RunResult, **key):
+        '''
+        Adds the outputs of a run. key are the columns that identify the run
+        (e.g. treatment=3), which are added to all its rows. Failed runs
+        (None) are ignored.
+        '''
+        assert not self._closed, "The sink is closed"
+        if result is None:
+            return
+        chunks = {}
+        for table, columns in result.tables.items():
+            if (self.tables is not None) and (table not in self.tables):
+                continue
+            chunks[table] = {
+                name: columns[name] for name in self._selected(table, columns)
+            }
+        if (self.tables is None) or (SUMMARY_TABLE in self.tables):
+            # Only the values, the tables are not needed
+            chunks[SUMMARY_TABLE] = RunResult(
+                result.outputs, result._summary, result._row
+            )
+        with self._lock:
+            for table, chunk in chunks.items():
+                self._buffers.setdefault(table, []).append((key, chunk))
+                self._buffered[table] = self._buffered.get(table, 0) + (
+                    1 if table == SUMMARY_TABLE
+                    else len(next(iter(chunk.values()), []))
+                )
+                if self._buffered[table] >= self.buffer_rows:
+                    self._flush_table(table)
+
+    def _frame(self, table:str, chunks:list):
+        """
+        Returns the buffered chunks of a table as a DataFrame.
+        """
+        keys = [key for key, _ in chunks]
+        if table == SUMMARY_TABLE:
+            df = RunResult.concat([result for _, result in chunks])
+            df = df[self._selected(table, df.columns)]
+            lengths = [1]*len(chunks)
+        else:
+            lengths = [len(next(iter(chunk.values()), [])) for _, chunk in chunks]
+            names = []
+            for _, chunk in chunks:
+                names += [name for name in chunk if name not in names]
+            df = pd.DataFrame({
+                name: np.concatenate([
+                    chunk[name] if name in chunk else np.full(length, np.nan)
+                    for (_, chunk), length in zip(chunks, lengths)
+                ])
+                for name in names
+            })
+        key_names = []
+        for key in keys:
+            key_names += [name for name in key if name not in key_names]
+        for n, name in enumerate(key_names):
+            if name in df:
+                # The key replaces the output column of the same name
+                del df[name]
+            df.insert(n, name, np.repeat(
+                [key.get(name) for key in keys], lengths
+            ))
+        # Numeric columns are written as float, so the missing values of
+        # any chunk keep the table schema.
+        for name in df.columns[len(key_names):]:
+            if df[name].dtype.kind in "iub":
+                df[name] = df[name].astype(float)
+        return df
+
+    def _flush_table(self, table:str):
+        """
+        Writes the buffered rows of a table.
+        """
+        chunks = self._buffers.pop(table, [])
+        self._buffered.pop(table, None)
+        if not chunks:
+            return
+        df = self._frame(table, chunks)
+        columns = self._columns.setdefault(table, list(df.columns))
+        dropped = [name for name in df.columns if name not in columns]
+        if dropped:
+            warnings.warn(
+                f"Columns {', '.join(dropped)} are not in the {table} table "
+                "written before, and they were not written"
+            )
+        df = df.reindex(columns=columns)
+        self._write(table, df)
+        self.rows[table] = self.rows.get(table, 0) + len(df)
+
+    def flush(self):
+        '''
+        Writes all the buffered rows.
+        '''
+        with self._lock:
+            for table in list(self._buffers):
+                self._flush_table(table)
+
+    def close(self):
+        '''
+        Writes the buffered rows and closes the files.
+        '''
+        if self._closed:
+            return
+        self.flush()
+        self._close()
+        self._closed = True
+
+    def _write(self, table:str, df:pd.DataFrame):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.path!r})"
+
+
+class _ArrowWriterSink(Sink):
+    '''
+    Base class of the sinks that write a file per table with pyarrow.
+    '''
+    EXTENSION = None
+
+    def __init__(self, path:str, tables:list=None, variables:list=None,
+                 buffer_rows:int=BUFFER_ROWS):
+        self._pa = _pyarrow()
+        super().__init__(path, tables, variables, buffer_rows)
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self._writers = {}
+
+    def file(self, table:str):
+        '''
+        Returns the path of the file of a table.
+        '''
+        return os.path.join(self.path, f"{table}.{self.EXTENSION}")
+
+    def _write(self, table:str, df:pd.DataFrame):
+        if table in self._writers:
+            writer, schema = self._writers[table]
+            arrow_table = self._pa.Table.from_pandas(
+                df, schema=schema, preserve_index=False
+            )
+        else:
+            arrow_table = self._pa.Table.from_pandas(df, preserve_index=False)
+            writer = self._new_writer(self.file(table), arrow_table.schema)
+            self._writers[table] = (writer, arrow_table.schema)
+        writer.write_table(arrow_table)
+
+    def _close(self):
+        for writer, _ in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+
+class ParquetSink(_ArrowWriterSink):
+    '''
+    Writes each table to a Parquet file in the path directory. Each write is
+    a row group of the file.
+    '''
+    EXTENSION = "parquet"
+
+    def _new_writer(self, file:str, schema):
+        return self._pa.parquet.ParquetWriter(file, schema)
+
+
+class ArrowSink(_ArrowWriterSink):
+    '''
+    Writes each table to an Arrow IPC file in the path directory. Each write
+    is a record batch of the file.
+    '''
+    EXTENSION = "arrow"
+
+    def _new_writer(self, file:str, schema):
+        return self._pa.ipc.new_file(file, schema)
+
+
+class SQLiteSink(Sink):
+    '''
+    Writes each table to a table of the SQLite database in path. The rows are
+    appended if the table exists.
+    '''
+    def __init__(self, path:str, tables:list=None, variables:list=None,
+                 buffer_rows:int=BUFFER_ROWS):
+        super().__init__(path, tables, variables, buffer_rows)
+        # Writes are serialized by the sink lock
+        self._con = sqlite3.connect(path, check_same_thread=False)
+
+    def _write(self, table:str, df:pd.DataFrame):
+        df.to_sql(table, self._con, if_exists="append", index=False)
+        self._con.commit()
+
+    def _close(self):
+        self._con.close()
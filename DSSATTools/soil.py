@@ -180,6 +180,7 @@ class SoilLayer(Record):
     Single soil layer
     """
     prefix = None
+    __slots__ = ()
     dtypes = {
         'slb': NumberType, 'slmh': DescriptionType, 'slll': NumberType,
         'sdul': NumberType, 'ssat': NumberType, 'srgf': NumberType, 
@@ -310,6 +311,7 @@ class SoilLayer(Record):
 
 class SoilProfile(TabularRecord):
     prefix = None
+    __slots__ = ()
     dtypes = {
         'name': DescriptionType, 'soil_data_source': DescriptionType, 
         'soil_clasification': DescriptionType, 'soil_depth': NumberType, 
@@ -473,18 +475,18 @@ class SoilProfile(TabularRecord):
         # First row of parameters
         kwargs = parse_pars_line(
             profile_lines[0][1:], 
-            {par: cls.pars_fmt[par] for par in SURF_PARS_1}
+            cls._layout.select(SURF_PARS_1)
         )
         del kwargs["soil_depth"]
         # Second row of parameters
         kwargs = {**kwargs, **parse_pars_line(
             profile_lines[2][1:], 
-            {par: cls.pars_fmt[par] for par in SURF_PARS_2}
+            cls._layout.select(SURF_PARS_2)
         )}
         # Third row of parameters
         kwargs = {**kwargs, **parse_pars_line(
             profile_lines[4][1:], 
-            {par: cls.pars_fmt[par] for par in SURF_PARS_3}
+            cls._layout.select(SURF_PARS_3)
         )}
         # Soil profile values
         level_1_index = profile_lines.index(
@@ -507,7 +509,7 @@ class SoilProfile(TabularRecord):
         table = []
         for line in pars[1:]:
             table.append(cls.table_dtype(
-                **parse_pars_line(line[1:], cls.table_dtype.pars_fmt)
+                **parse_pars_line(line[1:], cls.table_dtype._layout)
             ))
         
         kwargs['table'] = table
@@ -0,0 +1,179 @@
+'''
+This module hosts the Stream class, which reads the daily output tables while
+the model is running. The output files (e.g. PlantGro.OUT) are read as the
+model writes them, and the new rows are passed to a callback. If the callback
+returns True, the model is stopped. For example, to stop a run once the crop
+fails:
+    >>> def callback(table, rows):
+    >>>     print(rows[["LAID", "CWAD"]])
+    >>>     return (rows["LAID"] < 0.1).any() and (rows["DAP"] > 30).any()
+    >>> result = dssat.run_treatment(**treatment, stream=Stream(callback))
+A stopped run returns None, and the stopped attribute of the DSSAT instance is
+True. Both the text and the CSV (FMOPT=C) outputs are read.
+'''
+
+import os
+import io
+import re
+
+import pandas as pd
+
+from .engine import MONITOR_INTERVAL
+from .result import _doy_dates
+from .run import _read_csv_table
+
+# Lines of the text outputs that are not table rows
+NOT_ROWS = "*!$@"
+
+
+class OutputTail:
+    '''
+    Reads the new rows of an output table each time read is called. Only the
+    complete lines are read, so the file can be read while it's written.
+    '''
+    def __init__(self, run_path:str, table:str):
+        '''
+        Arguments
+        ----------
+        run_path: str
+            Directory where the model runs.
+        table: str
+            Name of the output table, e.g. PlantGro. The table is read from
+            the CSV output if it exists, or from the text output.
+        '''
+        self.table = table
+        self.paths = [
+            os.path.join(run_path, f"{table}.csv"),
+            os.path.join(run_path, f"{table}.OUT")
+        ]
+        self.path = None
+        self._offset = 0
+        self._pending = ""
+        self._header = None
+        self._run = None
+        self._trno = None
+
+    def read(self):
+        '''
+        Returns a DataFrame with the rows written since the last call, or
+        None if there are no new rows.
+        '''
+        if self.path is None:
+            self.path = next(
+                (path for path in self.paths if os.path.exists(path)), None
+            )
+            if self.path is None:
+                return None
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            text = f.read().decode("latin-1")
+            self._offset = f.tell()
+        text = self._pending + text
+        lines = text.split("\n")
+        self._pending = lines.pop()
+        if self.path.endswith(".csv"):
+            return self._csv_rows(lines)
+        return self._text_rows(lines)
+
+    def _csv_rows(self, lines:list):
+        """
+        Parses the lines of a CSV output. The first line is the header.
+        """
+        if self._header is None and lines:
+            self._header = lines.pop(0)
+        lines = [line for line in lines if line.strip()]
+        if not lines:
+            return None
+        return _read_csv_table("\n".join([self._header] + lines))
+
+    def _text_rows(self, lines:list):
+        """
+        Parses the lines of a text output. The RUN and TRNO columns are
+        taken from the run headers. Only the lines after the table header of
+        the current run are rows, so the run banner is skipped.
+        """
+        chunks = []
+        rows = []
+        for line in lines:
+            if line[:4] == "*RUN":
+                if rows:
+                    chunks.append(self._text_frame(rows))
+                    rows = []
+                self._run = int(line.split()[1])
+                self._trno = self._run
+                self._header = None
+            elif line.strip()[:9] == "TREATMENT":
+                trno = re.search(r"TREATMENT\s+(\d+)", line)
+                if trno:
+                    self._trno = int(trno[1])
+            elif line[:1] == "@":
+                if rows:
+                    chunks.append(self._text_frame(rows))
+                    rows = []
+                # As in the CSV outputs, the year column is YEAR
+                self._header = [name.lstrip("@") for name in line.split()]
+            elif self._header and line.strip() and (line[:1] not in NOT_ROWS):
+                rows.append((self._run, self._trno, line))
+        if rows:
+            chunks.append(self._text_frame(rows))
+        if not chunks:
+            return None
+        return pd.concat(chunks) if len(chunks) > 1 else chunks[0]
+
+    def _text_frame(self, rows:list):
+        """
+        Returns the rows of a text output as a DataFrame.
+        """
+        df = pd.read_csv(
+            io.StringIO("\n".join(line for _, _, line in rows)),
+            sep=r"\s+", header=None, names=self._header
+        )
+        df.insert(0, "TRNO", [trno for _, trno, _ in rows])
+        df.insert(0, "RUN", [run for run, _, _ in rows])
+        if all(("YEAR" in df.columns, "DOY" in df.columns)):
+            df.index = pd.DatetimeIndex(_doy_dates(df["YEAR"], df["DOY"]))
+        return df
+
+
+class Stream:
+    '''
+    Reads output tables while the model runs, and passes the new rows to a
+    callback. It's passed to the DSSAT run methods as the stream argument.
+    '''
+    def __init__(self, callback, tables:list=None,
+                 interval:float=MONITOR_INTERVAL):
+        '''
+        Arguments
+        ----------
+        callback: function
+            It's called as callback(table, rows), where table is the table
+            name and rows is a DataFrame with the new rows. The rows have the
+            RUN and TRNO columns, and the year column is YEAR for both the
+            text and CSV outputs. If it returns True, the model is stopped.
+        tables: list of str
+            Output tables to read, e.g. ["PlantGro", "SoilWat"]. By default,
+            PlantGro.
+        interval: float
+            Seconds between reads.
+        '''
+        self.callback = callback
+        self.tables = ["PlantGro"] if tables is None else list(tables)
+        self.interval = interval
+
+    def monitor(self, run_path:str):
+        '''
+        Returns the monitor function of a run in run_path, which reads the new
+        rows of each table and calls the callback. It returns True if the
+        callback asked to stop.
+        '''
+        tails = [OutputTail(run_path, table) for table in self.tables]
+        def monitor():
+            for tail in tails:
+                rows = tail.read()
+                if (rows is not None) and self.callback(tail.table, rows):
+                    return True
+            return False
+        return monitor
+
+    def __repr__(self):
+        return f"Stream(tables={self.tables!r}, interval={self.interval!r})"
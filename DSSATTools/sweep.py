@@ -0,0 +1,300 @@
+'''
+This module hosts the Sweep class. A Sweep represents a factorial experiment:
+a base treatment, and a set of factors with several levels each. The treatments
+of the experiment are all the combinations of the factor levels (full
+factorial), or a Latin hypercube sample of them.
+
+The sections of the base treatment and the factor levels are shared by all the
+treatments that use them, so they are created only once. The treatments are
+run in batches, where each batch is written as a single multi-treatment FileX
+and section objects shared by treatments are written only once. Batches are
+run in parallel.
+
+1. Create the Sweep by passing the base treatment and the factors. The factor
+levels can be a list, or a dictionary that maps a label to each level:
+    >>> sweep = Sweep(
+    >>>     base=dict(
+    >>>         field=field, cultivar=crop, planting=planting,
+    >>>         simulation_controls=simulation_controls
+    >>>     ),
+    >>>     factors={
+    >>>         "planting": {"early": early_planting, "late": late_planting},
+    >>>         "fertilizer": [fertilizer_low, fertilizer_high]
+    >>>     }
+    >>> )
+2. Run the sweep. It returns a DataFrame with the factor labels and the
+standard output of the model for each treatment:
+    >>> results = sweep.run(n_workers=4)
+The output tables of large sweeps can be written to a sink (see
+DSSATTools.sink) as the batches finish, instead of keeping them in memory:
+    >>> results = sweep.run(n_workers=4, sink=ParquetSink("sweep_outputs"))
+
+A factor can also be a single parameter of a section, named as
+section.parameter. Its levels are the parameter values, and the treatment
+sections are copies of the base section with that value (see Record.evolve).
+Cultivar and ecotype parameters are factors of the cultivar:
+    >>> sweep = Sweep(
+    >>>     base=base,
+    >>>     factors={
+    >>>         "planting.pdate": [date(2020, 3, 1), date(2020, 4, 1)],
+    >>>         "cultivar.p1": [200, 250, 300]
+    >>>     }
+    >>> )
+'''
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from .filex import FILEX_SECTIONS
+from .run import DSSATPool
+from .result import RunResult
+from .base.partypes import Crop
+
+MAX_BATCH_SIZE = 99 # Max number of treatments in a FileX
+FACTORS = list(FILEX_SECTIONS) + ["mow"]
+DESIGNS = ["full", "lhs"]
+
+
+class Sweep:
+    '''
+    Class that represents a factorial experiment.
+    '''
+    def __init__(self, base:dict, factors:dict, design:str="full",
+                 n_samples:int=None, seed:int=None):
+        """
+        Initializes the Sweep.
+
+        Arguments
+        ----------
+        base: dict
+            Treatment sections common to all the treatments. It is a dictionary
+            with the DSSAT.run_treatment parameters (field, cultivar, planting,
+            etc.).
+        factors: dict
+            It maps the name of a run_treatment parameter to its levels. The
+            levels are a list of section objects, or a dictionary that maps a
+            label to each level. Factors named as section.parameter (e.g.
+            planting.pdate) are parameter values, and the values are the
+            labels of the levels when a list is passed.
+        design: str
+            'full' for full factorial design, or 'lhs' for Latin hypercube
+            sampling of the factor levels.
+        n_samples: int
+            Number of treatments for the 'lhs' design.
+        seed: int
+            Random seed for the 'lhs' design.
+        """
+        assert design in DESIGNS, f"design must be one of {DESIGNS}"
+        assert len(factors) > 0, "At least one factor must be defined"
+        self.base = dict(base)
+        self.factors = {}
+        for name, levels in factors.items():
+            section = name.split(".", 1)[0]
+            assert section in FACTORS, \
+                f"{name} is not a valid factor. Factors must be one of {FACTORS}"
+            if "." in name:
+                assert (self.base.get(section) is not None) \
+                    or (section in factors), \
+                    f"{section} must be defined to use the {name} factor"
+                if not isinstance(levels, dict):
+                    levels = {value: value for value in levels}
+            elif not isinstance(levels, dict):
+                levels = dict(enumerate(levels))
+            assert len(levels) > 0, f"{name} factor has no levels"
+            self.factors[name] = levels
+
+        n_levels = [len(levels) for levels in self.factors.values()]
+        if design == "full":
+            self.design = list(itertools.product(*map(range, n_levels)))
+        else:
+            assert n_samples, "n_samples must be defined for the lhs design"
+            rng = np.random.default_rng(seed)
+            self.design = list(zip(*[
+                (
+                    (rng.permutation(n_samples) + rng.random(n_samples))
+                    / n_samples * n
+                ).astype(int).tolist()
+                for n in n_levels
+            ]))
+
+    def __len__(self):
+        return len(self.design)
+
+    def __repr__(self):
+        factors = ", ".join(
+            f"{name}: {len(levels)}" for name, levels in self.factors.items()
+        )
+        return f"Sweep({len(self)} treatments; {factors})"
+
+    @property
+    def labels(self):
+        '''
+        DataFrame with the factor level labels of each treatment.
+        '''
+        return pd.DataFrame(
+            [
+                [list(levels)[n] for levels, n in zip(self.factors.values(), row)]
+                for row in self.design
+            ],
+            columns=list(self.factors)
+        )
+
+    @property
+    def treatments(self):
+        '''
+        List with the treatments. Each treatment is a dictionary with the
+        run_treatment parameters.
+        '''
+        factors = [list(levels.values()) for levels in self.factors.values()]
+        evolved = {} # Sections with the same changes are created only once
+        treatments = []
+        for row in self.design:
+            treatment = dict(self.base)
+            changes = {}
+            for name, levels, n in zip(self.factors, factors, row):
+                if "." in name:
+                    section, par = name.split(".", 1)
+                    changes[section] = changes.get(section, ()) + ((par, n),)
+                else:
+                    treatment[name] = levels[n]
+            for section, section_changes in changes.items():
+                key = (section, id(treatment[section]), section_changes)
+                if key not in evolved:
+                    evolved[key] = _evolve(treatment[section], {
+                        par: self.factors[f"{section}.{par}"][
+                            list(self.factors[f"{section}.{par}"])[n]
+                        ]
+                        for par, n in section_changes
+                    })
+                treatment[section] = evolved[key]
+            treatments.append(treatment)
+        return treatments
+
+    def batches(self, batch_size:int=MAX_BATCH_SIZE):
+        '''
+        Splits the treatments in batches that can be written in the same
+        FileX. Treatments with different weather stations that have the same
+        INSI, or different soils with the same name, or cultivars with the same
+        code but different parameters are put in different batches, as they'd
+        be written to the same file. Returns a list of lists with the index of
+        the treatments of each batch.
+        '''
+        assert 0 < batch_size <= MAX_BATCH_SIZE, \
+            f"batch_size must be between 1 and {MAX_BATCH_SIZE}"
+        batches = [] # (treatment indexes, file keys)
+        for n, treatment in enumerate(self.treatments):
+            keys = _file_keys(treatment)
+            for batch, batch_keys in batches:
+                if len(batch) >= batch_size:
+                    continue
+                if all(batch_keys.get(k, v) == v for k, v in keys.items()):
+                    batch.append(n)
+                    batch_keys.update(keys)
+                    break
+            else:
+                batches.append(([n], keys))
+        return [batch for batch, _ in batches]
+
+    def run(self, n_workers:int=None, batch_size:int=MAX_BATCH_SIZE,
+            run_path:str=None, sink=None, **pool_kwargs):
+        '''
+        Runs all the treatments. The treatments are split in batches, and the
+        batches are run in parallel. The output tables of all treatments are
+        stored in the output_tables attribute, where the treatment column is
+        the treatment index. If sink is passed, the outputs are pushed to it
+        instead, with the treatment key.
+
+        Arguments
+        ----------
+        n_workers: int
+            Number of batches to run in parallel. If None, the number of CPUs
+            is used.
+        batch_size: int
+            Max number of treatments per batch.
+        run_path: str
+            Directory where the simulation environments are created. If None,
+            a tmp directory is created for each worker.
+        sink: sink.Sink
+            Sink where the outputs of each treatment are written. The sink is
+            not closed.
+        pool_kwargs:
+            Other DSSATPool arguments, e.g. engine, timeout, nice,
+            pin_workers or tables_only.
+
+        Returns
+        ----------
+        pandas.DataFrame
+            A DataFrame with the factor labels and the outputs (standard 
+            output and Summary.OUT) of each treatment.
+        '''
+        treatments = self.treatments
+        batches = self.batches(batch_size)
+        batch_treatments = [
+            [
+                {**treatments[n], "tname": f"SWEEP{n:05d}"} for n in batch
+            ]
+            for batch in batches
+        ]
+        with DSSATPool(n_workers, run_path, **pool_kwargs) as pool:
+            batch_results = pool.run_batches(
+                batch_treatments, sink=sink, 
+                keys=[[{"treatment": n} for n in batch] for batch in batches]
+            )
+
+        results = [None] * len(treatments)
+        tables = {}
+        for batch, (batch_result, batch_tables) in zip(batches, batch_results):
+            for n, result in zip(batch, batch_result):
+                results[n] = result
+            for name, df in batch_tables.items():
+                df = df.copy()
+                df.insert(0, "treatment", df.pop("TRNO").map(
+                    lambda trno: batch[trno - 1]
+                ))
+                tables[name] = tables.get(name, []) + [df]
+        self.output_tables = {
+            name: pd.concat(dfs) for name, dfs in tables.items()
+        }
+        return pd.concat(
+            [self.labels, RunResult.concat(results)],
+            axis=1
+        )
+
+
+def _evolve(section, changes):
+    """
+    Returns a copy of the section with the parameter changes. For crops, the
+    ecotype parameters are separated from the cultivar parameters.
+    """
+    if not isinstance(section, Crop):
+        return section.evolve(**changes)
+    cul_changes, eco_changes = {}, {}
+    for par, value in changes.items():
+        if par.lower() in section.cul_dtypes:
+            cul_changes[par] = value
+        else:
+            assert section.eco_dtypes and (par.lower() in section.eco_dtypes), \
+                f"{par} is not a parameter of {type(section).__name__}"
+            eco_changes[par] = value
+    return section.evolve(eco=eco_changes, **cul_changes)
+
+def _file_keys(treatment):
+    """
+    Returns the keys that identify the items of a treatment that are written
+    to the same file in a batch.
+    """
+    cultivar = treatment["cultivar"]
+    wsta = treatment["field"]["wsta"]
+    soil = treatment["field"]["id_soil"]
+    keys = {
+        ("WTH", wsta["insi"]): id(wsta),
+        ("SOL", soil["name"]): id(soil),
+    }
+    cul_line = cultivar._write_cul_line()
+    keys[("CUL", cultivar.spe_file, cul_line.split()[0])] = cul_line
+    if cultivar.eco_dtypes:
+        keys[("ECO", cultivar.spe_file, cultivar["eco#"].str)] = \
+            cultivar._write_eco_line()
+    return keys
@@ -26,6 +26,7 @@ from .base.partypes import (
 
 class WeatherRecord(Record):
     prefix=None
+    __slots__ = ()
     dtypes={
         'date': DateType, 'srad': NumberType, 'tmax': NumberType, 
         'tmin': NumberType, 'rain': NumberType, 'dewp': NumberType,
@@ -82,6 +83,7 @@ class WeatherStation(TabularRecord):
     A class to represent the DSSAT WTH file/s.
     """
     table_dtype = WeatherRecord
+    __slots__ = ()
     dtypes = {
         "insi": DescriptionType, 'lat': NumberType, 'long': NumberType, 
         'elev': NumberType, 'tav': NumberType, 'amp': NumberType,  
@@ -177,7 +179,7 @@ class WeatherStation(TabularRecord):
                 lines = []
                 for line in f:
                     if "@ INSI" in line:
-                        sta_pars = parse_pars_line(f.readline()[2:], cls.pars_fmt)
+                        sta_pars = parse_pars_line(f.readline()[2:], cls._layout)
                     elif ("@DATE" in line):
                         date_fmt = "%y%j"
                         lines.append(line)
@@ -0,0 +1,114 @@
+'''
+Benchmarks of reading and writing the model input and output files: WTH, SOL,
+CUL, FileX and the output tables.
+'''
+import os
+import shutil
+import tempfile
+
+from DSSATTools import crop
+from DSSATTools.weather import WeatherStation
+from DSSATTools.soil import SoilProfile
+from DSSATTools.filex import create_filex, create_batch_filex, read_filex, FileX
+from DSSATTools.run import _read_output_table, _read_csv_table, _parse_stdout
+from DSSATTools.engine import _stub_plantgro, _stub_plantgro_csv, _stub_stdout
+from .common import treatment, treatments, sol_text, weather_station
+
+
+class Weather:
+    params = [1, 10]
+    param_names = ["years"]
+
+    def setup(self, years):
+        self.tmp = tempfile.mkdtemp()
+        self.wsta = weather_station(years)
+        self.path = os.path.join(self.tmp, f"UNCU00{years:02d}.WTH")
+        with open(self.path, "w") as f:
+            f.write(self.wsta._write_wth())
+
+    def teardown(self, years):
+        shutil.rmtree(self.tmp)
+
+    def time_write_wth(self, years):
+        self.wsta._write_wth()
+
+    def time_from_files(self, years):
+        WeatherStation.from_files([self.path])
+
+
+class Soil:
+    params = [10, 1000]
+    param_names = ["profiles"]
+
+    def setup(self, profiles):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "SOIL.SOL")
+        with open(self.path, "w") as f:
+            f.write(sol_text(profiles))
+        # The last profile is the slowest to find
+        self.name = f"IB{profiles - 1:08d}"
+
+    def teardown(self, profiles):
+        shutil.rmtree(self.tmp)
+
+    def time_from_file(self, profiles):
+        SoilProfile.from_file(self.name, self.path)
+
+    def time_write_sol(self, profiles):
+        SoilProfile.from_file(self.name, self.path)._write_sol()
+
+
+class Crop:
+    params = [("Maize", "IB0171"), ("Sorghum", "IB0026"), ("Wheat", "IB0488")]
+    param_names = ["crop"]
+
+    def time_init(self, cultivar):
+        getattr(crop, cultivar[0])(cultivar[1])
+
+    def time_write_cul(self, cultivar):
+        getattr(crop, cultivar[0])(cultivar[1])._write_cul()
+
+
+class FileXIO:
+    def setup(self):
+        self.tmp = tempfile.mkdtemp()
+        self.treatment = treatment()
+        self.treatments = treatments(99)
+        self.path = os.path.join(self.tmp, "UNCU0001.MZX")
+        with open(self.path, "w") as f:
+            f.write(create_batch_filex(self.treatments))
+
+    def teardown(self):
+        shutil.rmtree(self.tmp)
+
+    def time_create_filex(self):
+        create_filex(**self.treatment)
+
+    def time_create_batch_filex(self):
+        create_batch_filex(self.treatments)
+
+    def time_read_filex(self):
+        read_filex(self.path)
+
+    def time_read_filex_one(self):
+        read_filex(self.path, treatments=[1])
+
+    def time_index_filex(self):
+        FileX(self.path)
+
+
+class Outputs:
+    def setup(self):
+        self.plantgro = _stub_plantgro([(1, 1)])
+        self.plantgro_csv = _stub_plantgro_csv([(1, 1)])
+        # Standard output of a batch of 99 treatments
+        self.stdout = _stub_stdout([(n, n) for n in range(1, 100)])
+
+    def time_read_output_table(self):
+        _read_output_table(self.plantgro)
+
+    def time_read_csv_table(self):
+        _read_csv_table(self.plantgro_csv)
+
+    def time_parse_stdout(self):
+        _parse_stdout(self.stdout)
@@ -0,0 +1,54 @@
+'''
+Benchmarks of the pickle size and time of the DSSATTools objects that are
+sent to worker processes: WeatherStation, SoilProfile, Crop, and a Field with
+its weather station and soil profile. The weather station is also pickled
+with its table in shared memory.
+'''
+import pickle
+
+from DSSATTools.crop import Maize
+from DSSATTools.filex import Field
+from .common import weather_station, soil_profile
+
+PROTOCOL = pickle.HIGHEST_PROTOCOL
+
+
+class Pickle:
+    params = [
+        "WeatherStation", "WeatherStation (shared)", "SoilProfile", "Crop",
+        "Field", "Field (frozen)"
+    ]
+    param_names = ["object"]
+
+    def setup(self, name):
+        self.shared = None
+        if name.startswith("WeatherStation"):
+            self.obj = weather_station()
+            if name.endswith("(shared)"):
+                self.obj = self.shared = self.obj.share()
+        elif name == "SoilProfile":
+            self.obj = soil_profile()
+        elif name == "Crop":
+            self.obj = Maize("IB0171")
+        else:
+            self.obj = Field(
+                id_field="UNCU0001", wsta=weather_station(),
+                id_soil=soil_profile(), flob=0, fldd=0, flds=0
+            )
+            if name.endswith("(frozen)"):
+                self.obj = self.obj.freeze()
+        self.data = pickle.dumps(self.obj, protocol=PROTOCOL)
+
+    def teardown(self, name):
+        if self.shared is not None:
+            self.shared.table.unlink()
+
+    def time_dumps(self, name):
+        pickle.dumps(self.obj, protocol=PROTOCOL)
+
+    def time_loads(self, name):
+        pickle.loads(self.data)
+
+    def track_bytes(self, name):
+        return len(self.data)
+    track_bytes.unit = "bytes"
@@ -0,0 +1,70 @@
+'''
+End-to-end benchmarks of the DSSAT run methods. The model is replaced by the
+engine.StubEngine, so they measure the time spent by DSSATTools: writing the
+inputs and reading the model outputs.
+'''
+import os
+import shutil
+import tempfile
+
+from DSSATTools.run import DSSAT
+from DSSATTools.engine import StubEngine
+from .common import treatment, treatments
+
+
+class StubRun:
+    '''
+    Base class of the benchmarks that run the stub model.
+    '''
+    def setup(self, *args):
+        self.tmp = tempfile.mkdtemp()
+        self.dssat = DSSAT(os.path.join(self.tmp, "run"), engine=StubEngine())
+
+    def teardown(self, *args):
+        self.dssat.close()
+        shutil.rmtree(self.tmp)
+
+
+class RunTreatment(StubRun):
+    params = [1, 10]
+    param_names = ["years"]
+
+    def setup(self, years):
+        super().setup()
+        self.treatment = treatment(years)
+
+    def time_run_treatment(self, years):
+        self.dssat.run_treatment(**self.treatment, verbose=False)
+
+
+class RunBatch(StubRun):
+    params = [10, 99]
+    param_names = ["treatments"]
+
+    def setup(self, n):
+        super().setup()
+        self.treatments = treatments(n)
+
+    def time_run_batch(self, n):
+        self.dssat.run_batch(self.treatments, verbose=False)
+
+
+class RunBatchTablesOnly(RunBatch):
+    '''
+    RunBatch, reading only the output tables from the CSV outputs.
+    '''
+    def setup(self, n):
+        super().setup(n)
+        self.dssat.tables_only = True
+
+
+class Rerun(StubRun):
+    def setup(self):
+        super().setup()
+        self.dssat.prepare(**treatment())
+        self.p1 = 200
+
+    def time_rerun(self):
+        # A different value each call, so the CUL file is always written
+        self.p1 += .1
+        self.dssat.rerun({"p1": self.p1})
@@ -0,0 +1,121 @@
+'''
+Inputs shared by the benchmarks. They are built in memory, so the benchmarks
+don't depend on the DSSAT data files (except the CUL files shipped with the
+library).
+'''
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from DSSATTools.crop import Maize
+from DSSATTools.weather import WeatherStation
+from DSSATTools.soil import SoilProfile, SoilLayer
+from DSSATTools.filex import (
+    Field, Planting, InitialConditions, Fertilizer, FertilizerEvent,
+    SimulationControls, SCGeneral, SCManagement
+)
+
+
+def weather_station(n_years:int=10):
+    '''
+    Returns a weather station with n_years of random daily weather.
+    '''
+    rng = np.random.default_rng(0)
+    dates = pd.date_range(date(2000, 1, 1), periods=365*n_years)
+    n = len(dates)
+    df = pd.DataFrame({
+        "date": dates, "srad": rng.gamma(10, 1.5, n).round(1),
+        "tmax": (25 + rng.normal(0, 3, n)).round(1),
+        "tmin": (12 + rng.normal(0, 3, n)).round(1),
+        "rain": rng.gamma(.4, 10, n).round(1)
+    })
+    return WeatherStation(
+        insi="UNCU", lat=4.34, long=-74.40, elev=1800, table=df
+    )
+
+def soil_profile(n_layers:int=10):
+    '''
+    Returns a soil profile with n_layers layers.
+    '''
+    return SoilProfile(
+        name="IBMZ910214", soil_series_name="Millhopper Fine Sand",
+        site="Gainesville", country="USA", lat=29.6, long=-82.37,
+        soil_data_source="Gainesville", soil_clasification="S",
+        scs_family="Loamy,silic,hyperth Arnic Paleudult", salb=0.18,
+        slu1=2.0, sldr=0.65, slro=60.0, slnf=1.0, slpf=0.92, smhb="IB001",
+        smpx="IB001", smke="IB001",
+        table=[
+            SoilLayer(
+                slb=10.*(n+1), slll=0.026, sdul=0.096, ssat=0.345, srgf=1.0,
+                ssks=7.4, sbdm=1.66, sloc=0.67, slcl=1.7, slsi=0.9
+            )
+            for n in range(n_layers)
+        ]
+    )
+
+
+def treatment(n_years:int=1):
+    '''
+    Returns the run_treatment parameters of a maize treatment, with a weather
+    station of n_years.
+    '''
+    field = Field(
+        id_field="UNCU0001", wsta=weather_station(n_years),
+        id_soil=soil_profile(), flob=0, fldd=0, flds=0
+    )
+    cultivar = Maize("IB0171")
+    simulation_controls = SimulationControls(
+        general=SCGeneral(sdate=date(2000, 2, 1)),
+        management=SCManagement(ferti="R")
+    )
+    simulation_controls["general"]["smodel"] = cultivar.smodel
+    return dict(
+        field=field, cultivar=cultivar,
+        planting=Planting(pdate=date(2000, 3, 1), ppop=7, plrs=75),
+        initial_conditions=InitialConditions(
+            pcr="MZ", icdat=date(2000, 2, 1), icrt=100,
+            table=pd.DataFrame(
+                [(10, .2, 1, 2), (30, .25, 1.5, 2.5)],
+                columns=["icbl", "sh2o", "snh4", "sno3"]
+            )
+        ),
+        fertilizer=Fertilizer(table=[
+            FertilizerEvent(
+                fdate=date(2000, 3, 5), fmcd="FE005", facd="AP002", fdep=5,
+                famn=60
+            ),
+            FertilizerEvent(
+                fdate=date(2000, 4, 5), fmcd="FE005", facd="AP002", fdep=5,
+                famn=40
+            )
+        ]),
+        simulation_controls=simulation_controls
+    )
+
+def treatments(n:int):
+    '''
+    Returns n treatments that only differ in the planting date.
+    '''
+    base = treatment()
+    return [
+        {
+            **base, "planting": Planting(
+                pdate=date(2000, 3, 1) + timedelta(days=days), ppop=7, plrs=75
+            )
+        }
+        for days in range(n)
+    ]
+
+def sol_text(n_profiles:int):
+    '''
+    Returns the text of a SOL file with n_profiles soil profiles.
+    '''
+    soil = soil_profile()
+    texts = []
+    for n in range(n_profiles):
+        soil["name"] = f"IB{n:08d}"
+        texts.append(soil._write_sol())
+    return texts[0] + "".join(
+        "\n" + text.split("\n", 2)[-1] for text in texts[1:]
+    )
@@ -0,0 +1,73 @@
+import pytest
+
+from DSSATTools.crop import Maize
+from DSSATTools.soil import SoilProfile
+from DSSATTools.filex import read_filex
+from DSSATTools.weather import WeatherStation
+from DSSATTools.calibration import Calibration, read_filea, read_filet
+import numpy as np
+import os
+
+DATA_PATH = "/home/diego/dssat-csm-data"
+
+def maize_treatment():
+    """
+    Experiment BRPI0202, treatment 1
+    """
+    soil = SoilProfile.from_file(
+        "BRPI020001",
+        os.path.join(DATA_PATH, "Soil", "BR.SOL")
+    )
+    weather_station = WeatherStation.from_files([
+        os.path.join(DATA_PATH, 'Weather', "BRPI0201.WTH"),
+    ])
+    treatments = read_filex(os.path.join(DATA_PATH,"Maize", "BRPI0202.MZX"))
+    treatment = treatments[1]
+    treatment["Field"]["wsta"] = weather_station
+    treatment["Field"]["id_soil"] = soil
+    return dict(
+        field=treatment["Field"],
+        cultivar=Maize("IB0171"),
+        planting=treatment["Planting"],
+        initial_conditions=treatment["InitialConditions"],
+        fertilizer=treatment["Fertilizer"],
+        simulation_controls=treatment["SimulationControls"]
+    )
+
+def test_read_observed():
+    observed = read_filea(os.path.join(DATA_PATH, "Maize", "BRPI0202.MZA"))
+    assert "HWAM" in observed
+    observed = read_filet(os.path.join(DATA_PATH, "Maize", "BRPI0202.MZT"))
+    assert observed.index.is_monotonic_increasing
+    assert "LAID" in observed.columns
+
+def test_wrong_bounds():
+    with pytest.raises(AssertionError) as excinfo:
+        Calibration(
+            maize_treatment(), {"harwt": 3676}, {"p1": (300, 150)}
+        )
+        assert "lower bound must be smaller" in str(excinfo.value)
+
+def test_differential_evolution():
+    with Calibration(
+        maize_treatment(), {"harwt": 3676}, {"p1": (150, 300), "g2": (600, 900)}
+    ) as calibration:
+        population = calibration.differential_evolution(
+            popsize=4, maxiter=3, seed=0
+        )
+        n_runs = len(calibration.history)
+        assert n_runs <= 4 * 2 * 4
+        # Evaluated candidates are cached
+        calibration.evaluate([calibration.best])
+        assert len(calibration.history) == n_runs
+    assert population.objective.iloc[0] == min(
+        x["objective"] for x in calibration.history
+    )
+
+def test_glue():
+    with Calibration(
+        maize_treatment(), {"harwt": 3676}, {"p1": (150, 300)}
+    ) as calibration:
+        behavioral = calibration.glue(n_samples=20, seed=0)
+    assert len(behavioral) == 2
+    assert np.isclose(behavioral.weight.sum(), 1)
@@ -0,0 +1,23 @@
+from DSSATTools.catalog import ExperimentCatalog
+from DSSATTools.filex import read_filex
+import os
+import tempfile
+
+TMP = tempfile.gettempdir()
+DATA_PATH = "/home/diego/dssat-csm-data"
+
+def test_scan_and_query():
+    index_path = os.path.join(TMP, "dssat_test_catalog.db")
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    with ExperimentCatalog(index_path) as catalog:
+        catalog.scan(os.path.join(DATA_PATH, "Maize"), n_workers=2)
+        treatments = catalog.query(experiment="BRPI0202")
+        assert len(treatments) == len(read_filex(
+            os.path.join(DATA_PATH, "Maize", "BRPI0202.MZX")
+        ))
+        assert (treatments.crop == "MZ").all()
+        treatment = catalog.load(treatments.path[0], treatments.trno[0])
+        assert treatment["Planting"]["pdate"] == treatments.pdate[0]
+        # Unchanged files are not read again
+        assert catalog.scan(os.path.join(DATA_PATH, "Maize")) == []
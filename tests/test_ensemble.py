@@ -0,0 +1,66 @@
+import pytest
+
+from DSSATTools.crop import Maize
+from DSSATTools.soil import SoilProfile
+from DSSATTools.filex import read_filex
+from DSSATTools.weather import WeatherStation
+from DSSATTools.ensemble import run_ensemble
+import os
+
+DATA_PATH = "/home/diego/dssat-csm-data"
+
+def test_ensemble_maize():
+    """
+    Experiment BRPI0202, treatment 1, with rain scaled in each member
+    """
+    soil = SoilProfile.from_file(
+        "BRPI020001",
+        os.path.join(DATA_PATH, "Soil", "BR.SOL")
+    )
+    weather_station = WeatherStation.from_files([
+        os.path.join(DATA_PATH, 'Weather', "BRPI0201.WTH"),
+    ])
+    treatments = read_filex(os.path.join(DATA_PATH,"Maize", "BRPI0202.MZX"))
+    treatment = treatments[1]
+    treatment["Field"]["wsta"] = weather_station
+    treatment["Field"]["id_soil"] = soil
+    members = []
+    for scale in (0.5, 1., 1.5):
+        df = weather_station.to_dataframe()
+        df["rain"] = df["rain"] * scale
+        members.append(weather_station.evolve(table=df))
+    quantiles = run_ensemble(
+        field=treatment["Field"],
+        cultivar=Maize("IB0171"),
+        planting=treatment["Planting"],
+        initial_conditions=treatment["InitialConditions"],
+        fertilizer=treatment["Fertilizer"],
+        simulation_controls=treatment["SimulationControls"],
+        weather_members=members, outputs=["harwt", "PlantGro.LAID"],
+        quantiles=[0, 0.5, 1]
+    )
+    assert quantiles["harwt"].shape == (3,)
+    assert quantiles["harwt"][0] <= quantiles["harwt"][1] <= quantiles["harwt"][2]
+    assert list(quantiles["PlantGro.LAID"].columns) == [0, 0.5, 1]
+
+def test_members_different_years():
+    treatments = read_filex(os.path.join(DATA_PATH,"Maize", "BRPI0202.MZX"))
+    treatment = treatments[1]
+    treatment["Field"]["wsta"] = WeatherStation.from_files([
+        os.path.join(DATA_PATH, 'Weather', "BRPI0201.WTH"),
+    ])
+    treatment["Field"]["id_soil"] = SoilProfile.from_file(
+        "BRPI020001",
+        os.path.join(DATA_PATH, "Soil", "BR.SOL")
+    )
+    member = WeatherStation.from_files([
+        os.path.join(DATA_PATH, 'Weather', "UAFD9001.WTH"),
+    ])
+    with pytest.raises(AssertionError) as excinfo:
+        run_ensemble(
+            field=treatment["Field"], cultivar=Maize("IB0171"),
+            planting=treatment["Planting"],
+            simulation_controls=treatment["SimulationControls"],
+            weather_members=[member]
+        )
+        assert "must cover the same years" in str(excinfo.value)
@@ -0,0 +1,212 @@
+from DSSATTools.filex import (
+    read_filex, FileX, TreatmentView, create_filex, create_batch_filex
+)
+from DSSATTools.filex import Planting, Fertilizer, FertilizerEvent
+from DSSATTools.crop import Maize
+from datetime import date
+import pandas as pd
+import numpy as np
+import pytest
+import tempfile
+import io
+import os
+
+DATA_PATH = "/home/diego/dssat-csm-data"
+
+# Two treatments that share the field, cultivar and simulation controls
+REFERENCE_FILEX = """\
+*EXP.DETAILS: UFGA8201MZ
+
+*TREATMENTS                        -------------FACTOR LEVELS------------
+@N R O C TNAME.................... CU FL SA IC MP MI MF MR MC MT ME MH SM
+ 1 1 0 0 Early                      1  1  0  0  1  0  1  0  0  0  0  0  1
+ 2 1 0 0 Late                       1  1  0  0  2  0  0  0  0  0  0  0  1
+
+*CULTIVARS
+@C CR INGENO CNAME
+ 1 MZ IB0171 PIONEER 3382
+
+*FIELDS
+@L ID_FIELD WSTA....  FLSA  FLOB  FLDT  FLDD  FLDS  FLST SLTX   SLDP ID_SOIL    FLNAME
+ 1 UFGA0001 UFGA       -99   -99 DR000   -99   -99   -99 -99     -99 IBMZ910014 Field A
+@L ...........XCRD ...........YCRD .....ELEV .............AREA .SLEN .FLWR .SLAS FLHST FHDUR
+ 1             -99             -99       -99               -99   -99   -99   -99   -99   -99
+
+*PLANTING DETAILS
+@P PDATE EDATE  PPOP  PPOE  PLME  PLDS  PLRS  PLRD  PLDP  PLWT  PAGE  PENV  PLPH  SPRL                        PLNAME
+ 1 82057   -99   7.2   7.2     S     R    61     0   7.0   -99   -99   -99   -99     0                           -99
+ 2 82085   -99   7.2   7.2     S     R    61     0   7.0   -99   -99   -99   -99     0                           -99
+
+*FERTILIZERS (INORGANIC)
+@F FDATE  FMCD  FACD  FDEP  FAMN  FAMP  FAMK  FAMC  FAMO  FOCD FERNAME
+ 1 82057 FE005 AP002    10  50.0   -99   -99   -99   -99   -99 -99
+ 1 82088 FE005 AP002    10  80.0   -99   -99   -99   -99   -99 -99
+
+*SIMULATION CONTROLS
+@N GENERAL     NYERS NREPS START SDATE RSEED SNAME.................... SMODEL
+ 1 GE              1     1     S 82056  2150 -99                        MZCER
+@N OPTIONS     WATER NITRO SYMBI PHOSP POTAS DISES  CHEM  TILL   CO2
+ 1 OP              Y     Y     N     N     N     N     N     N     M
+@N METHODS     WTHER INCON LIGHT EVAPO INFIL PHOTO HYDRO NSWIT MESOM MESEV MESOL
+ 1 ME              M     M     E     R     R     C     R     1     P     R     1
+@N MANAGEMENT  PLANT IRRIG FERTI RESID HARVS
+ 1 MA              R     D     R     D     A
+@N OUTPUTS     FNAME OVVEW SUMRY FROPT GROUT CAOUT WAOUT NIOUT MIOUT DIOUT VBOSE CHOUT OPOUT FMOPT
+ 1 OU              N     Y     Y     1     Y     Y     N     N     N     N     Y     N     N     A
+
+@  AUTOMATIC MANAGEMENT
+@N PLANTING    PFRST PLAST PH2OL PH2OU PH2OD PSTMX PSTMN
+ 1 PL          82056 82056    40   100    30    30    10
+@N IRRIGATION  IMDEP ITHRL ITHRU IROFF IMETH IRAMT IREFF
+ 1 IR             30    50   100 IB001 IB001    10  1.00
+@N NITROGEN    NMDEP NMTHR NAMNT NCODE NAOFF
+ 1 NI             30    50    25 IB001 IB001
+@N RESIDUES    RIPCN RTIME RIDEP
+ 1 RE            100     1    20
+@N HARVEST     HFRST HLAST HPCNP HPCNR
+ 1 HA              0 82056   100     0   -99   -99   -99   -99   -99   -99
+"""
+
+def test_lazy_same_as_read_filex():
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "UFGA8201.MZX")
+    with open(path, "w") as f:
+        f.write(REFERENCE_FILEX)
+    treatments = read_filex(path)
+    filex = FileX(path)
+    assert list(filex) == list(treatments) == [1, 2]
+    assert isinstance(filex[1], TreatmentView)
+    assert filex[1]._levels == {
+        "Cultivar": 1, "Field": 1, "Planting": 1, "Fertilizer": 1,
+        "SimulationControls": 1
+    }
+    assert filex[2]._levels == {
+        "Cultivar": 1, "Field": 1, "Planting": 2, "SimulationControls": 1
+    }
+    for treatments in (treatments, filex):
+        assert treatments[1]["Planting"]["pdate"] == date(1982, 2, 26)
+        assert treatments[2]["Planting"]["pdate"] == date(1982, 3, 26)
+        assert treatments[1]["Field"]["id_soil"] == "IBMZ910014"
+        assert treatments[1]["Cultivar"]["ingeno"] == "IB0171"
+        fertilizer = treatments[1]["Fertilizer"]
+        assert len(fertilizer.table) == 2
+        assert [event["famn"] for event in fertilizer.table] == [50, 80]
+        assert "Fertilizer" not in treatments[2]
+        # The sections are written as they are in the file
+        for section in treatments[1].values():
+            for line in section._write_section().splitlines():
+                assert line.rstrip() in REFERENCE_FILEX.splitlines()
+    os.remove(path)
+    os.rmdir(tmp)
+
+def test_lazy_parses_only_accessed():
+    filex = FileX(os.path.join(DATA_PATH, "Maize", "BRPI0202.MZX"))
+    treatment = filex[1]
+    assert ("Planting", treatment._levels["Planting"]) not in filex._parsed
+    treatment["Planting"]
+    assert ("Planting", treatment._levels["Planting"]) in filex._parsed
+    assert ("Fertilizer", treatment._levels["Fertilizer"]) not in filex._parsed
+    # Treatments with the same level share the section object
+    assert filex[2]["Field"] is treatment["Field"]
+
+def test_read_some_treatments():
+    treatments = read_filex(
+        os.path.join(DATA_PATH, "Maize", "BRPI0202.MZX"), treatments=[2]
+    )
+    assert list(treatments) == [2]
+    assert "SimulationControls" in treatments[2]
+
+def test_filex_fragments_follow_changes():
+    path = os.path.join(DATA_PATH, "Maize", "BRPI0202.MZX")
+    treatment = read_filex(path)[1]
+    kwargs = dict(
+        field=treatment["Field"], cultivar=Maize("IB0171"),
+        planting=treatment["Planting"], 
+        fertilizer=treatment["Fertilizer"],
+        simulation_controls=treatment["SimulationControls"]
+    )
+    first = create_filex(**kwargs)
+    assert create_filex(**kwargs) == first
+    kwargs["planting"]["ppop"] = 3.5
+    kwargs["fertilizer"].table[0]["famn"] = 123
+    second = create_filex(**kwargs)
+    assert "   3.5" in second and "   3.5" not in first
+    assert " 123" in second
+    buffer = io.StringIO()
+    create_batch_filex([kwargs], file=buffer)
+    assert buffer.getvalue() == second
+
+def test_freeze():
+    planting = Planting(
+        pdate=date(1980, 6, 17), ppop=18, ppoe=18, plme='S', plds='R',
+        plrs=45, plrd=0, pldp=5
+    )
+    event = FertilizerEvent(
+        fdate=date(1980, 7, 3), fmcd='FE005', fdep=5, famn=80, facd='AP002'
+    )
+    fertilizer = Fertilizer(table=[event])
+    frozen_planting = planting.freeze()
+    frozen_fertilizer = fertilizer.freeze()
+    assert frozen_planting.frozen and not planting.frozen
+    assert frozen_fertilizer.table[0].frozen
+    # Snapshots can't be modified
+    with pytest.raises(TypeError):
+        frozen_planting["ppop"] = 3.5
+    with pytest.raises(TypeError):
+        frozen_fertilizer.table[0]["famn"] = 123
+    with pytest.raises(TypeError):
+        frozen_fertilizer.table.append(event)
+    with pytest.raises(TypeError):
+        frozen_fertilizer.table = []
+    # The original record is still mutable
+    planting["ppop"] = 7
+    fertilizer.table.append(event.evolve(fdate=date(1980, 7, 20)))
+    assert frozen_planting["ppop"] == 18
+    assert len(frozen_fertilizer.table) == 1
+    # Snapshots with the same content are equal, and hashed by digest
+    with pytest.raises(TypeError):
+        hash(planting)
+    same = planting.evolve(ppop=18).freeze()
+    assert same is not frozen_planting
+    assert same == frozen_planting
+    assert hash(same) == hash(frozen_planting)
+    assert same.digest() == frozen_planting.digest()
+    assert len({same, frozen_planting}) == 1
+    assert planting.freeze() != frozen_planting
+    # The written sections are cached, and they are the same as the
+    # sections written by the mutable records
+    section = frozen_planting._write_section()
+    assert section == planting.evolve(ppop=18)._write_section()
+    assert frozen_planting._write_section() is section
+    section = frozen_fertilizer._write_section()
+    assert section == Fertilizer(table=[event])._write_section()
+    assert frozen_fertilizer._write_section() is section
+
+def test_table_from_dataframe():
+    fertilizer = Fertilizer(table=[
+        FertilizerEvent(
+            fdate=date(1980, 7, 3), fmcd='FE005', facd='AP002', fdep=5,
+            famn=80, focd='FE001', fername='First'
+        ),
+        FertilizerEvent(
+            fdate=date(1980, 7, 20), fmcd='FE001', facd='AP002', fdep=5,
+            famn=40, famp=10, focd='FE001', fername='Second'
+        ),
+    ])
+    df = fertilizer.to_dataframe()
+    assert df["fdate"].tolist() == [date(1980, 7, 3), date(1980, 7, 20)]
+    assert df["famn"].dtype == float
+    assert np.isnan(df.loc[0, "famp"]) and df.loc[1, "famp"] == 10
+    copy = Fertilizer(table=df)
+    assert copy.to_dataframe().equals(df)
+    assert copy._write_section() == fertilizer._write_section()
+    # Datetime columns and -99 values are parsed too
+    df["fdate"] = pd.to_datetime(df["fdate"])
+    df["famk"] = -99
+    copy = Fertilizer(table=df)
+    assert copy._write_section() == fertilizer._write_section()
+    # Parameters that are not columns are missing
+    copy = Fertilizer(table=df[["fdate", "fmcd", "facd", "fdep", "famn"]])
+    assert copy.table[1]["famn"] == 40
+    assert np.isnan(copy.table[1]["famp"])
+    assert "-99 FE001" not in copy._write_section()
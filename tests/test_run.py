@@ -39,7 +39,10 @@ from DSSATTools.filex import (
     SCMethods, SCOptions, Mow
 )
 from DSSATTools.weather import WeatherStation
-from DSSATTools.run import DSSAT
+from DSSATTools.run import DSSAT, DSSATPool
+from DSSATTools.engine import StubEngine, DSSATTimeoutError
+from DSSATTools.result import RunResult
+from DSSATTools.stream import Stream
 from datetime import datetime, timedelta, date
 import pandas as pd
 import numpy as np
@@ -689,10 +692,8 @@ def test_freeze_soya():
     ])
     
     df = weather_station.to_dataframe()
-    kwargs = weather_station._Record__data
     for i in range(100, 110): df.loc[i, 'tmin'] = -3.
-    kwargs['table'] = df
-    weather_station = WeatherStation(**kwargs)
+    weather_station = weather_station.evolve(table=df)
     treatments = read_filex(os.path.join(DATA_PATH, 'Soybean', "CLMO8501.SBX"))
     treatment = treatments[1]
     treatment["Field"]["wsta"] = weather_station
@@ -738,5 +739,318 @@ def test_cotton():
     assert np.isclose(4647, results['harwt'], rtol=0.01)
     dssat.close()
 
+
+def test_maize_sequence():
+    """
+    Experiment BRPI0202, treatment 1, run as a two seasons sequence.
+    """
+    soil = SoilProfile.from_file(
+        "BRPI020001",
+        os.path.join(DATA_PATH, "Soil", "BR.SOL")
+    )
+    weather_station = WeatherStation.from_files([
+        os.path.join(DATA_PATH, 'Weather', "BRPI0201.WTH"),
+    ])
+    treatments = read_filex(os.path.join(DATA_PATH,"Maize", "BRPI0202.MZX"))
+    treatment = treatments[1]
+    treatment["Field"]["wsta"] = weather_station
+    treatment["Field"]["id_soil"] = soil 
+    first = dict(
+        field=treatment["Field"], 
+        cultivar=Maize("IB0171"), 
+        planting=treatment["Planting"],
+        initial_conditions=treatment["InitialConditions"],
+        fertilizer=treatment["Fertilizer"],
+        simulation_controls=treatment["SimulationControls"]
+    )
+    second_planting = Planting(**treatment["Planting"].parameters())
+    second_planting["pdate"] = treatment["Planting"]["pdate"] + timedelta(days=150)
+    second = dict(
+        field=treatment["Field"], cultivar=Maize("IB0171"), 
+        planting=second_planting, 
+        simulation_controls=treatment["SimulationControls"]
+    )
+    dssat = DSSAT("/tmp/dssat_test")
+    results = dssat.run_sequence([first, second])
+    assert [result["trno"] for result in results] == [1, 2]
+    assert results[0]["harwt"] > 0
+    assert set(dssat.output_tables["PlantGro"]["RUN"]) == {1, 2}
+    dssat.close()
+
+
+def test_run_stats():
+    """
+    Experiment BRPI0202, treatment 1. The stats of each phase are recorded.
+    """
+    soil = SoilProfile.from_file(
+        "BRPI020001",
+        os.path.join(DATA_PATH, "Soil", "BR.SOL")
+    )
+    weather_station = WeatherStation.from_files([
+        os.path.join(DATA_PATH, 'Weather', "BRPI0201.WTH"),
+    ])
+    treatments = read_filex(os.path.join(DATA_PATH,"Maize", "BRPI0202.MZX"))
+    treatment = treatments[1]
+    treatment["Field"]["wsta"] = weather_station
+    treatment["Field"]["id_soil"] = soil 
+    calls = []
+    dssat = DSSAT("/tmp/dssat_test", stats_callback=calls.append)
+    for _ in range(2):
+        dssat.run_treatment(
+            field=treatment["Field"], 
+            cultivar=Maize("IB0171"), 
+            planting=treatment["Planting"],
+            initial_conditions=treatment["InitialConditions"],
+            fertilizer=treatment["Fertilizer"],
+            simulation_controls=treatment["SimulationControls"]
+        )
+    stats = dssat.last_run_stats
+    assert calls[-1] is stats
+    assert stats.runs == 1 and dssat.stats.runs == 2
+    assert stats.wall["model"] > 0
+    assert stats.bytes["write_weather"] > 0
+    assert stats.bytes["read_output"] > 0
+    df = dssat.stats.to_dataframe()
+    assert np.isclose(df.wall.sum(), dssat.stats.total_wall)
+    dssat.close()
+
+
+def test_stub_engine():
+    """
+    Experiment BRPI0202, treatment 1, run with the StubEngine.
+    """
+    soil = SoilProfile.from_file(
+        "BRPI020001",
+        os.path.join(DATA_PATH, "Soil", "BR.SOL")
+    )
+    weather_station = WeatherStation.from_files([
+        os.path.join(DATA_PATH, 'Weather', "BRPI0201.WTH"),
+    ])
+    treatments = read_filex(os.path.join(DATA_PATH,"Maize", "BRPI0202.MZX"))
+    treatment = treatments[1]
+    treatment["Field"]["wsta"] = weather_station
+    treatment["Field"]["id_soil"] = soil 
+    treatment = dict(
+        field=treatment["Field"], 
+        cultivar=Maize("IB0171"), 
+        planting=treatment["Planting"],
+        initial_conditions=treatment["InitialConditions"],
+        fertilizer=treatment["Fertilizer"],
+        simulation_controls=treatment["SimulationControls"]
+    )
+    dssat = DSSAT("/tmp/dssat_test", engine=StubEngine(n_days=10))
+    results = dssat.run_treatment(**treatment)
+    assert results["harwt"] == 3001
+    assert len(dssat.output_tables["PlantGro"]) == 10
+    results = dssat.run_batch([treatment, treatment])
+    assert [result["harwt"] for result in results] == [3001, 3002]
+    dssat.close()
+
+
+def test_timeout():
+    """
+    Experiment BRPI0202, treatment 1. The run is killed after the timeout.
+    """
+    soil = SoilProfile.from_file(
+        "BRPI020001",
+        os.path.join(DATA_PATH, "Soil", "BR.SOL")
+    )
+    weather_station = WeatherStation.from_files([
+        os.path.join(DATA_PATH, 'Weather', "BRPI0201.WTH"),
+    ])
+    treatments = read_filex(os.path.join(DATA_PATH,"Maize", "BRPI0202.MZX"))
+    treatment = treatments[1]
+    treatment["Field"]["wsta"] = weather_station
+    treatment["Field"]["id_soil"] = soil 
+    treatment = dict(
+        field=treatment["Field"], 
+        cultivar=Maize("IB0171"), 
+        planting=treatment["Planting"],
+        simulation_controls=treatment["SimulationControls"]
+    )
+    dssat = DSSAT("/tmp/dssat_test", engine=StubEngine(delay=1., timeout=.1))
+    with pytest.raises(DSSATTimeoutError) as excinfo:
+        dssat.run_treatment(**treatment)
+    assert excinfo.value.timeout == .1
+    # The run timeout overrides the engine timeout
+    assert dssat.run_treatment(**treatment, timeout=2.)["harwt"] == 3001
+    dssat.close()
+
+
+def test_pool_timeout():
+    """
+    Experiment BRPI0202, treatment 1. Pool runs that don't finish within the
+    pool timeout raise DSSATTimeoutError, they are not failed runs.
+    """
+    soil = SoilProfile.from_file(
+        "BRPI020001",
+        os.path.join(DATA_PATH, "Soil", "BR.SOL")
+    )
+    weather_station = WeatherStation.from_files([
+        os.path.join(DATA_PATH, 'Weather', "BRPI0201.WTH"),
+    ])
+    treatments = read_filex(os.path.join(DATA_PATH,"Maize", "BRPI0202.MZX"))
+    treatment = treatments[1]
+    treatment["Field"]["wsta"] = weather_station
+    treatment["Field"]["id_soil"] = soil 
+    treatment = dict(
+        field=treatment["Field"], 
+        cultivar=Maize("IB0171"), 
+        planting=treatment["Planting"],
+        simulation_controls=treatment["SimulationControls"]
+    )
+    engine = StubEngine(delay=1.)
+    with DSSATPool(2, engine=engine, timeout=.1) as pool:
+        with pytest.raises(DSSATTimeoutError):
+            pool.run_parameters(treatment, [{"p1": 200}, {"p1": 250}])
+        with pytest.raises(DSSATTimeoutError):
+            pool.run_treatments([treatment])
+    with DSSATPool(2, engine=engine, timeout=5.) as pool:
+        results = pool.run_parameters(treatment, [{"p1": 200}, {"p1": 250}])
+    assert [result["harwt"] for result in results] == [3001, 3001]
+
+def test_run_result():
+    """
+    Experiment BRPI0202, treatment 1, run with the StubEngine. The results
+    have the Summary.OUT values and the output tables of each run.
+    """
+    soil = SoilProfile.from_file(
+        "BRPI020001",
+        os.path.join(DATA_PATH, "Soil", "BR.SOL")
+    )
+    weather_station = WeatherStation.from_files([
+        os.path.join(DATA_PATH, 'Weather', "BRPI0201.WTH"),
+    ])
+    treatments = read_filex(os.path.join(DATA_PATH,"Maize", "BRPI0202.MZX"))
+    treatment = treatments[1]
+    treatment["Field"]["wsta"] = weather_station
+    treatment["Field"]["id_soil"] = soil 
+    treatment = dict(
+        field=treatment["Field"], 
+        cultivar=Maize("IB0171"), 
+        planting=treatment["Planting"],
+        simulation_controls=treatment["SimulationControls"]
+    )
+    dssat = DSSAT("/tmp/dssat_test", engine=StubEngine(n_days=10))
+    result = dssat.run_treatment(**treatment)
+    assert result["hwam"] == 3001.
+    assert result["tnam"] == "STUB TREATMENT"
+    assert result["mat"] == 123
+    assert result["mdat"] == date(2000, 7, 18)
+    assert len(result.table("PlantGro")) == 10
+    results = dssat.run_batch([treatment, treatment])
+    assert [result["hwam"] for result in results] == [3001., 3002.]
+    assert results[1].tables["PlantGro"]["LAID"][0] == 2.03
+    df = RunResult.concat(results + [None])
+    assert df["hwam"].tolist()[:2] == [3001., 3002.]
+    assert df.loc[2].isna().all()
+    df = RunResult.concat(results, table="PlantGro")
+    assert df["RESULT"].tolist() == [0]*10 + [1]*10
+    dssat.close()
+
+
+def test_run_result_mapping():
+    """
+    RunResult is a mapping of the standard output and the Summary.OUT values.
+    """
+    summary = {
+        "hwam": np.array([3001., np.nan]),
+        "tnam": np.array(["A", "B"], dtype=object)
+    }
+    result = RunResult({"harwt": 3001., "hwam": 3000.}, summary, row=1)
+    assert list(result.keys()) == ["harwt", "hwam", "tnam"]
+    assert list(result.values()) == [3001., 3000., "B"]
+    assert dict(result.items()) == {"harwt": 3001., "hwam": 3000., "tnam": "B"}
+    assert result.outputs == {"harwt": 3001., "hwam": 3000.}
+    assert result.summary == {"hwam": None, "tnam": "B"}
+    assert len(result) == 3 and dict(result) == dict(result.items())
+
+def test_csv_outputs():
+    """
+    Experiment BRPI0202, treatment 1, run with the StubEngine. With 
+    tables_only, the tables are read from the CSV outputs, and they are the
+    same of the text outputs.
+    """
+    soil = SoilProfile.from_file(
+        "BRPI020001",
+        os.path.join(DATA_PATH, "Soil", "BR.SOL")
+    )
+    weather_station = WeatherStation.from_files([
+        os.path.join(DATA_PATH, 'Weather', "BRPI0201.WTH"),
+    ])
+    treatments = read_filex(os.path.join(DATA_PATH,"Maize", "BRPI0202.MZX"))
+    treatment = treatments[1]
+    treatment["Field"]["wsta"] = weather_station
+    treatment["Field"]["id_soil"] = soil 
+    treatment = dict(
+        field=treatment["Field"], 
+        cultivar=Maize("IB0171"), 
+        planting=treatment["Planting"],
+        simulation_controls=treatment["SimulationControls"]
+    )
+    dssat = DSSAT("/tmp/dssat_test", engine=StubEngine(n_days=10))
+    text_result = dssat.run_treatment(**treatment)
+    dssat.close()
+    dssat = DSSAT("/tmp/dssat_test", engine=StubEngine(n_days=10), tables_only=True)
+    csv_result = dssat.run_treatment(**treatment)
+    assert sorted(dssat.output_files) == ["PlantGro.csv", "Summary.csv"]
+    # The user's simulation controls are not modified
+    assert treatment["simulation_controls"]["outputs"]["fmopt"] == "A"
+    assert dict(csv_result) == dict(text_result)
+    text_table = text_result.table("PlantGro")
+    csv_table = csv_result.table("PlantGro")
+    assert (csv_table.index == text_table.index).all()
+    assert np.allclose(csv_table["LAID"], text_table["LAID"])
+    results = dssat.run_batch([treatment, treatment])
+    assert [result["hwam"] for result in results] == [3001., 3002.]
+    assert dssat.output_tables["PlantGro"]["TRNO"].tolist() == [1]*10 + [2]*10
+    dssat.close()
+
+
+def test_stream():
+    """
+    Experiment BRPI0202, treatment 1, run with the StubEngine. The PlantGro
+    rows are read while the model runs, and the run is stopped by the 
+    callback.
+    """
+    soil = SoilProfile.from_file(
+        "BRPI020001",
+        os.path.join(DATA_PATH, "Soil", "BR.SOL")
+    )
+    weather_station = WeatherStation.from_files([
+        os.path.join(DATA_PATH, 'Weather', "BRPI0201.WTH"),
+    ])
+    treatments = read_filex(os.path.join(DATA_PATH,"Maize", "BRPI0202.MZX"))
+    treatment = treatments[1]
+    treatment["Field"]["wsta"] = weather_station
+    treatment["Field"]["id_soil"] = soil 
+    treatment = dict(
+        field=treatment["Field"], 
+        cultivar=Maize("IB0171"), 
+        planting=treatment["Planting"],
+        simulation_controls=treatment["SimulationControls"]
+    )
+    dssat = DSSAT("/tmp/dssat_test", engine=StubEngine(n_days=50, delay=.1))
+    chunks = []
+    def callback(table, rows):
+        chunks.append(rows)
+        return False
+    result = dssat.run_treatment(**treatment, stream=Stream(callback))
+    rows = pd.concat(chunks)
+    assert len(chunks) > 1
+    assert (rows.index == result.table("PlantGro").index).all()
+    assert (rows["TRNO"] == 1).all()
+    # Early termination
+    chunks = []
+    def callback(table, rows):
+        chunks.append(rows)
+        return (rows["DAS"] >= 20).any()
+    result = dssat.run_treatment(**treatment, stream=Stream(callback))
+    assert result is None
+    assert dssat.stopped
+    assert len(pd.concat(chunks)) < 50
+    dssat.close()
+
+
 if __name__ == "__main__":
-    test_cotton()
\ No newline at end of file
+    test_cotton()
@@ -0,0 +1,86 @@
+import pytest
+
+from DSSATTools.crop import Maize
+from DSSATTools.soil import SoilProfile
+from DSSATTools.filex import read_filex
+from DSSATTools.weather import WeatherStation
+from DSSATTools.sensitivity import (
+    morris_sample, morris_analyze, sobol_sample, sobol_analyze, morris
+)
+import numpy as np
+import pandas as pd
+import os
+
+DATA_PATH = "/home/diego/dssat-csm-data"
+BOUNDS = {"a": (0, 1), "b": (0, 1), "c": (-1, 1)}
+
+def linear_model(samples):
+    return pd.DataFrame({"y": 5*samples.a + samples.b**2})
+
+def test_morris_sample():
+    samples = morris_sample(BOUNDS, n_trajectories=5, seed=0)
+    assert len(samples) == 5 * (len(BOUNDS) + 1)
+    assert (samples.c >= -1).all() and (samples.c <= 1).all()
+    # Each step of a trajectory changes a single parameter
+    steps = np.diff(samples.values.reshape(5, 4, 3), axis=1)
+    assert ((steps != 0).sum(axis=2) == 1).all()
+
+def test_morris_analyze():
+    samples = morris_sample(BOUNDS, n_trajectories=20, seed=0)
+    indices = morris_analyze(BOUNDS, samples, linear_model(samples))["y"]
+    assert np.isclose(indices.loc["a", "mu_star"], 5)
+    assert indices.loc["c", "mu_star"] == 0
+
+def test_sobol():
+    samples = sobol_sample(BOUNDS, n_samples=10000, seed=0)
+    assert len(samples) == 10000 * (len(BOUNDS) + 2)
+    indices = sobol_analyze(BOUNDS, linear_model(samples))["y"]
+    assert np.isclose(indices.loc["a", "S1"], 0.96, atol=0.1)
+    assert np.isclose(indices.loc["a", "ST"], 0.96, atol=0.02)
+    assert indices.loc["c", "ST"] == 0
+
+def test_wrong_parameter():
+    treatments = read_filex(os.path.join(DATA_PATH,"Maize", "BRPI0202.MZX"))
+    treatment = treatments[1]
+    with pytest.raises(AssertionError) as excinfo:
+        morris(
+            dict(
+                field=treatment["Field"], cultivar=Maize("IB0171"),
+                planting=treatment["Planting"],
+                simulation_controls=treatment["SimulationControls"]
+            ),
+            bounds={"p1": (150, 300), "pp1": (1, 2)}
+        )
+        assert "pp1 is not a Maize cultivar or ecotype parameter" in str(excinfo.value)
+
+def test_morris_maize():
+    """
+    Experiment BRPI0202, treatment 1
+    """
+    soil = SoilProfile.from_file(
+        "BRPI020001",
+        os.path.join(DATA_PATH, "Soil", "BR.SOL")
+    )
+    weather_station = WeatherStation.from_files([
+        os.path.join(DATA_PATH, 'Weather', "BRPI0201.WTH"),
+    ])
+    treatments = read_filex(os.path.join(DATA_PATH,"Maize", "BRPI0202.MZX"))
+    treatment = treatments[1]
+    treatment["Field"]["wsta"] = weather_station
+    treatment["Field"]["id_soil"] = soil
+    cultivar = Maize("IB0171")
+    indices = morris(
+        dict(
+            field=treatment["Field"], cultivar=cultivar,
+            planting=treatment["Planting"],
+            initial_conditions=treatment["InitialConditions"],
+            fertilizer=treatment["Fertilizer"],
+            simulation_controls=treatment["SimulationControls"]
+        ),
+        bounds={"p1": (150, 300), "g2": (600, 900), "topt": (30, 36)},
+        outputs=["harwt", "mat"], n_trajectories=4, seed=0
+    )
+    assert list(indices["mat"].index) == ["p1", "g2", "topt"]
+    assert indices["mat"].loc["p1", "mu_star"] > 0
+    # The original cultivar is not modified
+    assert cultivar["p1"] == Maize("IB0171")["p1"]
@@ -0,0 +1,68 @@
+import pytest
+
+from DSSATTools.crop import Maize
+from DSSATTools.soil import SoilProfile
+from DSSATTools.filex import read_filex
+from DSSATTools.weather import WeatherStation
+from DSSATTools.run import DSSATPool
+from DSSATTools.engine import StubEngine
+from DSSATTools.sink import SQLiteSink, ParquetSink
+import pandas as pd
+import sqlite3
+import os
+import tempfile
+
+TMP = tempfile.gettempdir()
+DATA_PATH = "/home/diego/dssat-csm-data"
+
+def base_treatment():
+    """
+    Experiment BRPI0202, treatment 1
+    """
+    soil = SoilProfile.from_file(
+        "BRPI020001",
+        os.path.join(DATA_PATH, "Soil", "BR.SOL")
+    )
+    weather_station = WeatherStation.from_files([
+        os.path.join(DATA_PATH, 'Weather', "BRPI0201.WTH"),
+    ])
+    treatments = read_filex(os.path.join(DATA_PATH,"Maize", "BRPI0202.MZX"))
+    treatment = treatments[1]
+    treatment["Field"]["wsta"] = weather_station
+    treatment["Field"]["id_soil"] = soil
+    return dict(
+        field=treatment["Field"],
+        cultivar=Maize("IB0171"),
+        planting=treatment["Planting"],
+        simulation_controls=treatment["SimulationControls"]
+    )
+
+def test_sqlite_sink():
+    db_path = os.path.join(TMP, "dssat_test_sink.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    treatment = base_treatment()
+    with DSSATPool(2, engine=StubEngine(n_days=10)) as pool, \
+            SQLiteSink(db_path, variables=["LAID", "hwam"], buffer_rows=15) as sink:
+        results = pool.run_treatments([treatment]*4, sink=sink)
+        # The output tables are not kept
+        assert all(result.tables == {} for result in results)
+        assert results[0]["hwam"] == 3001.
+    assert sink.rows == {"PlantGro": 40, "Summary": 4}
+    with sqlite3.connect(db_path) as con:
+        plantgro = pd.read_sql("SELECT * FROM PlantGro", con)
+        summary = pd.read_sql("SELECT * FROM Summary", con)
+    assert list(plantgro.columns) == ["treatment", "DATE", "LAID"]
+    assert sorted(plantgro.treatment.unique()) == [0, 1, 2, 3]
+    assert list(summary.columns) == ["treatment", "hwam"]
+
+def test_parquet_sink():
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = os.path.join(TMP, "dssat_test_sink")
+    treatment = base_treatment()
+    with DSSATPool(2, engine=StubEngine(n_days=10)) as pool, \
+            ParquetSink(path, tables=["PlantGro"], buffer_rows=20) as sink:
+        pool.run_batches([[treatment]*2, [treatment]*3], sink=sink)
+    plantgro = pq.ParquetFile(os.path.join(path, "PlantGro.parquet"))
+    assert plantgro.metadata.num_rows == 50
+    assert plantgro.num_row_groups > 1
@@ -2,6 +2,7 @@ import pytest
 from DSSATTools.soil import SoilProfile, estimate_from_texture, SoilLayer
 import numpy as np
 import os
+import pickle
 import platform
 
 DATA_PATH = "/home/diego/dssat-csm-data"
@@ -114,5 +115,81 @@ def test_wrong_name():
 def test_estimate():
     estimate_from_texture(35, 30)
 
+def test_pickle():
+    soil = SoilProfile(
+        name='IBMZ910214', lat=29.6, long=-82.37, salb=0.18, slu1=2.0,
+        sldr=0.65, slro=60.0, slnf=1.0, slpf=0.92,
+        table = [
+            SoilLayer(slb=5.0, slll=0.026, sdul=0.096, ssat=0.345, srgf=1.0,
+                      sbdm=1.66, sloc=0.67),
+            SoilLayer(slb=15.0, slll=0.025, sdul=0.105, ssat=0.345, srgf=1.0,
+                      sbdm=1.66, sloc=0.67),
+        ]
+    )
+    copy = pickle.loads(pickle.dumps(soil))
+    assert type(copy) is SoilProfile
+    assert copy._write_sol() == soil._write_sol()
+    assert copy.table[1]["sdul"] == 0.105
+    frozen = pickle.loads(pickle.dumps(soil.freeze()))
+    assert frozen.frozen and frozen.digest() == soil.digest()
+
+def test_share():
+    soil = SoilProfile(
+        name='IBMZ910214', lat=29.6, long=-82.37, salb=0.18, slu1=2.0,
+        sldr=0.65, slro=60.0, slnf=1.0, slpf=0.92,
+        table = [
+            SoilLayer(slb=5.0, slll=0.026, sdul=0.096, ssat=0.345, srgf=1.0,
+                      sbdm=1.66, sloc=0.67),
+            SoilLayer(slb=15.0, slll=0.025, sdul=0.105, ssat=0.345, srgf=1.0,
+                      sbdm=1.66, sloc=0.67),
+        ]
+    )
+    shared = soil.share()
+    try:
+        assert shared.frozen
+        assert shared._write_sol() == soil._write_sol()
+        assert shared.digest() == soil.digest()
+        data = pickle.dumps(shared)
+        assert len(data) < len(pickle.dumps(soil))
+        copy = pickle.loads(data)
+        assert copy.table[1]["sdul"] == 0.105
+        assert copy.to_dataframe().equals(soil.to_dataframe())
+        copy.table.close()
+        with pytest.raises(TypeError):
+            shared.table.append(soil.table[0])
+    finally:
+        shared.table.unlink()
+
+def test_table_order():
+    def layer(slb):
+        return SoilLayer(slb=slb, slll=0.026, sdul=0.096, ssat=0.345,
+                         srgf=1.0, sbdm=1.66, sloc=0.67)
+    soil = SoilProfile(
+        name='IBMZ910214', lat=29.6, long=-82.37, salb=0.18, slu1=2.0,
+        sldr=0.65, slro=60.0, slnf=1.0, slpf=0.92,
+        table=[layer(30.), layer(5.), layer(15.)]
+    )
+    depths = lambda: [layer["slb"] for layer in soil.table]
+    assert depths() == [5., 15., 30.]
+    # Layers are inserted in their position, whatever the insert index
+    soil.table.append(layer(10.))
+    soil.table.insert(0, layer(60.))
+    soil.table.extend([layer(45.), layer(1.)])
+    assert depths() == [1., 5., 10., 15., 30., 45., 60.]
+    with pytest.raises(AssertionError):
+        soil.table.append(layer(15.))
+    with pytest.raises(AssertionError):
+        soil.table.extend([layer(100.), layer(100.)])
+    with pytest.raises(AssertionError):
+        soil.table = [layer(5.), layer(5.)]
+    # Deleted layers are removed from the index too
+    del soil.table[1]
+    del soil.table[-1]
+    assert depths() == [1., 10., 15., 30., 45.]
+    soil.table.append(layer(5.))
+    soil.table.append(layer(60.))
+    soil.table.append(layer(20.))
+    assert depths() == [1., 5., 10., 15., 20., 30., 45., 60.]
+
 if __name__ == "__main__":
     test_open_all()
\ No newline at end of file
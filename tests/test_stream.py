@@ -0,0 +1,64 @@
+from DSSATTools.stream import OutputTail
+import pandas as pd
+import os
+import tempfile
+
+PLANTGRO_HEADER = "@YEAR DOY   DAS   DAP   LAID   CWAD"
+
+def run_banner(run, trno):
+    """
+    Returns the header lines of a run of the PlantGro.OUT file, as written by
+    the model.
+    """
+    return "\n".join([
+        "*DSSAT Cropping System Model Ver. 4.8.2.000 -ver 31, 2023 10:00:00",
+        "",
+        f"*RUN {run:3d}        : MAIZE                    MZCER048 UNCU0001 {run}",
+        " MODEL          : MZCER048 - Maize",
+        " EXPERIMENT     : UNCU0001 MZ MAIZE EXPERIMENT",
+        f" TREATMENT{trno:3d}   : MAIZE                    MZCER048",
+        " CROP           : Maize                   CULTIVAR : IB0171 PIO 3382",
+        " STARTING DATE  : FEB 1 2000",
+        " PLANTING DATE  : MAR 1 2000   PLANTS/m2 :   7.0     Row spacing :  75.cm",
+        " WEATHER        : UNCU 2000",
+        " SOIL           : IBMZ910214   TEXTURE : SIL - Millhopper Fine Sand",
+        " WATER BALANCE  : IRRIGATE ON REPORTED DATE(S)",
+        " SIMULATION OPT : WATER   :Y  NITROGEN:Y N-FIX:N  PHOSPH :N  PESTS  :N",
+        "                  PHOTO   :C  ET      :R  INFIL:S  HYDROL :R  SOM    :G",
+        "",
+        "!IDETG",
+        "",
+        PLANTGRO_HEADER,
+    ]) + "\n"
+
+def test_text_tail_multiple_runs():
+    """
+    Two runs of PlantGro.OUT, with the run banner written by the model.
+    """
+    text = "$GROWTH ASPECTS OUTPUT FILE\n\n"
+    for run in (1, 2):
+        text += run_banner(run, run + 10)
+        for day in range(61, 66):
+            text += f" 2000  {day:3d}  {day:4d}  {day - 60:4d}  {run*0.1:5.2f}  {day*10:5d}\n"
+        text += "\n"
+    run_path = tempfile.mkdtemp()
+    path = os.path.join(run_path, "PlantGro.OUT")
+    tail = OutputTail(run_path, "PlantGro")
+    # The file is read while it's written, in parts that end anywhere
+    rows = []
+    with open(path, "w") as f:
+        for n in range(0, len(text), 97):
+            f.write(text[n:n + 97])
+            f.flush()
+            new_rows = tail.read()
+            if new_rows is not None:
+                rows.append(new_rows)
+    rows = pd.concat(rows)
+    assert len(rows) == 10
+    assert rows["RUN"].tolist() == [1]*5 + [2]*5
+    assert rows["TRNO"].tolist() == [11]*5 + [12]*5
+    assert "YEAR" in rows.columns
+    assert rows.index[0] == pd.Timestamp(2000, 3, 1)
+    assert rows["CWAD"].tolist()[-1] == 650
+    os.remove(path)
+    os.rmdir(run_path)
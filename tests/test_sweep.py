@@ -0,0 +1,140 @@
+import pytest
+
+from DSSATTools.crop import Maize
+from DSSATTools.soil import SoilProfile
+from DSSATTools.filex import read_filex, create_batch_filex, Planting
+from DSSATTools.weather import WeatherStation
+from DSSATTools.run import DSSAT
+from DSSATTools.sweep import Sweep
+from DSSATTools.engine import StubEngine, DSSATTimeoutError
+from datetime import timedelta
+import numpy as np
+import os
+import tempfile
+
+TMP = tempfile.gettempdir()
+DATA_PATH = "/home/diego/dssat-csm-data"
+
+def base_treatment():
+    """
+    Experiment BRPI0202, treatment 1
+    """
+    soil = SoilProfile.from_file(
+        "BRPI020001",
+        os.path.join(DATA_PATH, "Soil", "BR.SOL")
+    )
+    weather_station = WeatherStation.from_files([
+        os.path.join(DATA_PATH, 'Weather', "BRPI0201.WTH"),
+    ])
+    treatments = read_filex(os.path.join(DATA_PATH,"Maize", "BRPI0202.MZX"))
+    treatment = treatments[1]
+    treatment["Field"]["wsta"] = weather_station
+    treatment["Field"]["id_soil"] = soil
+    return dict(
+        field=treatment["Field"],
+        cultivar=Maize("IB0171"),
+        planting=treatment["Planting"],
+        initial_conditions=treatment["InitialConditions"],
+        fertilizer=treatment["Fertilizer"],
+        simulation_controls=treatment["SimulationControls"]
+    )
+
+def test_batch_filex_levels():
+    base = base_treatment()
+    late = Planting(**base["planting"].parameters())
+    late["pdate"] = base["planting"]["pdate"] + timedelta(days=15)
+    filex = create_batch_filex([base, {**base, "planting": late}])
+    lines = filex.split("\n")
+    planting = lines.index("*PLANTING DETAILS")
+    assert lines[planting + 2][:2] == " 1"
+    assert lines[planting + 3][:2] == " 2"
+    # Shared sections are written once
+    assert filex.count("*FIELDS") == 1
+    assert filex.count("@C CR INGENO CNAME") == 1
+
+def test_batch_same_as_single():
+    base = base_treatment()
+    dssat = DSSAT(os.path.join(TMP, "dssat_test_batch"))
+    single = dssat.run_treatment(**base)
+    batch = dssat.run_batch([base, base])
+    dssat.close()
+    assert batch[0]['harwt'] == single['harwt']
+    assert batch[1]['harwt'] == single['harwt']
+
+def test_sweep_full():
+    base = base_treatment()
+    plantings = {}
+    for days in (0, 15, 30):
+        planting = Planting(**base["planting"].parameters())
+        planting["pdate"] = base["planting"]["pdate"] + timedelta(days=days)
+        plantings[days] = planting
+    sweep = Sweep(
+        base=base,
+        factors={
+            "planting": plantings,
+            "cultivar": [Maize("IB0171"), Maize("IB0035")]
+        }
+    )
+    assert len(sweep) == 6
+    assert len(sweep.batches()) == 1
+    results = sweep.run(n_workers=2)
+    assert len(results) == 6
+    assert list(results.planting) == [0, 0, 15, 15, 30, 30]
+    assert not results.harwt.isna().any()
+    single = DSSAT(os.path.join(TMP, "dssat_test_sweep"))
+    harwt = single.run_treatment(**base)['harwt']
+    single.close()
+    assert np.isclose(harwt, results.harwt[0])
+
+def test_sweep_lhs():
+    base = base_treatment()
+    sweep = Sweep(
+        base=base,
+        factors={"cultivar": [Maize("IB0171"), Maize("IB0035")]},
+        design="lhs", n_samples=4, seed=0
+    )
+    assert len(sweep) == 4
+    assert sorted(sweep.labels.cultivar) == [0, 0, 1, 1]
+
+def test_sweep_conflicting_soils():
+    base = base_treatment()
+    other_field = base_treatment()["field"]
+    other_field["wsta"] = base["field"]["wsta"]
+    other_field["id_soil"]["salb"] = 0.5
+    sweep = Sweep(base=base, factors={"field": [base["field"], other_field]})
+    assert len(sweep.batches()) == 2
+    with pytest.raises(AssertionError):
+        dssat = DSSAT(os.path.join(TMP, "dssat_test_conflict"))
+        try:
+            dssat.run_batch(sweep.treatments)
+        finally:
+            dssat.close()
+
+def test_sweep_value_factors():
+    base = base_treatment()
+    pdate = base["planting"]["pdate"]
+    sweep = Sweep(
+        base=base,
+        factors={
+            "planting.pdate": [pdate, pdate + timedelta(days=15)],
+            "cultivar.p1": [200, 250]
+        }
+    )
+    treatments = sweep.treatments
+    assert len(treatments) == 4
+    assert treatments[0]["planting"] is treatments[1]["planting"]
+    assert treatments[2]["planting"]["pdate"] == pdate + timedelta(days=15)
+    assert treatments[1]["cultivar"]["p1"] == 250
+    # The base sections are not modified
+    assert base["planting"]["pdate"] == pdate
+    assert base["cultivar"]["p1"] != 250
+    results = sweep.run(n_workers=2)
+    assert not results.harwt.isna().any()
+
+def test_sweep_pool_arguments():
+    base = base_treatment()
+    sweep = Sweep(base=base, factors={"planting.ppop": [5, 7, 9]})
+    results = sweep.run(n_workers=2, engine=StubEngine(n_days=10))
+    assert list(results.hwam) == [3001., 3002., 3003.]
+    with pytest.raises(DSSATTimeoutError):
+        sweep.run(n_workers=2, engine=StubEngine(delay=1.), timeout=.1)
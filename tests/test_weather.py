@@ -98,10 +98,8 @@ def test_to_dataframe():
     ])
     weather = WeatherStation.from_files(files)
     df = weather.to_dataframe()
-    kwargs = weather._Record__data
     df.loc[32, 'tmin'] = -3.
-    kwargs['table'] = df
-    weather = WeatherStation(**kwargs)
+    weather = weather.evolve(table=df)
     assert weather.table[32]['tmin'] == -3.
 
 if __name__ == "__main__":